@@ -2,20 +2,48 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import hashlib
 import json
 import logging
 import time
-from typing import Any, Dict, List
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
-from fastapi import APIRouter, HTTPException, Response, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
-import httpx
-import websockets
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.core.config import settings
-from app.schemas.api import QueryRequest, QueryResponse, DashboardSpec, TTSRequest
-from app.services.db import db_service
+from app.schemas.api import (
+    BatchQueryRequest,
+    QueryRequest,
+    QueryResponse,
+    SaveDashboardRequest,
+    TTSRequest,
+    validate_dashboard_structure,
+)
+from app.services.admission import (
+    PRIORITIES,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionPool,
+    Overloaded,
+    Slot,
+    admission,
+    query_pool,
+    stream_pool,
+    voice_pool,
+)
+from app.services.cancellation import RunCancelled, cancellation_stats
+from app.services.dashboards import TemplateError, dashboard_store, run_sources
+from app.services.db import QueryTimeout, db_service
+from app.services.mentions import infer_days, infer_tickers, known_tickers
 from app.services.agent import agent_service
+from app.services.results import ResultError, count_rows, fetch_page, result_store
+from app.services.sessions import session_store
+from app.services.stream_buffer import parse_event_id, stream_hub
+from app.services.traces import trace_stats
+from app.services.warmup import warmup_state
+from app.utils.encoding import FastJSONResponse, ndjson_line, sse_event
 from app.utils.json_tools import normalize_dashboard_spec, replace_query_placeholders
 from app.utils.sql_guard import filter_safe_queries
 
@@ -29,6 +57,58 @@ def health_check() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@router.get("/ready")
+def readiness_check() -> JSONResponse:
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    return JSONResponse(
+        status_code=200 if warmup_state.ready else 503,
+        content=warmup_state.as_dict(),
+    )
+
+
+@router.get("/api/admission")
+def admission_status() -> Dict[str, Any]:
+    """Concurrency, queue depth and wait times per admission pool, abandoned work and trace reuse."""
+    return {
+        **admission.snapshot(),
+        "cancelled": cancellation_stats.snapshot(),
+        "traces": trace_stats.snapshot(),
+    }
+
+
+async def _admit(pool: AdmissionPool, priority: Optional[str] = None) -> Slot:
+    """Take a slot from ``pool`` or answer 503 with Retry-After."""
+    try:
+        return await pool.acquire(PRIORITIES.get((priority or "").lower(), PRIORITY_INTERACTIVE))
+    except Overloaded as exc:
+        logger.warning("Shedding request: %s", exc)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy ({exc.reason}); retry later",
+            headers={"Retry-After": str(exc.retry_after_s)},
+        ) from exc
+
+
+def _budget_s(request: Union[QueryRequest, BatchQueryRequest]) -> Optional[float]:
+    return request.timeBudgetMs / 1000 if request.timeBudgetMs else None
+
+
+def _query_metadata(
+    agent_result: Any, elapsed_ms: int, sql_queries: List[str], safe_queries: List[str]
+) -> Dict[str, Any]:
+    result = agent_result if isinstance(agent_result, dict) else {}
+    return {
+        "executionTimeMs": elapsed_ms,
+        "sqlQueriesRequested": len(sql_queries),
+        "sqlQueriesExecuted": len(safe_queries),
+        "partial": bool(result.get("partial", False)),
+        "budget": result.get("budget"),
+        "prefetch": result.get("prefetch"),
+        "routing": result.get("routing"),
+        "memory": result.get("memory"),
+    }
+
+
 def _finalize_spec(agent_result: Dict[str, Any], current_chaos: Any) -> Dict[str, Any]:
     """Normalize dashboard spec from agent result and carry forward chaos."""
     raw_spec = agent_result.get("dashboardSpec", {}) if isinstance(agent_result, dict) else {}
@@ -46,7 +126,6 @@ def _finalize_spec(agent_result: Dict[str, Any], current_chaos: Any) -> Dict[str
     else:
         query_results = []
         if safe_queries:
-            from app.services.db import db_service
             for sql in safe_queries:
                 try:
                     query_results.append(db_service.query(sql))
@@ -85,36 +164,26 @@ def _maybe_strip_blocks(
     return hydrated_spec
 
 
-def _infer_ticker_from_text(text: str) -> str | None:
-    if not text:
-        return None
-    for ticker in ("AAPL", "MSFT", "TSLA"):
-        if ticker in text.upper():
-            return ticker
-    return None
+DEFAULT_FALLBACK_DAYS = 30
 
+# Latest bars for every requested ticker in one pass; callers slice per block
+FALLBACK_SERIES_SQL = """
+SELECT ticker, date, open, high, low, close
+FROM (
+    SELECT ticker, date, open, high, low, close,
+           row_number() OVER (PARTITION BY ticker ORDER BY date DESC) AS bars_back
+    FROM stock_prices
+    WHERE ticker IN ({placeholders})
+)
+WHERE bars_back <= ?
+ORDER BY ticker, date
+"""
 
-def _infer_days_from_text(text: str) -> int | None:
-    if not text:
-        return None
-    import re
-
-    match = re.search(r"last\\s+(\\d+)\\s+day", text, flags=re.IGNORECASE)
-    if match:
-        try:
-            return max(1, int(match.group(1)))
-        except ValueError:
-            return None
-    return None
-
-
-def _hydrate_missing_time_series(hydrated_spec: Dict[str, Any]) -> Dict[str, Any]:
-    if not isinstance(hydrated_spec, dict):
-        return hydrated_spec
-    blocks = hydrated_spec.get("blocks")
-    if not isinstance(blocks, list):
-        return hydrated_spec
 
+def _plan_missing_time_series(blocks: List[Any]) -> List[Tuple[Dict[str, Any], str, str, int]]:
+    """Chart blocks without data, with the ticker and number of bars each needs."""
+    plan = []
+    universe: Optional[List[str]] = None
     for block in blocks:
         if not isinstance(block, dict):
             continue
@@ -129,71 +198,291 @@ def _hydrate_missing_time_series(hydrated_spec: Dict[str, Any]) -> Dict[str, Any
             continue
 
         title = str(props.get("title") or "")
-        ticker = props.get("ticker") or _infer_ticker_from_text(title)
+        ticker = props.get("ticker")
+        if not ticker:
+            if universe is None:
+                universe = known_tickers()
+            ticker = next(iter(infer_tickers(title, universe)), None)
         if not ticker:
             continue
+        days = infer_days(title) or DEFAULT_FALLBACK_DAYS
+        plan.append((props, block_type, str(ticker).upper(), days))
+    return plan
 
-        days = _infer_days_from_text(title) or 30
-        query = f"""
-            SELECT * FROM (
-                SELECT date, open, high, low, close
-                FROM stock_prices
-                WHERE ticker = '{ticker}'
-                ORDER BY date DESC
-                LIMIT {days}
-            ) t
-            ORDER BY date ASC
-        """.strip()
-        try:
-            rows = db_service.query(query)
-            props["data"] = rows
-            if block_type == "line-chart":
-                props.setdefault("xKey", "date")
-                props.setdefault("yKeys", ["close"])
-        except Exception:
-            logger.exception("Time series fallback query failed", extra={"ticker": ticker})
+
+def _hydrate_missing_time_series(hydrated_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill empty price charts with recent bars, fetched for all of them in one query."""
+    if not isinstance(hydrated_spec, dict):
+        return hydrated_spec
+    blocks = hydrated_spec.get("blocks")
+    if not isinstance(blocks, list):
+        return hydrated_spec
+
+    plan = _plan_missing_time_series(blocks)
+    if not plan:
+        return hydrated_spec
+    tickers = sorted({ticker for _, _, ticker, _ in plan})
+    max_days = max(days for _, _, _, days in plan)
+    query = FALLBACK_SERIES_SQL.format(placeholders=", ".join("?" for _ in tickers))
+    try:
+        rows = db_service.query(query, [*tickers, max_days])
+    except Exception:
+        logger.exception("Time series fallback query failed", extra={"tickers": tickers})
+        return hydrated_spec
+
+    series: Dict[str, List[Dict[str, Any]]] = {ticker: [] for ticker in tickers}
+    for row in rows:
+        series[row["ticker"]].append({k: v for k, v in row.items() if k != "ticker"})
+    for props, block_type, ticker, days in plan:
+        props["data"] = series[ticker][-days:]
+        if block_type == "line-chart":
+            props.setdefault("xKey", "date")
+            props.setdefault("yKeys", ["close"])
 
     return hydrated_spec
 
 
+def _dashboard_template(agent_result: Any, current_chaos: Any) -> Optional[Dict[str, Any]]:
+    """The unhydrated spec and the tool call behind each placeholder, for saving."""
+    if not isinstance(agent_result, dict):
+        return None
+    sources = agent_result.get("toolSources")
+    if not sources or len(sources) != len(agent_result.get("toolResults") or []):
+        return None
+    spec = normalize_dashboard_spec(agent_result.get("dashboardSpec", {}))
+    if current_chaos and not spec.get("chaos"):
+        spec["chaos"] = current_chaos
+    return {"spec": spec, "sources": sources}
+
+
+def _final_payload(agent_result: Any, current_chaos: Any, elapsed_ms: int) -> Dict[str, Any]:
+    """Hydrate and validate an agent result into the /api/query response body."""
+    hydrated_spec, sql_queries, safe_queries = _finalize_spec(agent_result, current_chaos)
+
+    intent = agent_result.get("intent", "unknown") if isinstance(agent_result, dict) else "unknown"
+    assistant_message = agent_result.get("assistantMessage", "") if isinstance(agent_result, dict) else ""
+    hydrated_spec = _maybe_strip_blocks(hydrated_spec, intent, sql_queries, safe_queries)
+    hydrated_spec = _hydrate_missing_time_series(hydrated_spec)
+    return {
+        "dashboardSpec": validate_dashboard_structure(hydrated_spec),
+        "assistantMessage": assistant_message,
+        "intent": intent,
+        "queryMetadata": _query_metadata(agent_result, elapsed_ms, sql_queries, safe_queries),
+        "dashboardTemplate": _dashboard_template(agent_result, current_chaos),
+        "sessionId": agent_result.get("sessionId") if isinstance(agent_result, dict) else None,
+    }
+
+
 # ── Non-streaming endpoint (kept for backward compatibility) ──
 
 @router.post("/api/query", response_model=QueryResponse)
-async def handle_query(request: QueryRequest) -> QueryResponse:
+async def handle_query(
+    request: QueryRequest,
+    http_request: Request,
+    priority: Optional[str] = Header(None, alias="X-Priority"),
+) -> FastJSONResponse:
     start_time = time.time()
+    slot = await _admit(query_pool, priority)
 
     try:
         agent_result = await agent_service.process_query(
-            request.message, request.currentChaos
+            request.message,
+            request.currentChaos,
+            _budget_s(request),
+            is_disconnected=http_request.is_disconnected,
+            session=session_store.open(request.sessionId),
         )
+    except RunCancelled:
+        # Nobody is left to read the answer; 499 only shows up in access logs
+        return Response(status_code=499)
     except Exception as exc:
         logger.exception("Agent processing failed")
         raise HTTPException(status_code=502, detail="Agent processing failed") from exc
+    finally:
+        slot.release()
 
-    hydrated_spec, sql_queries, safe_queries = _finalize_spec(agent_result, request.currentChaos)
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    # Encoded straight to the wire; QueryResponse only documents the shape
+    return FastJSONResponse(_final_payload(agent_result, request.currentChaos, elapsed_ms))
 
-    intent = agent_result.get("intent", "unknown") if isinstance(agent_result, dict) else "unknown"
-    assistant_message = agent_result.get("assistantMessage", "") if isinstance(agent_result, dict) else ""
-    hydrated_spec = _maybe_strip_blocks(hydrated_spec, intent, sql_queries, safe_queries)
-    hydrated_spec = _hydrate_missing_time_series(hydrated_spec)
 
-    elapsed_ms = int((time.time() - start_time) * 1000)
-    return QueryResponse(
-        dashboardSpec=DashboardSpec.model_validate(hydrated_spec),
-        assistantMessage=assistant_message,
-        intent=intent,
-        queryMetadata={
-            "executionTimeMs": elapsed_ms,
-            "sqlQueriesRequested": len(sql_queries),
-            "sqlQueriesExecuted": len(safe_queries),
-        },
+# ── Batch endpoint (scheduled reports) ──
+
+# Overloaded batch items wait for Retry-After and try again this many times
+BATCH_ADMISSION_ATTEMPTS = 3
+
+
+async def _admit_batch_item() -> Slot:
+    """Take a query slot at batch priority, backing off while the pool is saturated."""
+    attempt = 1
+    while True:
+        try:
+            return await query_pool.acquire(PRIORITY_BATCH)
+        except Overloaded as exc:
+            if attempt >= BATCH_ADMISSION_ATTEMPTS:
+                raise
+            attempt += 1
+            await asyncio.sleep(exc.retry_after_s)
+
+
+async def _run_batch_item(
+    index: int, message: str, request: BatchQueryRequest, gate: asyncio.Semaphore
+) -> Dict[str, Any]:
+    async with gate:
+        start_time = time.time()
+        try:
+            slot = await _admit_batch_item()
+            try:
+                agent_result = await agent_service.process_query(
+                    message, request.currentChaos, _budget_s(request)
+                )
+            finally:
+                slot.release()
+            elapsed_ms = int((time.time() - start_time) * 1000)
+            result = _final_payload(agent_result, request.currentChaos, elapsed_ms)
+            return {"index": index, "message": message, "status": "ok", "result": result}
+        except Exception as exc:
+            logger.exception("Batch item failed", extra={"index": index})
+            return {"index": index, "message": message, "status": "error", "detail": str(exc)}
+
+
+@router.post("/api/query/batch")
+async def handle_query_batch(request: BatchQueryRequest) -> StreamingResponse:
+    """Run many dashboard requests with bounded parallelism, streamed as NDJSON.
+
+    Each line is one finished item, in completion order:
+    ``{"index", "message", "status": "ok", "result": <POST /api/query body>}`` or
+    ``{"index", "message", "status": "error", "detail"}``; the last line is a
+    ``{"done": true, ...}`` summary.  Identical messages run once, and items
+    share the process-wide SQL cache, so queries repeated across the batch
+    run once too.
+    """
+    messages = request.items()
+    if len(messages) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"Batch too large; at most {settings.batch_max_items} items"
+        )
+    concurrency = min(request.concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+    start_time = time.time()
+
+    async def line_generator():
+        gate = asyncio.Semaphore(max(1, concurrency))
+        # Identical messages run once and are reported under every index
+        indexes: Dict[str, List[int]] = {}
+        for index, message in enumerate(messages):
+            indexes.setdefault(message, []).append(index)
+        tasks = [
+            asyncio.create_task(_run_batch_item(positions[0], message, request, gate))
+            for message, positions in indexes.items()
+        ]
+        succeeded = 0
+        try:
+            for next_item in asyncio.as_completed(tasks):
+                item = await next_item
+                for index in indexes[item["message"]]:
+                    succeeded += item["status"] == "ok"
+                    yield ndjson_line({**item, "index": index})
+        finally:
+            # Client went away: stop the items still queued or running
+            for task in tasks:
+                task.cancel()
+        yield ndjson_line({
+            "done": True,
+            "items": len(messages),
+            "succeeded": succeeded,
+            "failed": len(messages) - succeeded,
+            "elapsedMs": int((time.time() - start_time) * 1000),
+        })
+
+    return StreamingResponse(
+        line_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 # ── SSE streaming endpoint ──
 
+# Streamed runs keep going in the background while their client reconnects
+_stream_runs: Set[asyncio.Task] = set()
+
+
+async def _produce_stream(
+    run_id: str, request: QueryRequest, slot: Slot, start_time: float
+) -> None:
+    """Run the agent for one stream and publish its frames to ``stream_hub``."""
+    seq = 0
+
+    async def publish(event: str, data: Any) -> None:
+        nonlocal seq
+        seq += 1
+        await stream_hub.publish(run_id, seq, sse_event(event, data, f"{run_id}:{seq}"))
+
+    async def abandoned() -> bool:
+        return await stream_hub.abandoned(run_id, settings.stream_resume_grace_s)
+
+    streamed_content = False
+    try:
+        async for agent_event in agent_service.process_query_stream(
+            request.message,
+            request.currentChaos,
+            _budget_s(request),
+            is_disconnected=abandoned,
+            session=session_store.open(request.sessionId),
+        ):
+            event_type = agent_event["event"]
+            data = agent_event["data"]
+
+            if event_type == "result":
+                # Finalize the spec the same way as the non-streaming path
+                elapsed_ms = int((time.time() - start_time) * 1000)
+                final = _final_payload(data, request.currentChaos, elapsed_ms)
+                # If the model never streamed content, simulate a short stream from assistantMessage
+                assistant_msg = final.get("assistantMessage") or ""
+                if assistant_msg and not streamed_content:
+                    chunk_size = 80
+                    for i in range(0, len(assistant_msg), chunk_size):
+                        chunk = assistant_msg[i : i + chunk_size]
+                        await publish("content", {"delta": chunk})
+                    streamed_content = True
+                await publish("result", final)
+            elif event_type == "content":
+                streamed_content = True
+                await publish("content", data)
+            else:
+                await publish(event_type, data)
+
+    except RunCancelled:
+        # Nobody reconnected within the grace period
+        await publish("error", {"detail": "Run cancelled after the client disconnected"})
+    except Exception as exc:
+        logger.exception("SSE stream failed")
+        await publish("error", {"detail": str(exc)})
+    finally:
+        slot.release()
+
+    await publish("done", {})
+    await stream_hub.close(run_id)
+
+
+def _sse_response(frames: Any) -> StreamingResponse:
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @router.post("/api/query/stream")
-async def handle_query_stream(request: QueryRequest) -> StreamingResponse:
+async def handle_query_stream(
+    request: QueryRequest,
+    priority: Optional[str] = Header(None, alias="X-Priority"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+) -> StreamingResponse:
     """Stream agent progress via Server-Sent Events.
 
     Events:
@@ -201,69 +490,156 @@ async def handle_query_stream(request: QueryRequest) -> StreamingResponse:
       event: result  — final JSON response (same shape as POST /api/query)
       event: error   — error detail
       event: done    — stream finished
+
+    Every event has an ``id: <run>:<seq>``.  Resubmitting the request with
+    ``Last-Event-ID`` while the run is still buffered attaches to that run
+    (running or finished) and replays only the events after that id; the
+    agent is not run again.
     """
+    resume = parse_event_id(last_event_id)
+    if resume is not None and await stream_hub.exists(resume[0]):
+        return _sse_response(stream_hub.follow(*resume))
+
     start_time = time.time()
+    # Admitted before the response starts so overload can still answer 503;
+    # released by the background run when it ends
+    slot = await _admit(stream_pool, priority)
+    run_id = uuid.uuid4().hex
+    await stream_hub.open(run_id)
+    task = asyncio.create_task(_produce_stream(run_id, request, slot, start_time))
+    _stream_runs.add(task)
+    task.add_done_callback(_stream_runs.discard)
+    return _sse_response(stream_hub.follow(run_id))
 
-    async def event_generator():
-        streamed_content = False
-        try:
-            async for sse_event in agent_service.process_query_stream(
-                request.message, request.currentChaos
-            ):
-                event_type = sse_event["event"]
-                data = sse_event["data"]
-
-                if event_type == "result":
-                    # Finalize the spec the same way as the non-streaming path
-                    hydrated_spec, sql_queries, safe_queries = _finalize_spec(
-                        data, request.currentChaos
-                    )
-                    intent = data.get("intent", "unknown") if isinstance(data, dict) else "unknown"
-                    hydrated_spec = _maybe_strip_blocks(hydrated_spec, intent, sql_queries, safe_queries)
-                    hydrated_spec = _hydrate_missing_time_series(hydrated_spec)
-                    elapsed_ms = int((time.time() - start_time) * 1000)
-                    final = {
-                        "dashboardSpec": DashboardSpec.model_validate(hydrated_spec).model_dump(),
-                        "assistantMessage": data.get("assistantMessage", ""),
-                        "intent": data.get("intent", "unknown"),
-                        "queryMetadata": {
-                            "executionTimeMs": elapsed_ms,
-                            "sqlQueriesRequested": len(sql_queries),
-                            "sqlQueriesExecuted": len(safe_queries),
-                        },
-                    }
-                    # If the model never streamed content, simulate a short stream from assistantMessage
-                    assistant_msg = final.get("assistantMessage") or ""
-                    if assistant_msg and not streamed_content:
-                        chunk_size = 80
-                        for i in range(0, len(assistant_msg), chunk_size):
-                            chunk = assistant_msg[i : i + chunk_size]
-                            yield f"event: content\ndata: {json.dumps({'delta': chunk}, default=str)}\n\n"
-                        streamed_content = True
-                    yield f"event: result\ndata: {json.dumps(final, default=str)}\n\n"
-                elif event_type == "content":
-                    streamed_content = True
-                    yield f"event: content\ndata: {json.dumps(data, default=str)}\n\n"
-                else:
-                    yield f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
 
-        except Exception as exc:
-            logger.exception("SSE stream failed")
-            yield f"event: error\ndata: {json.dumps({'detail': str(exc)})}\n\n"
+# ── Saved dashboards (LLM-free refresh) ──
 
-        yield "event: done\ndata: {}\n\n"
+def _refresh_etag(dashboard: Dict[str, Any], data_version: str) -> str:
+    # Data only changes with the snapshot, so template + version identify the body
+    digest = hashlib.sha256(f"{dashboard['digest']}:{data_version}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
 
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def _get_dashboard(dashboard_id: str) -> Dict[str, Any]:
+    dashboard = await asyncio.to_thread(dashboard_store.get, dashboard_id)
+    if dashboard is None:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return dashboard
+
+
+@router.post("/api/dashboards", status_code=201)
+async def save_dashboard(request: SaveDashboardRequest) -> Dict[str, Any]:
+    """Save a ``dashboardTemplate`` from a query response under a name."""
+    try:
+        record = await asyncio.to_thread(
+            dashboard_store.create,
+            request.name,
+            normalize_dashboard_spec(request.template.spec),
+            request.template.sources,
+        )
+    except TemplateError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return {"id": record["id"], "name": record["name"], "createdAt": record["createdAt"]}
+
+
+@router.get("/api/dashboards")
+async def list_dashboards() -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(dashboard_store.list_all)
+
+
+@router.get("/api/dashboards/{dashboard_id}")
+async def get_dashboard(dashboard_id: str) -> Dict[str, Any]:
+    dashboard = await _get_dashboard(dashboard_id)
+    dashboard.pop("digest")
+    return dashboard
+
+
+@router.delete("/api/dashboards/{dashboard_id}", status_code=204)
+async def delete_dashboard(dashboard_id: str) -> Response:
+    if not await asyncio.to_thread(dashboard_store.delete, dashboard_id):
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return Response(status_code=204)
+
+
+@router.get("/api/dashboards/{dashboard_id}/refresh")
+async def refresh_dashboard(
+    dashboard_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+) -> Response:
+    """Re-run a saved dashboard's queries and hydrate its spec, without the agent.
+
+    Answers ``304`` when the client already holds the body for the current
+    data snapshot, before any query runs.
+    """
+    dashboard = await _get_dashboard(dashboard_id)
+    data_version = await asyncio.to_thread(lambda: db_service.version)
+    etag = _refresh_etag(dashboard, data_version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        results = await run_sources(dashboard["sources"])
+    except Exception as exc:
+        logger.exception("Dashboard refresh failed", extra={"dashboard_id": dashboard_id})
+        raise HTTPException(status_code=502, detail=f"Dashboard refresh failed: {exc}") from exc
+    spec = _hydrate_missing_time_series(replace_query_placeholders(dashboard["spec"], results))
+    return FastJSONResponse(
+        {
+            "id": dashboard["id"],
+            "name": dashboard["name"],
+            "dashboardSpec": validate_dashboard_structure(spec),
+            "dataVersion": data_version,
+            "refreshedAt": time.time(),
         },
+        headers=headers,
     )
 
 
+# ── Paged results (data-table blocks) ──
+
+@router.get("/api/results/{handle}")
+async def get_result_page(
+    handle: str,
+    sort: Optional[str] = None,
+    direction: str = Query("asc", alias="dir", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.results_page_rows, ge=1, le=settings.results_max_page_rows),
+) -> Response:
+    """One page of an ``open_table`` result, sorted and paged in DuckDB.
+
+    Pass the previous page's ``nextCursor`` as ``cursor`` to continue; the
+    first page (no cursor) also carries ``rowCount``.
+    """
+    result = await asyncio.to_thread(result_store.get, handle)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    try:
+        page = await asyncio.to_thread(fetch_page, result, sort, direction == "desc", cursor, limit)
+        row_count = None if cursor else await asyncio.to_thread(count_rows, result)
+    except ResultError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except QueryTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    except Exception as exc:
+        logger.exception("Result page failed", extra={"handle": handle})
+        raise HTTPException(status_code=502, detail=f"Result page failed: {exc}") from exc
+    return FastJSONResponse({
+        "handle": handle,
+        "columns": result.columns,
+        "rows": page["rows"],
+        "nextCursor": page["nextCursor"],
+        "rowCount": row_count,
+    })
+
+
 # ── Voice (Gradium proxy) ──
 
 
@@ -287,7 +663,18 @@ async def voice_stt_websocket(client_ws: WebSocket) -> None:
         await client_ws.close(code=1011)
         return
 
+    import websockets
+
     await client_ws.accept()
+    try:
+        slot = await voice_pool.acquire()
+    except Overloaded as exc:
+        await client_ws.send_text(
+            json.dumps({"type": "error", "detail": str(exc), "retryAfter": exc.retry_after_s})
+        )
+        # 1013: try again later
+        await client_ws.close(code=1013)
+        return
     gradium_url = _gradium_ws_url("stt")
 
     try:
@@ -337,6 +724,8 @@ async def voice_stt_websocket(client_ws: WebSocket) -> None:
             await client_ws.send_text(json.dumps({"type": "error", "detail": str(exc)}))
         finally:
             await client_ws.close(code=1011)
+    finally:
+        slot.release()
 
 
 @router.post("/api/voice/tts")
@@ -358,8 +747,14 @@ async def voice_tts(request: TTSRequest) -> Response:
     headers = {"x-api-key": settings.gradium_api_key}
     tts_url = _gradium_http_tts_url()
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(tts_url, json=payload, headers=headers)
+    import httpx
+
+    slot = await _admit(voice_pool)
+    try:
+        async with httpx.AsyncClient(timeout=60) as client:
+            resp = await client.post(tts_url, json=payload, headers=headers)
+    finally:
+        slot.release()
 
     if resp.status_code >= 400:
         logger.error("Gradium TTS failed", extra={"status": resp.status_code, "detail": resp.text})
@@ -0,0 +1,296 @@
+"""Negotiated response compression (zstd / br / gzip).
+
+``CompressionMiddleware`` is a plain ASGI middleware so it can see every body
+chunk as the app sends it:
+
+* Buffered responses (a single body message) are compressed in one shot when
+  they are at least ``minimum_size`` bytes; smaller ones go out untouched.
+* Streaming responses (``more_body=True``) hold back their first chunks
+  until ``minimum_size`` bytes have accumulated or ``max_delay_s`` has passed,
+  so a run of tiny step events is coalesced instead of each one paying the
+  encoder's header and flush overhead; a stream that ends below the threshold
+  goes out uncompressed.  Once compression starts, one compressor serves the
+  whole stream and is flushed after every chunk, so each SSE event reaches
+  the client as soon as it is yielded.  Because the compressor window already
+  holds the previous events, repetitive step/content events shrink to a few
+  bytes.
+
+brotli and zstd are used when their modules (``brotli``, ``zstandard``) are
+installed (``uv sync --extra compression``); gzip is always available.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+class _Compressor(Protocol):
+    """Incremental compressor: ``compress`` + ``flush`` per chunk, ``finish`` once."""
+
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipCompressor:
+    def __init__(self, level: int = 6) -> None:
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+def _brotli_factory() -> Optional[Callable[[], _Compressor]]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+
+    class _BrotliCompressor:
+        def __init__(self) -> None:
+            # Quality 11 is far too slow for dynamic responses
+            self._obj = brotli.Compressor(quality=5)
+
+        def compress(self, data: bytes) -> bytes:
+            return self._obj.process(data)
+
+        def flush(self) -> bytes:
+            return self._obj.flush()
+
+        def finish(self) -> bytes:
+            return self._obj.finish()
+
+    return _BrotliCompressor
+
+
+def _zstd_factory() -> Optional[Callable[[], _Compressor]]:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+
+    class _ZstdCompressor:
+        def __init__(self) -> None:
+            self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+        def compress(self, data: bytes) -> bytes:
+            return self._obj.compress(data)
+
+        def flush(self) -> bytes:
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+        def finish(self) -> bytes:
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+    return _ZstdCompressor
+
+
+def available_encodings() -> Dict[str, Callable[[], _Compressor]]:
+    encodings: Dict[str, Callable[[], _Compressor]] = {"gzip": _GzipCompressor}
+    for name, factory in (("br", _brotli_factory()), ("zstd", _zstd_factory())):
+        if factory is not None:
+            encodings[name] = factory
+    return encodings
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Map each coding in an ``Accept-Encoding`` header to its q-value."""
+    accepted: Dict[str, float] = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, raw = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header: str, preference: Iterable[str]) -> Optional[str]:
+    """Pick the client's highest-q coding, breaking ties by server preference."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best: Optional[str] = None
+    best_q = 0.0
+    for coding in preference:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encodings: Iterable[str] = ("zstd", "br", "gzip"),
+        max_delay_s: float = 0.05,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_delay_s = max_delay_s
+        available = available_encodings()
+        self.encoders = {name: available[name] for name in encodings if name in available}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.encoders:
+            await self.app(scope, receive, send)
+            return
+        header = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate_encoding(header, self.encoders) if header else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(
+            send, encoding, self.encoders[encoding], self.minimum_size, self.max_delay_s
+        )
+        try:
+            await self.app(scope, receive, responder)
+        finally:
+            responder.cancel_timer()
+
+
+class _CompressionResponder:
+    def __init__(
+        self,
+        send: Send,
+        encoding: str,
+        factory: Callable[[], _Compressor],
+        minimum_size: int,
+        max_delay_s: float,
+    ) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self.max_delay_s = max_delay_s
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        # The delay timer sends from its own task, so sends are serialised
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.timer_task: Optional[asyncio.Task] = None
+
+    async def __call__(self, message: Message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        async with self.lock:
+            if self.compressor is not None:
+                await self._send_compressed(body, more_body)
+                return
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if not more_body:
+                self.cancel_timer()
+                await self._send_buffered()
+            elif self.pending_size >= self.minimum_size:
+                self.cancel_timer()
+                await self._start_stream()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(
+                    self.max_delay_s, self._on_timer
+                )
+
+    def cancel_timer(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.timer_task is not None and asyncio.current_task() is not self.timer_task:
+            self.timer_task.cancel()
+            self.timer_task = None
+
+    def _on_timer(self) -> None:
+        self.timer = None
+        self.timer_task = asyncio.ensure_future(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        async with self.lock:
+            if self.compressor is None and self.start is not None:
+                await self._start_stream()
+
+    async def _send_buffered(self) -> None:
+        """The whole body is known: compress it in one shot or send it as is."""
+        body = b"".join(self.pending)
+        self.pending = []
+        start, self.start = self.start, None
+        assert start is not None
+        if len(body) < self.minimum_size:
+            self.passthrough = True
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        compressor = self.factory()
+        payload = compressor.compress(body) + compressor.finish()
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(payload))
+        headers.add_vary_header("Accept-Encoding")
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": payload})
+
+    async def _start_stream(self) -> None:
+        body = b"".join(self.pending)
+        self.pending = []
+        start, self.start = self.start, None
+        assert start is not None
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        del headers["Content-Length"]
+        self.compressor = self.factory()
+        await self.send(start)
+        await self._send_compressed(body, more_body=True)
+
+    async def _send_compressed(self, body: bytes, more_body: bool) -> None:
+        assert self.compressor is not None
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -14,17 +14,92 @@ REPO_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = REPO_ROOT / "data"
 DEFAULT_DB_PATH = DATA_DIR / "finance.db"
 
+_DB_PATH = os.getenv("FINANCE_DB_PATH", str(DEFAULT_DB_PATH))
+
 
 @dataclass(frozen=True)
 class Settings:
     api_title: str = "FinanceFlip API"
     api_version: str = "0.1.0"
-    db_path: str = os.getenv("FINANCE_DB_PATH", str(DEFAULT_DB_PATH))
+    db_path: str = _DB_PATH
+    snapshot_dir: str = os.getenv(
+        "FINANCE_SNAPSHOT_DIR", str(Path(_DB_PATH).parent / "snapshots")
+    )
+    snapshot_poll_interval_s: float = float(os.getenv("FINANCE_SNAPSHOT_POLL_S", "1.0"))
+    dashboard_db_path: str = os.getenv(
+        "DASHBOARD_DB_PATH", str(Path(_DB_PATH).parent / "dashboards.sqlite")
+    )
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+    # DuckDB engine limits per opened snapshot: 0 / "" keep DuckDB's defaults
+    duckdb_threads: int = int(os.getenv("DUCKDB_THREADS", "4"))
+    duckdb_memory_limit: str = os.getenv("DUCKDB_MEMORY_LIMIT", "2GB")
+    duckdb_temp_directory: str = os.getenv("DUCKDB_TEMP_DIRECTORY", "")
+    duckdb_query_timeout_s: float = float(os.getenv("DUCKDB_QUERY_TIMEOUT_S", "20"))
+    query_max_estimated_rows: int = int(os.getenv("QUERY_MAX_ESTIMATED_ROWS", "50000000"))
+    slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", "500"))  # 0 disables the slow-query log
+    slow_query_log_path: str = os.getenv(
+        "SLOW_QUERY_LOG_PATH", str(Path(_DB_PATH).parent / "slow_queries.jsonl")
+    )
+    slow_query_log_max_bytes: int = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    slow_query_log_backups: int = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+    slow_query_summary_s: float = float(os.getenv("SLOW_QUERY_SUMMARY_S", "300"))
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-5")
     gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    json_encoder: str = os.getenv("JSON_ENCODER", "auto")  # auto | orjson | json
+    compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    compression_encodings: List[str] = field(
+        default_factory=lambda: [
+            encoding.strip()
+            for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+            if encoding.strip()
+        ]
+    )
+    router_mode: str = os.getenv("ROUTER_MODE", "model")  # model | rules | off
+    router_model: str = os.getenv("ROUTER_MODEL", "gemini-2.5-flash-lite")
+    router_timeout_s: float = float(os.getenv("ROUTER_TIMEOUT_S", "3"))
+    trace_memory_enabled: bool = os.getenv("TRACE_MEMORY_ENABLED", "true").lower() in {"1", "true", "yes"}
+    trace_db_path: str = os.getenv("TRACE_DB_PATH", str(Path(_DB_PATH).parent / "traces.sqlite"))
+    trace_examples: int = int(os.getenv("TRACE_EXAMPLES", "3"))
+    trace_min_score: float = float(os.getenv("TRACE_MIN_SCORE", "0.3"))
+    trace_replay_score: float = float(os.getenv("TRACE_REPLAY_SCORE", "0.9"))
+    trace_max_entries: int = int(os.getenv("TRACE_MAX_ENTRIES", "1000"))
+    results_db_path: str = os.getenv("RESULTS_DB_PATH", str(Path(_DB_PATH).parent / "results.sqlite"))
+    results_max_handles: int = int(os.getenv("RESULTS_MAX_HANDLES", "10000"))
+    results_page_rows: int = int(os.getenv("RESULTS_PAGE_ROWS", "200"))
+    results_max_page_rows: int = int(os.getenv("RESULTS_MAX_PAGE_ROWS", "1000"))
+    agent_graph: str = os.getenv("AGENT_GRAPH", "react")  # react | plan
+    plan_max_calls: int = int(os.getenv("PLAN_MAX_CALLS", "12"))
+    agent_budget_s: float = float(os.getenv("AGENT_BUDGET_S", "45"))
+    agent_finalize_reserve_s: float = float(os.getenv("AGENT_FINALIZE_RESERVE_S", "8"))
+    disconnect_poll_s: float = float(os.getenv("DISCONNECT_POLL_S", "0.5"))
+    max_concurrent_queries: int = int(os.getenv("MAX_CONCURRENT_QUERIES", "4"))
+    max_concurrent_streams: int = int(os.getenv("MAX_CONCURRENT_STREAMS", "8"))
+    max_voice_sessions: int = int(os.getenv("MAX_VOICE_SESSIONS", "4"))
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+    admission_max_wait_s: float = float(os.getenv("ADMISSION_MAX_WAIT_S", "10"))
+    stream_buffer_store: str = os.getenv("STREAM_BUFFER_STORE", "memory")  # memory | sqlite
+    stream_buffer_path: str = os.getenv(
+        "STREAM_BUFFER_PATH", str(Path(_DB_PATH).parent / "streams.sqlite")
+    )
+    stream_buffer_ttl_s: float = float(os.getenv("STREAM_BUFFER_TTL_S", "120"))
+    stream_buffer_max_bytes: int = int(os.getenv("STREAM_BUFFER_MAX_BYTES", str(1024 * 1024)))
+    stream_buffer_max_runs: int = int(os.getenv("STREAM_BUFFER_MAX_RUNS", "256"))
+    stream_buffer_poll_s: float = float(os.getenv("STREAM_BUFFER_POLL_S", "0.25"))
+    stream_resume_grace_s: float = float(os.getenv("STREAM_RESUME_GRACE_S", "15"))
+    session_max_count: int = int(os.getenv("SESSION_MAX_COUNT", "500"))
+    session_ttl_s: float = float(os.getenv("SESSION_TTL_S", "1800"))
+    session_max_bytes: int = int(os.getenv("SESSION_MAX_BYTES", str(2 * 1024 * 1024)))
+    session_max_turns: int = int(os.getenv("SESSION_MAX_TURNS", "6"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+    llm_requests_per_s: float = float(os.getenv("LLM_REQUESTS_PER_S", "2.0"))
+    llm_burst: int = int(os.getenv("LLM_BURST", "4"))
+    prefetch_enabled: bool = os.getenv("PREFETCH_ENABLED", "true").lower() in {"1", "true", "yes"}
+    prefetch_max_queries: int = int(os.getenv("PREFETCH_MAX_QUERIES", "6"))
+    prewarm_on_startup: bool = os.getenv("PREWARM_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
     cors_origins: List[str] = field(
         default_factory=lambda: [
             origin.strip()
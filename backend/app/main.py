@@ -1,13 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
 from app.core.logging import configure_logging
 from app.api.routes import router as api_router
+from app.services.db import db_service
+from app.services.slow_log import slow_query_log
+from app.services.warmup import start_warmup, warmup_state
 
 configure_logging()
 
-app = FastAPI(title=settings.api_title, version=settings.api_version)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if settings.prewarm_on_startup:
+        warmup_task = start_warmup()
+    else:
+        warmup_state.status = "skipped"
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+    db_service.close()
+    slow_query_log.close()
+
+
+app = FastAPI(title=settings.api_title, version=settings.api_version, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,5 +40,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    encodings=settings.compression_encodings,
+)
 
 app.include_router(api_router)
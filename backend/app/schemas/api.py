@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class ChaosState(BaseModel):
@@ -22,9 +22,69 @@ class DashboardSpec(BaseModel):
     chaos: Optional[ChaosState] = None
 
 
+def validate_dashboard_structure(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a normalized spec's shape without walking block data.
+
+    Returns the same structure as ``DashboardSpec.model_validate(spec).model_dump()``,
+    but ``props`` are checked only for being objects and passed through as-is,
+    so large data arrays are never copied.
+    """
+    blocks = spec.get("blocks", [])
+    if not isinstance(blocks, list):
+        raise ValueError("dashboardSpec.blocks must be a list")
+    checked = []
+    for index, block in enumerate(blocks):
+        if not isinstance(block, dict) or not isinstance(block.get("type"), str):
+            raise ValueError(f"Block {index}: missing or invalid type")
+        props = block.get("props", {})
+        if not isinstance(props, dict):
+            raise ValueError(f"Block {index}: props must be an object")
+        checked.append({"type": block["type"], "props": props})
+
+    chaos = spec.get("chaos")
+    return {
+        "blocks": checked,
+        "chaos": ChaosState.model_validate(chaos).model_dump() if chaos is not None else None,
+    }
+
+
 class QueryRequest(BaseModel):
     message: str
     currentChaos: Optional[Dict[str, Any]] = None
+    # Latency budget for the agent run; defaults to AGENT_BUDGET_S
+    timeBudgetMs: Optional[int] = Field(default=None, gt=0)
+    # Continue a conversation; a new session is started when missing or expired
+    sessionId: Optional[str] = Field(default=None, max_length=64)
+
+
+class BatchQueryRequest(BaseModel):
+    """Either explicit ``messages`` or a ``template`` expanded once per ticker."""
+
+    messages: Optional[List[str]] = None
+    tickers: Optional[List[str]] = None
+    # e.g. "Morning report for {ticker}: price, KPIs and news"
+    template: Optional[str] = None
+    currentChaos: Optional[Dict[str, Any]] = None
+    timeBudgetMs: Optional[int] = Field(default=None, gt=0)
+    # Items run at once; capped by BATCH_MAX_CONCURRENCY
+    concurrency: Optional[int] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def _check_items(self) -> "BatchQueryRequest":
+        if self.messages and (self.tickers or self.template):
+            raise ValueError("Give either messages or tickers with a template, not both")
+        if not self.messages:
+            if not self.tickers or not self.template:
+                raise ValueError("Give messages, or tickers with a template")
+            if "{ticker}" not in self.template:
+                raise ValueError("template must contain {ticker}")
+        return self
+
+    def items(self) -> List[str]:
+        if self.messages:
+            return list(self.messages)
+        assert self.tickers is not None and self.template is not None
+        return [self.template.replace("{ticker}", t.strip().upper()) for t in self.tickers]
 
 
 class QueryResponse(BaseModel):
@@ -32,6 +92,22 @@ class QueryResponse(BaseModel):
     assistantMessage: str
     intent: str
     queryMetadata: Dict[str, Any] = Field(default_factory=dict)
+    # Present when the dashboard can be saved and refreshed without the agent
+    dashboardTemplate: Optional[Dict[str, Any]] = None
+    # Send back as sessionId to ask a follow-up
+    sessionId: Optional[str] = None
+
+
+class DashboardTemplate(BaseModel):
+    """Placeholder spec plus the data-tool call behind each ``QUERY_RESULT_N``."""
+
+    spec: Dict[str, Any]
+    sources: List[Dict[str, Any]]
+
+
+class SaveDashboardRequest(BaseModel):
+    name: str = Field(min_length=1, max_length=200)
+    template: DashboardTemplate
 
 
 class TTSRequest(BaseModel):
@@ -0,0 +1,283 @@
+"""Admission control for agent and voice requests.
+
+Every expensive endpoint draws a slot from a named ``AdmissionPool`` before
+doing any work.  A pool runs at most ``limit`` requests at once; further
+requests wait in a bounded priority queue (interactive before batch, FIFO
+within a priority) for at most ``max_wait_s``.  When the queue is full or the
+wait runs out, ``Overloaded`` is raised and the route answers ``503`` with a
+``Retry-After`` estimated from recent service times, so clients back off
+instead of piling up behind a saturated worker.
+
+Upstream LLM calls are additionally paced by a ``TokenBucket`` that the
+Gemini client uses as its LangChain rate limiter, so a burst of admitted
+runs cannot exceed the provider's request rate.
+
+``admission.snapshot()`` reports queue depth, in-flight counts and wait times
+for ``GET /api/admission``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+from app.core.config import settings
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+# Samples kept for wait-time percentiles and the service-time estimate
+_WINDOW = 256
+
+
+class Overloaded(Exception):
+    """Raised when a pool cannot admit a request; carries a Retry-After hint."""
+
+    def __init__(self, pool: str, retry_after_s: int, reason: str) -> None:
+        super().__init__(f"{pool} is overloaded ({reason}); retry in {retry_after_s}s")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+        self.reason = reason
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+
+class Slot:
+    """One admitted request; ``release`` is idempotent."""
+
+    def __init__(self, pool: "AdmissionPool") -> None:
+        self._pool = pool
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(time.monotonic() - self._started)
+
+
+class AdmissionPool:
+    """Concurrency cap plus bounded priority wait queue for one endpoint."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_s: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waits_ms: Deque[float] = deque(maxlen=_WINDOW)
+        self._service_s: Deque[float] = deque(maxlen=_WINDOW)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def retry_after_s(self) -> int:
+        """Rough time until a newly queued request would start."""
+        service = sum(self._service_s) / len(self._service_s) if self._service_s else 5.0
+        return max(1, math.ceil(service * (self.queued + 1) / max(self.limit, 1)))
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> Slot:
+        start = time.monotonic()
+        if self.active < self.limit and not self.queued:
+            return self._admit(start)
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after_s(), "queue full")
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait_s)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._prune()
+                self.timed_out += 1
+                raise Overloaded(self.name, self.retry_after_s(), "queue wait exceeded")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller went away
+                self.active -= 1
+                self._wake_next()
+            else:
+                future.cancel()
+                self._prune()
+            raise
+        return self._admit(start, handed_over=True)
+
+    def _admit(self, start: float, handed_over: bool = False) -> Slot:
+        # A handed-over slot was already counted by _wake_next
+        if not handed_over:
+            self.active += 1
+        self.admitted += 1
+        self._waits_ms.append((time.monotonic() - start) * 1000)
+        return Slot(self)
+
+    def _release(self, held_s: float) -> None:
+        self._service_s.append(held_s)
+        self.active -= 1
+        self._wake_next()
+
+    def _prune(self) -> None:
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+        heapq.heapify(self._waiters)
+
+    def _wake_next(self) -> None:
+        while self._waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[Slot]:
+        slot = await self.acquire(priority)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = list(self._waits_ms)
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "maxQueue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timedOut": self.timed_out,
+            "waitMsAvg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+            "waitMsP95": round(_percentile(waits, 0.95), 1),
+            "waitMsMax": round(max(waits), 1) if waits else 0.0,
+        }
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate_per_s`` tokens refill up to ``burst``."""
+
+    def __init__(self, rate_per_s: float, burst: int) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.delayed = 0
+        self.wait_s_total = 0.0
+
+    def _take(self) -> float:
+        """Take a token if available; otherwise return seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_per_s
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if self.rate_per_s <= 0:
+            return True
+        start = time.monotonic()
+        delay = self._take()
+        if delay and not blocking:
+            return False
+        while delay:
+            time.sleep(delay)
+            delay = self._take()
+        self._record_wait(time.monotonic() - start)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if self.rate_per_s <= 0:
+            return True
+        start = time.monotonic()
+        delay = self._take()
+        if delay and not blocking:
+            return False
+        while delay:
+            await asyncio.sleep(delay)
+            delay = self._take()
+        self._record_wait(time.monotonic() - start)
+        return True
+
+    def _record_wait(self, waited_s: float) -> None:
+        if waited_s > 0.001:
+            with self._lock:
+                self.delayed += 1
+                self.wait_s_total += waited_s
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ratePerS": self.rate_per_s,
+            "burst": self.burst,
+            "granted": self.granted,
+            "delayed": self.delayed,
+            "waitMsTotal": round(self.wait_s_total * 1000, 1),
+        }
+
+
+def as_langchain_rate_limiter(bucket: TokenBucket) -> Any:
+    """Wrap ``bucket`` for ``BaseChatModel(rate_limiter=...)`` (imports langchain lazily)."""
+    from langchain_core.rate_limiters import BaseRateLimiter
+
+    class _BucketRateLimiter(BaseRateLimiter):
+        def acquire(self, *, blocking: bool = True) -> bool:
+            return bucket.acquire(blocking=blocking)
+
+        async def aacquire(self, *, blocking: bool = True) -> bool:
+            return await bucket.aacquire(blocking=blocking)
+
+    return _BucketRateLimiter()
+
+
+class AdmissionController:
+    def __init__(self) -> None:
+        self.pools: Dict[str, AdmissionPool] = {}
+        self.llm_bucket = TokenBucket(settings.llm_requests_per_s, settings.llm_burst)
+
+    def add_pool(self, name: str, limit: int) -> AdmissionPool:
+        pool = AdmissionPool(
+            name,
+            limit=limit,
+            max_queue=settings.admission_max_queue,
+            max_wait_s=settings.admission_max_wait_s,
+        )
+        self.pools[name] = pool
+        return pool
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pools": {name: pool.snapshot() for name, pool in self.pools.items()},
+            "llm": self.llm_bucket.snapshot(),
+        }
+
+
+admission = AdmissionController()
+query_pool = admission.add_pool("query", settings.max_concurrent_queries)
+stream_pool = admission.add_pool("stream", settings.max_concurrent_streams)
+voice_pool = admission.add_pool("voice", settings.max_voice_sessions)
@@ -2,45 +2,145 @@
 
 Uses Gemini (via langchain-google-genai) as the LLM inside a LangGraph
 ReAct agent with DuckDB tools.  Replaces the old single-shot LLMService.
+
+The LangChain / LangGraph / Gemini imports cost over a second, so they are
+deferred to graph construction; the app lifespan pre-builds the graph in
+the background (see ``app.services.warmup``).
+
+Every run has a wall-clock ``AgentBudget``.  LLM turns and tool calls are
+timed against it, and once only the finalization reserve is left the graph
+is stopped and the model is asked, without tools, for a dashboard built from
+the tool results gathered so far.  If even that does not fit, a dashboard is
+assembled from the raw results.  Either way the result is flagged ``partial``.
+
+A run may belong to a ``Session`` (see ``app.services.sessions``): earlier
+turns are replayed as a compacted history, earlier tool results are reused as
+the first ``QUERY_RESULT_N`` placeholders and the previous spec is offered as
+the starting point, so follow-ups only fetch incremental data.
+
+Similar questions answered before are looked up in the trace memory (see
+``app.services.traces``): the nearest are shown to the model as examples, and
+a near-identical one is replayed, running its calls with the new tickers and
+numbers and leaving the model a single synthesis call.
+
+Before the graph starts, the likely queries for the message are prefetched
+into the SQL cache (see ``app.services.prefetch``).
+
+Messages are routed first (see ``app.services.cascade``): chaos commands and
+small talk are answered by local rules or a fast model without running the
+graph; only data questions reach the agent model.
+
+A run can watch its client connection: when the client goes away the graph
+is cancelled (aborting the pending LLM call), the run's DuckDB statements are
+interrupted, its unread prefetched results are dropped and ``RunCancelled``
+is raised (see ``app.services.cancellation``).
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any, AsyncGenerator, Dict, Optional
-
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.prebuilt import create_react_agent
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from app.core.config import settings
-from app.services.prompts import build_agent_prompt
-from app.services.tools import get_all_tools
+from app.services.cancellation import (
+    RunCancelled,
+    RunScope,
+    cancellation_stats,
+    scoped_context,
+    settle,
+    watch_disconnect,
+)
+from app.services.cascade import route_message
+from app.services.db import db_service
+from app.services.mentions import known_tickers
+from app.services.planner import PLAN_TAG
+from app.services.prefetch import Prefetch
+from app.services.prompts import REPLAY_LAYOUT_PROMPT, build_agent_prompt
+from app.services.traces import Slots, trace_stats, trace_store
 from app.utils.json_tools import parse_json_from_text
 
+if TYPE_CHECKING:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from app.services.sessions import Session
+    from app.services.traces import TraceMatch
+
 logger = logging.getLogger(__name__)
 
 
-def _build_llm() -> ChatGoogleGenerativeAI:
-    """Construct the Gemini chat model."""
+def _build_llm(model: Optional[str] = None) -> "ChatGoogleGenerativeAI":
+    """Construct a Gemini chat model, paced by the shared LLM token bucket."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from app.services.admission import admission, as_langchain_rate_limiter
+
     return ChatGoogleGenerativeAI(
-        model=settings.gemini_model,
+        model=model or settings.gemini_model,
         google_api_key=settings.gemini_api_key,
         temperature=0.2,
         convert_system_message_to_human=True,
+        rate_limiter=as_langchain_rate_limiter(admission.llm_bucket),
     )
 
 
+# Module-level singletons (lazy)
+_llm = None
+_router_llm = None
+_graph = None
+_replay_graph = None
+
+
+def _get_llm() -> "ChatGoogleGenerativeAI":
+    global _llm
+    if _llm is None:
+        _llm = _build_llm()
+    return _llm
+
+
+def _get_router_llm() -> Optional["ChatGoogleGenerativeAI"]:
+    """The cascade's fast model, or None when routing uses the local rules only."""
+    global _router_llm
+    if settings.router_mode != "model" or not settings.gemini_api_key:
+        return None
+    if _router_llm is None:
+        _router_llm = _build_llm(settings.router_model)
+    return _router_llm
+
+
 def _build_graph():
-    """Build a LangGraph ReAct agent wired to Gemini + FinanceFlip tools."""
-    llm = _build_llm()
-    tools = get_all_tools()
-    return create_react_agent(llm, tools).with_config({"recursion_limit": 50})
+    """Build the agent graph wired to Gemini + FinanceFlip tools.
 
+    ``AGENT_GRAPH=react`` (default) is a LangGraph ReAct agent;
+    ``AGENT_GRAPH=plan`` is the plan-then-execute graph from
+    ``app.services.planner``, which falls back to the ReAct agent.
+    """
+    from langgraph.prebuilt import create_react_agent
 
-# Module-level singleton (lazy)
-_graph = None
+    from app.services.tools import get_all_tools
+
+    llm = _get_llm()
+    tools = get_all_tools()
+    react = create_react_agent(llm, tools).with_config({"recursion_limit": 50})
+    if settings.agent_graph == "plan":
+        from app.services.planner import build_plan_graph
+
+        return build_plan_graph(llm, tools, react)
+    return react
 
 
 def _get_graph():
@@ -50,6 +150,194 @@ def _get_graph():
     return _graph
 
 
+def _get_replay_graph():
+    """Plan graph used to replay remembered calls: execute, then synthesize."""
+    global _replay_graph
+    if _replay_graph is None:
+        if settings.agent_graph == "plan":
+            _replay_graph = _get_graph()
+        else:
+            from app.services.planner import build_plan_graph
+            from app.services.tools import get_all_tools
+
+            _replay_graph = build_plan_graph(_get_llm(), get_all_tools(), _get_graph())
+    return _replay_graph
+
+
+def _replay_calls(match: "TraceMatch", slots: Slots) -> Optional[List[Dict[str, Any]]]:
+    """A remembered trace's calls for this question, or None if they do not validate."""
+    from app.services.planner import PLAN_TOOLS, PlanError, validate_plan
+    from app.services.tools import get_all_tools
+
+    tools = {t.name: t for t in get_all_tools() if t.name in PLAN_TOOLS}
+    calls = [{"tool": c.get("tool"), "args": c.get("args")} for c in slots.fill(match.calls)]
+    try:
+        return validate_plan(json.dumps({"calls": calls}), tools, settings.plan_max_calls)
+    except PlanError as exc:
+        logger.info("Trace for %r not replayed: %s", match.template, exc)
+        return None
+
+
+def _initial_messages(
+    system_prompt: str, message: str, history: Sequence[Tuple[str, str]] = ()
+) -> List[Any]:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+    messages: List[Any] = [SystemMessage(content=system_prompt)]
+    for question, reply in history:
+        messages += [HumanMessage(content=question), AIMessage(content=reply)]
+    messages.append(HumanMessage(content=message))
+    return messages
+
+
+class AgentBudget:
+    """Wall-clock latency budget for one agent run.
+
+    ``reserve_s`` is held back for the forced final answer; the graph itself
+    may only use ``run_remaining()``.
+    """
+
+    def __init__(self, total_s: float, reserve_s: float) -> None:
+        self.total_s = total_s
+        self.reserve_s = min(reserve_s, total_s / 2)
+        self.started = time.monotonic()
+        self.steps = 0
+        self.llm_s = 0.0
+        self.tool_s = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.total_s - self.elapsed()
+
+    def run_remaining(self) -> float:
+        return self.remaining() - self.reserve_s
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "budgetMs": int(self.total_s * 1000),
+            "elapsedMs": int(self.elapsed() * 1000),
+            "llmMs": int(self.llm_s * 1000),
+            "toolMs": int(self.tool_s * 1000),
+            "steps": self.steps,
+            "inputTokens": self.input_tokens,
+            "outputTokens": self.output_tokens,
+        }
+
+
+FORCE_FINALIZE_PROMPT = """\
+The time budget for this answer is almost used up. Do not call any more tools.
+Using only the tool results below (QUERY_RESULT_N is the N-th result, in call order),
+reply now in the required output format with the best dashboard you can build.
+Mention in assistantMessage that the answer is based on partial data.
+
+{results}
+"""
+
+# Rows of each tool result shown to the model when forcing a final answer
+_PREVIEW_ROWS = 3
+
+
+def _describe_tool_results(tool_results: List[List[Any]]) -> str:
+    if not tool_results:
+        return "(no tool results were collected)"
+    lines = []
+    for index, rows in enumerate(tool_results):
+        preview = json.dumps(rows[:_PREVIEW_ROWS], default=str)
+        lines.append(f"QUERY_RESULT_{index}: {len(rows)} rows, first rows: {preview}")
+    return "\n".join(lines)
+
+
+def _partial_dashboard(
+    tool_results: List[List[Any]], current_chaos: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Dashboard assembled from raw tool results, without another LLM call."""
+    blocks: List[Dict[str, Any]] = [{
+        "type": "executive-summary",
+        "props": {
+            "content": "The analysis ran out of time; showing the data gathered so far.",
+        },
+    }]
+    for index, rows in enumerate(tool_results):
+        if not rows or not isinstance(rows[0], dict):
+            continue
+        columns = set(rows[0])
+        placeholder = f"QUERY_RESULT_{index}"
+        if {"metric", "value", "changeDirection"} <= columns:
+            blocks.extend(
+                {"type": "kpi-card", "props": f"{placeholder}[{item}]"} for item in range(len(rows))
+            )
+        elif {"entry_type", "title"} <= columns:
+            blocks.append({"type": "event-timeline", "props": {"events": placeholder}})
+        elif {"date", "close"} <= columns:
+            ticker = rows[0].get("ticker") or ""
+            blocks.append({
+                "type": "line-chart",
+                "props": {
+                    "title": f"{ticker} close".strip(),
+                    "data": placeholder,
+                    "xKey": "date",
+                    "yKeys": ["close"],
+                },
+            })
+    return {
+        "intent": "partial",
+        "assistantMessage": "I ran out of time before finishing the analysis. "
+        "Here is what I gathered so far.",
+        "dashboardSpec": {"blocks": blocks, "chaos": current_chaos or {}},
+    }
+
+
+async def _force_finalize(
+    message: str,
+    system_prompt: str,
+    tool_results: List[List[Any]],
+    current_chaos: Optional[Dict[str, Any]],
+    budget: AgentBudget,
+) -> Dict[str, Any]:
+    """Best-effort answer from the data gathered before the budget ran out."""
+    from langchain_core.messages import HumanMessage
+
+    parsed: Optional[Dict[str, Any]] = None
+    remaining = budget.remaining()
+    if remaining > 0:
+        messages = _initial_messages(system_prompt, message) + [
+            HumanMessage(content=FORCE_FINALIZE_PROMPT.format(
+                results=_describe_tool_results(tool_results)
+            ))
+        ]
+        started = time.monotonic()
+        try:
+            reply = await asyncio.wait_for(_get_llm().ainvoke(messages), timeout=remaining)
+            parsed = _parse_agent_result([reply], current_chaos)
+        except Exception:
+            logger.warning("Forced finalization failed; assembling dashboard from tool results")
+        finally:
+            budget.llm_s += time.monotonic() - started
+            budget.steps += 1
+    if not parsed or not parsed.get("dashboardSpec", {}).get("blocks"):
+        parsed = _partial_dashboard(tool_results, current_chaos)
+    parsed["toolResults"] = tool_results
+    parsed["partial"] = True
+    return parsed
+
+
+async def _anext(events: AsyncIterator[Any]) -> Any:
+    return await events.__anext__()
+
+
+async def _unless_disconnected(task: "asyncio.Task[Any]", disconnected: "asyncio.Future[Any]") -> Any:
+    """Wait for ``task``; cancel it and raise ``RunCancelled`` if the client leaves first."""
+    await asyncio.wait({task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    if not task.done():
+        await settle(task)
+        raise RunCancelled("client disconnected")
+    return task.result()
+
+
 def _extract_text(content: Any) -> str:
     """Extract text from a message content that may be str or list-of-parts."""
     if isinstance(content, str):
@@ -69,6 +357,8 @@ def _extract_text(content: Any) -> str:
 
 def _parse_agent_result(ai_messages: list, current_chaos: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Extract and parse the final JSON from agent messages, including tool results."""
+    from app.services.tools import DATA_TOOLS
+
     final_text = ""
     tool_results = []
 
@@ -76,7 +366,7 @@ def _parse_agent_result(ai_messages: list, current_chaos: Optional[Dict[str, Any
         # Detect tool results from run_query
         if getattr(msg, "type", "") == "tool" or (hasattr(msg, "tool_calls") and not getattr(msg, "tool_calls", None)):
             # In LangGraph/LangChain, ToolMessages have the result in .content
-            if getattr(msg, "name", "") == "run_query":
+            if getattr(msg, "name", "") in DATA_TOOLS:
                 try:
                     res = json.loads(getattr(msg, "content", "[]"))
                     if isinstance(res, list):
@@ -132,28 +422,31 @@ class AgentService:
         self,
         message: str,
         current_chaos: Optional[Dict[str, Any]] = None,
+        budget_s: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        session: Optional["Session"] = None,
     ) -> Dict[str, Any]:
-        """Run the agent and return the parsed JSON spec (non-streaming)."""
-        graph = _get_graph()
-        system_prompt = build_agent_prompt(current_chaos)
-
-        result = await graph.ainvoke({
-            "messages": [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=message),
-            ]
-        })
+        """Run the agent and return the parsed JSON spec (non-streaming).
 
-        ai_messages = result.get("messages", [])
-        if not ai_messages:
-            raise ValueError("Agent returned no messages")
-
-        return _parse_agent_result(ai_messages, current_chaos)
+        Shares the streaming run so both paths honour the same budget and
+        cancellation.
+        """
+        async for event in self.process_query_stream(
+            message, current_chaos, budget_s, is_disconnected=is_disconnected, session=session
+        ):
+            if event["event"] == "result":
+                return event["data"]
+            if event["event"] == "error":
+                raise RuntimeError(event["data"].get("detail", "Agent run failed"))
+        raise ValueError("Agent returned no messages")
 
     async def process_query_stream(
         self,
         message: str,
         current_chaos: Optional[Dict[str, Any]] = None,
+        budget_s: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        session: Optional["Session"] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """Run the agent and yield SSE events as it progresses.
 
@@ -162,30 +455,155 @@ class AgentService:
           - "step"  : agent thinking / tool call info
           - "result" : final parsed JSON response
           - "error"  : error message
-        """
-        graph = _get_graph()
-        system_prompt = build_agent_prompt(current_chaos)
 
-        inputs = {
-            "messages": [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=message),
-            ]
-        }
+        ``is_disconnected`` (e.g. Starlette's ``Request.is_disconnected``) is
+        polled during the run; once it reports True the run is cancelled and
+        ``RunCancelled`` is raised.  The same cleanup runs when the consumer
+        itself is cancelled.
+
+        With a ``session`` the run continues that conversation and the
+        finished turn is recorded in it.
+        """
+        from app.services.tools import DATA_TOOLS
+
+        decision = await route_message(message, current_chaos, _get_router_llm())
+        if decision.result is not None:
+            logger.info(
+                "Answered %s message via %s in %d ms without the agent",
+                decision.route, decision.method, decision.router_s * 1000,
+            )
+            parsed = {**decision.result, "routing": decision.as_dict()}
+            if session is not None and session.stored:
+                session.record(message, parsed, [], [], session.version or "")
+                parsed["sessionId"] = session.id
+            yield {"event": "result", "data": parsed}
+            return
+
+        budget = AgentBudget(budget_s or settings.agent_budget_s, settings.agent_finalize_reserve_s)
+        # Graph steps, tool threads and prefetch threads inherit the run scope
+        scope = RunScope()
+        run_context = scoped_context(scope)
+        if is_disconnected is not None:
+            disconnected = asyncio.ensure_future(
+                watch_disconnect(is_disconnected, settings.disconnect_poll_s)
+            )
+        else:
+            disconnected = asyncio.get_running_loop().create_future()
+        # Warm the cache with the queries this message will probably need
+        prefetch = Prefetch(message)
+        try:
+            await asyncio.create_task(prefetch.start(), context=run_context)
+        except BaseException:
+            disconnected.cancel()
+            raise
+        slots: Optional[Slots] = None
+        matches: List["TraceMatch"] = []
+        replay: Optional[List[Dict[str, Any]]] = None
+        if settings.trace_memory_enabled:
+            slots = Slots.of(message, await asyncio.to_thread(known_tickers))
+            try:
+                matches = await asyncio.to_thread(trace_store.nearest, message, slots, settings.trace_examples)
+            except Exception:
+                logger.warning("Trace lookup failed", exc_info=True)
+            if matches and matches[0].replayable(slots) and (session is None or session.empty):
+                replay = _replay_calls(matches[0], slots)
+        system_prompt = build_agent_prompt(
+            current_chaos, [m.example(slots) for m in matches] if slots is not None else None
+        ) + prefetch.hint()
+        if replay is not None:
+            layout = json.dumps(slots.fill(matches[0].spec), default=str)
+            system_prompt += REPLAY_LAYOUT_PROMPT.format(spec=layout)
 
         all_messages: list = []
         tool_results: list = []
+        # Tool name and arguments behind each entry of tool_results
+        tool_sources: List[Dict[str, Any]] = []
+        history: List[Tuple[str, str]] = []
+        version = ""
+        if session is not None:
+            version = await asyncio.to_thread(lambda: db_service.version)
+            tool_results, tool_sources = await session.load_results(version)
+            system_prompt += session.context_prompt()
+            history = session.history()
+
+        inputs = {
+            "messages": _initial_messages(system_prompt, message, history),
+            # Read by the plan graph to number new results after the session's
+            "result_offset": len(tool_results),
+        }
+        if replay is not None:
+            # The plan graph skips its planning call when the calls are given
+            inputs["calls"] = replay
+        graph = _get_replay_graph() if replay is not None else _get_graph()
+        tool_inputs: Dict[str, Any] = {}
         step_count = 0
         in_json_block = False
-
+        out_of_time = False
+        started_at: Dict[str, float] = {}
+        next_event: Optional[asyncio.Task] = None
+        finished = False
+
+        def abandon(reason: str) -> None:
+            # Synchronous on purpose: a cancelled task may not get to await again
+            interrupted = scope.cancel(reason)
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+            prefetch.cancel()
+            running_tools = sum(1 for run_id in started_at if run_id in tool_inputs)
+            cancellation_stats.add(
+                runs=1,
+                llm_calls=len(started_at) - running_tools,
+                tool_calls=running_tools,
+                cache_entries_freed=prefetch.discard(),
+            )
+            logger.info(
+                "Agent run cancelled (%s) after %d steps; %d queries interrupted",
+                reason, budget.steps, interrupted,
+            )
+
+        events = graph.astream_events(inputs, version="v2")
         try:
-            async for event in graph.astream_events(inputs, version="v2"):
+            while True:
+                next_event = asyncio.create_task(_anext(events), context=run_context)
+                done, _ = await asyncio.wait(
+                    {next_event, disconnected},
+                    timeout=max(budget.run_remaining(), 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    raise RunCancelled("client disconnected")
+                if next_event not in done:
+                    await settle(next_event)
+                    out_of_time = True
+                    break
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    break
                 kind = event.get("event", "")
+                run_id = event.get("run_id", "")
+
+                if kind in ("on_tool_start", "on_chat_model_start"):
+                    started_at[run_id] = time.monotonic()
+                elif kind in ("on_tool_end", "on_chat_model_end") and run_id in started_at:
+                    spent = time.monotonic() - started_at.pop(run_id)
+                    if kind == "on_tool_end":
+                        budget.tool_s += spent
+                    else:
+                        budget.llm_s += spent
+                        budget.steps += 1
+                        usage = getattr(event.get("data", {}).get("output"), "usage_metadata", None) or {}
+                        budget.input_tokens += usage.get("input_tokens", 0)
+                        budget.output_tokens += usage.get("output_tokens", 0)
+                if kind.startswith("on_chat_model") and PLAN_TAG in event.get("tags", ()):
+                    # The planning call's output is a plan, not part of the answer
+                    continue
 
                 # Tool call started
                 if kind == "on_tool_start":
                     tool_name = event.get("name", "unknown")
                     tool_input = event.get("data", {}).get("input", "")
+                    tool_inputs[run_id] = tool_input
                     step_count += 1
                     yield {
                         "event": "step",
@@ -201,12 +619,16 @@ class AgentService:
                 elif kind == "on_tool_end":
                     tool_name = event.get("name", "unknown")
                     output = event.get("data", {}).get("output", "")
+                    # Tools called by the ReAct graph report a ToolMessage
+                    output = getattr(output, "content", output)
                     output_str = _extract_text(output) if not isinstance(output, str) else output
-                    if tool_name == "run_query":
+                    tool_input = tool_inputs.pop(run_id, None)
+                    if tool_name in DATA_TOOLS:
                         try:
                             parsed = json.loads(output_str)
                             if isinstance(parsed, list):
                                 tool_results.append(parsed)
+                                tool_sources.append({"tool": tool_name, "args": tool_input})
                         except Exception:
                             pass
                     yield {
@@ -259,22 +681,103 @@ class AgentService:
                     output = event.get("data", {}).get("output", None)
                     if output and hasattr(output, "content"):
                         all_messages.append(output)
-
-            # Parse the final result
-            if not all_messages:
-                raise ValueError("Agent returned no messages")
-
-            parsed = _parse_agent_result(all_messages, current_chaos)
-            if isinstance(parsed, dict) and tool_results and not parsed.get("toolResults"):
-                parsed["toolResults"] = tool_results
+            # Stop the graph before spending the reserve on a forced answer
+            await events.aclose()
+
+            if out_of_time:
+                logger.warning("Agent budget exhausted after %d steps; finalizing", budget.steps)
+                yield {
+                    "event": "step",
+                    "data": {"step": step_count, "type": "budget_exhausted", **budget.as_dict()},
+                }
+                parsed = await _unless_disconnected(
+                    asyncio.create_task(
+                        _force_finalize(message, system_prompt, tool_results, current_chaos, budget),
+                        context=run_context,
+                    ),
+                    disconnected,
+                )
+            else:
+                # Parse the final result
+                if not all_messages:
+                    raise ValueError("Agent returned no messages")
+
+                parsed = _parse_agent_result(all_messages, current_chaos)
+                if isinstance(parsed, dict) and tool_results and not parsed.get("toolResults"):
+                    parsed["toolResults"] = tool_results
+            if isinstance(parsed, dict):
+                if parsed.get("toolResults") is tool_results:
+                    parsed["toolSources"] = tool_sources
+                parsed["budget"] = budget.as_dict()
+                parsed["routing"] = decision.as_dict(agent_s=budget.elapsed())
+                if slots is not None:
+                    parsed["memory"] = await self._remember(
+                        message, slots, matches, replay is not None, parsed, tool_sources, budget,
+                    )
+                parsed["prefetch"] = await prefetch.finish()
+                if session is not None and session.stored:
+                    session.record(message, parsed, tool_results, tool_sources, version)
+                    parsed["sessionId"] = session.id
+            finished = True
             yield {"event": "result", "data": parsed}
 
+        except (RunCancelled, asyncio.CancelledError) as exc:
+            abandon(str(exc) or "request cancelled")
+            if isinstance(exc, RunCancelled) and next_event is not None:
+                await settle(next_event)
+            raise
+        except GeneratorExit:
+            # Closed by the consumer; only an unfinished run is abandoned work
+            if not finished:
+                abandon("stream closed")
+            raise
         except Exception as exc:
             logger.exception("Agent stream failed")
             yield {
                 "event": "error",
                 "data": {"detail": str(exc)},
             }
+        finally:
+            prefetch.cancel()
+            disconnected.cancel()
+            # A still-pending step owns the generator; cancelling it closes the graph
+            if next_event is None or next_event.done():
+                await events.aclose()
+
+
+    @staticmethod
+    async def _remember(
+        message: str,
+        slots: Slots,
+        matches: List["TraceMatch"],
+        replayed: bool,
+        parsed: Dict[str, Any],
+        tool_sources: List[Dict[str, Any]],
+        budget: AgentBudget,
+    ) -> Dict[str, Any]:
+        """Store a successful run as a trace and count what the trace memory saved."""
+        trace_stats.finished(bool(matches), matches[0] if replayed else None, budget.steps)
+        spec = parsed.get("dashboardSpec")
+        try:
+            if replayed:
+                await asyncio.to_thread(trace_store.used, matches[0].template)
+            elif (
+                tool_sources
+                and not parsed.get("partial")
+                and parsed.get("toolSources") is tool_sources
+                and isinstance(spec, dict)
+                and spec.get("blocks")
+            ):
+                await asyncio.to_thread(
+                    trace_store.record, message, slots, tool_sources, spec, budget.steps
+                )
+        except Exception:
+            logger.warning("Could not store the agent trace", exc_info=True)
+        return {
+            "examples": len(matches),
+            "topScore": round(matches[0].score, 3) if matches else None,
+            "replayed": replayed,
+        }
 
 
 agent_service = AgentService()
@@ -0,0 +1,142 @@
+"""Cancellation of agent runs whose client has gone away.
+
+Each agent run owns a ``RunScope``.  The scope is installed in a
+``contextvars`` context that the run's graph steps, tool threads and prefetch
+threads inherit, so ``DuckDBService`` can attach every cursor it executes on
+to the run that asked for it.  Cancelling the scope interrupts those cursors
+(``DuckDBPyConnection.interrupt()``) and makes later queries from the same run
+fail before they start.
+
+``watch_disconnect`` polls the client connection (Starlette's
+``Request.is_disconnected``) and returns once the client is gone; the agent
+races it against the graph so abandoned runs stop calling the LLM too.
+
+``cancellation_stats`` counts what was cut short; it is reported by
+``GET /api/admission``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Set
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+
+class RunCancelled(Exception):
+    """The run was cancelled (its client disconnected)."""
+
+
+class CancellationStats:
+    """Process-wide counters of abandoned work."""
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.queries_interrupted = 0
+        self.queries_skipped = 0
+        self.cache_entries_freed = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "llmCalls": self.llm_calls,
+                "toolCalls": self.tool_calls,
+                "queriesInterrupted": self.queries_interrupted,
+                "queriesSkipped": self.queries_skipped,
+                "cacheEntriesFreed": self.cache_entries_freed,
+            }
+
+
+cancellation_stats = CancellationStats()
+
+
+class RunScope:
+    """The DuckDB cursors one agent run is executing on, and its cancelled flag."""
+
+    def __init__(self) -> None:
+        self.cancelled = False
+        self.reason = ""
+        self._cursors: Set[duckdb.DuckDBPyConnection] = set()
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        if self.cancelled:
+            cancellation_stats.add(queries_skipped=1)
+            raise RunCancelled(self.reason)
+
+    @contextmanager
+    def running(self, cursor: duckdb.DuckDBPyConnection) -> Iterator[None]:
+        """Track ``cursor`` while it executes a statement for this run."""
+        with self._lock:
+            self.check()
+            self._cursors.add(cursor)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._cursors.discard(cursor)
+
+    def cancel(self, reason: str) -> int:
+        """Interrupt the statements still running; return how many were interrupted."""
+        with self._lock:
+            if self.cancelled:
+                return 0
+            self.cancelled = True
+            self.reason = reason
+            cursors = list(self._cursors)
+        for cursor in cursors:
+            try:
+                cursor.interrupt()
+            except duckdb.Error:
+                logger.warning("Could not interrupt a DuckDB statement", exc_info=True)
+        cancellation_stats.add(queries_interrupted=len(cursors))
+        return len(cursors)
+
+
+_current_scope: contextvars.ContextVar[Optional[RunScope]] = contextvars.ContextVar(
+    "run_scope", default=None
+)
+
+
+def current_scope() -> Optional[RunScope]:
+    return _current_scope.get()
+
+
+def scoped_context(scope: RunScope) -> contextvars.Context:
+    """A copy of the current context with ``scope`` installed, for the run's tasks."""
+    context = contextvars.copy_context()
+    context.run(_current_scope.set, scope)
+    return context
+
+
+def is_interrupt(exc: BaseException) -> bool:
+    return isinstance(exc, (RunCancelled, duckdb.InterruptException))
+
+
+async def watch_disconnect(
+    is_disconnected: Callable[[], Awaitable[bool]], poll_s: float
+) -> None:
+    """Return once ``is_disconnected()`` reports the client has gone."""
+    while not await is_disconnected():
+        await asyncio.sleep(poll_s)
+
+
+async def settle(task: "asyncio.Future[Any]") -> None:
+    """Cancel ``task`` and wait until it has actually stopped."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,197 @@
+"""Model cascade in front of the agent.
+
+Greetings, thanks and chaos commands ("matrix mode", "flip") end up as an
+empty dashboard, yet used to cost a full agent run on the analysis model.
+Each message is now routed first:
+
+1. Local rules: a message made only of chaos commands is answered directly
+   (the chaos object is updated here, exactly as the agent prompt describes);
+   small talk gets a canned reply; ticker symbols, company names or data
+   words ("price", "compare", "revenue", ...) send it straight to the agent.
+2. Anything the rules cannot place goes to a small, fast model
+   (``ROUTER_MODEL``) that either replies to the conversation or says the
+   message needs data.  Failures and timeouts escalate.
+3. Data questions run the full agent on ``GEMINI_MODEL``.
+
+``ROUTER_MODE`` selects how far down this list routing goes (``model``,
+``rules`` or ``off``).  The decision, the method that made it and the router
+and agent latencies are attached to every result as ``routing``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.mentions import TICKER_ALIASES
+from app.services.prompts import ROUTER_PROMPT
+from app.utils.json_tools import parse_json_from_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAOS: Dict[str, Any] = {
+    "rotation": 0,
+    "fontFamily": "Inter",
+    "animation": None,
+    "theme": "professional",
+}
+
+# (pattern, chaos update, what the reply says was done); mirrors CHAOS COMMANDS in the prompt
+CHAOS_COMMANDS: List[Tuple[re.Pattern, Dict[str, Any], str]] = [
+    (re.compile(r"\bprofessional mode\b"), DEFAULT_CHAOS, "back to professional mode"),
+    (re.compile(r"\b(flip(ped)?|upside down)\b"), {"rotation": 180}, "flipped upside down"),
+    (re.compile(r"\bcomic sans\b"), {"fontFamily": "Comic Sans MS"}, "Comic Sans on"),
+    (re.compile(r"\bwobble\b"), {"animation": "wobble"}, "wobbling"),
+    (re.compile(r"\brainbow\b"), {"animation": "rainbow"}, "rainbow on"),
+    (re.compile(r"\bmatrix( mode)?\b"), {"theme": "matrix"}, "matrix mode on"),
+]
+
+# Words that may surround chaos commands without making the message a question
+_FILLER = set(
+    "a an and activate can could do dashboard enable font for go it lets let's me mode "
+    "now on please put set some switch the theme to turn us use with you".split()
+)
+
+_SMALL_TALK: List[Tuple[re.Pattern, str]] = [
+    (
+        re.compile(r"^(hi|hello|hey|hiya|yo|good (morning|afternoon|evening))( there)?( how are you)?$"),
+        "Hi! Ask me about stocks, e.g. \"Compare AAPL and MSFT over the last quarter\", "
+        "and I'll build a dashboard.",
+    ),
+    (
+        re.compile(r"^(thanks|thank you|thx|ty|cheers)( (so|very) much| a lot)?$"),
+        "You're welcome! Ask me anything else about the markets.",
+    ),
+    (re.compile(r"^(bye|goodbye|see you|see ya)$"), "Bye! Come back any time."),
+    (
+        re.compile(r"^(help|who are you|what are you|what can you do|how does this work|how are you)$"),
+        "I'm FinanceFlip: ask about prices, fundamentals or news for any ticker in the "
+        "database and I'll answer with a dashboard. Try \"flip\" or \"matrix mode\" for fun.",
+    ),
+]
+
+_DATA_WORDS = re.compile(
+    r"\b(price|prices|stock|stocks|share|shares|chart|charts|compare|comparison|vs|versus|"
+    r"revenue|earnings|eps|margin|pe|p/e|market cap|valuation|dividend|volume|return|returns|"
+    r"performance|perform|trend|news|kpi|kpis|metric|metrics|sector|index|portfolio|ticker|"
+    r"tickers|close|closing|open|high|low|ytd|quarter|quarterly|annual|volatility|rally|"
+    r"drop|crash|sell-?off|candlestick|correlation|dashboard for|how did)\b"
+)
+# Symbols must be written in capitals, as in mentions.infer_tickers
+_SYMBOL = re.compile(r"(?<![A-Za-z0-9])\$?[A-Z]{2,5}(?![A-Za-z0-9])")
+
+
+@dataclass
+class RouteDecision:
+    """Where a message was routed, by what, and (for fast routes) the answer."""
+
+    route: str  # chaos | conversation | data
+    method: str  # rules | model | off
+    router_s: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+
+    @property
+    def tier(self) -> str:
+        return "full" if self.result is None else "fast"
+
+    def as_dict(self, agent_s: Optional[float] = None) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "tier": self.tier,
+            "method": self.method,
+            "routerMs": int(self.router_s * 1000),
+            "agentMs": None if agent_s is None else int(agent_s * 1000),
+        }
+
+
+def _normalize(message: str) -> str:
+    return re.sub(r"[^a-z0-9' /-]+", " ", message.lower()).strip()
+
+
+def apply_chaos(message: str, current_chaos: Optional[Dict[str, Any]]) -> Optional[Tuple[Dict[str, Any], List[str]]]:
+    """New chaos state and reply labels if ``message`` is nothing but chaos commands."""
+    text = _normalize(message)
+    chaos = {**DEFAULT_CHAOS, **(current_chaos or {})}
+    labels = []
+    for pattern, update, label in CHAOS_COMMANDS:
+        if pattern.search(text):
+            chaos.update(update)
+            labels.append(label)
+            text = pattern.sub(" ", text)
+    if not labels or set(text.split()) - _FILLER:
+        return None
+    return chaos, labels
+
+
+def classify(message: str) -> Optional[str]:
+    """Route decided by local rules, or None when the fast model should decide."""
+    if any(pattern.match(_normalize(message)) for pattern, _ in _SMALL_TALK):
+        return "conversation"
+    if _SYMBOL.search(message) or _DATA_WORDS.search(message.lower()):
+        return "data"
+    if any(re.search(rf"\b{name}\b", message, flags=re.IGNORECASE) for name in TICKER_ALIASES):
+        return "data"
+    return None
+
+
+def _answer(intent: str, reply: str, chaos: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "intent": intent,
+        "assistantMessage": reply,
+        "dashboardSpec": {"blocks": [], "chaos": chaos or {}},
+        "toolResults": [],
+    }
+
+
+async def _ask_model(llm: Any, message: str) -> Tuple[str, Optional[str]]:
+    from langchain_core.messages import HumanMessage
+
+    reply = await asyncio.wait_for(
+        llm.ainvoke([HumanMessage(content=ROUTER_PROMPT.format(message=message))]),
+        timeout=settings.router_timeout_s,
+    )
+    content = reply.content if isinstance(reply.content, str) else str(reply.content)
+    decision = parse_json_from_text(content)
+    if decision.get("route") == "conversation" and str(decision.get("assistantMessage") or "").strip():
+        return "conversation", str(decision["assistantMessage"])
+    return "data", None
+
+
+async def route_message(message: str, current_chaos: Optional[Dict[str, Any]], llm: Any = None) -> RouteDecision:
+    """Decide whether ``message`` needs the full agent; answer it here if not.
+
+    ``llm`` is the fast model, or None to route with the local rules only.
+    """
+    started = time.monotonic()
+    if settings.router_mode == "off":
+        return RouteDecision("data", "off")
+
+    chaos_only = apply_chaos(message, current_chaos)
+    if chaos_only is not None:
+        chaos, labels = chaos_only
+        answer = _answer("chaos", f"Done: {', '.join(labels)}.", chaos)
+        return RouteDecision("chaos", "rules", time.monotonic() - started, answer)
+
+    kind = classify(message)
+    if kind == "conversation":
+        text = _normalize(message)
+        reply = next(reply for pattern, reply in _SMALL_TALK if pattern.match(text))
+        answer = _answer("conversation", reply, current_chaos)
+        return RouteDecision("conversation", "rules", time.monotonic() - started, answer)
+    if kind == "data" or llm is None or settings.router_mode != "model":
+        return RouteDecision("data", "rules", time.monotonic() - started)
+
+    try:
+        kind, reply = await _ask_model(llm, message)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.warning("Router model failed (%s); escalating to the agent", exc)
+        kind, reply = "data", None
+    answer = _answer("conversation", reply, current_chaos) if reply is not None else None
+    return RouteDecision(kind, "model", time.monotonic() - started, answer)
@@ -0,0 +1,149 @@
+"""Saved dashboards that refresh without the LLM.
+
+A saved dashboard is the agent's spec with its ``QUERY_RESULT_N``
+placeholders left in, plus the data-tool call behind each placeholder
+(``run_query`` SQL or the arguments of a typed data tool).  Refreshing
+re-runs only those calls through the DB service, whose result cache is keyed
+by snapshot version, and hydrates the spec again with
+``replace_query_placeholders``.
+
+Templates are kept in a small SQLite file (``DASHBOARD_DB_PATH``) so they
+survive restarts and are shared by all workers on the host.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS dashboards (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class TemplateError(ValueError):
+    """A dashboard template that cannot be saved or refreshed."""
+
+
+def template_digest(spec: Dict[str, Any], sources: List[Dict[str, Any]]) -> str:
+    payload = json.dumps({"spec": spec, "sources": sources}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def validate_sources(sources: Any) -> List[Dict[str, Any]]:
+    """Check each source names a data tool and carries a dict of arguments."""
+    from app.services.tools import DATA_TOOLS
+
+    if not isinstance(sources, list):
+        raise TemplateError("sources must be a list")
+    checked = []
+    for index, source in enumerate(sources):
+        if not isinstance(source, dict) or source.get("tool") not in DATA_TOOLS:
+            raise TemplateError(f"Source {index}: tool must be one of {sorted(DATA_TOOLS)}")
+        args = source.get("args")
+        if not isinstance(args, dict):
+            raise TemplateError(f"Source {index}: args must be an object")
+        checked.append({"tool": source["tool"], "args": args})
+    return checked
+
+
+class DashboardStore:
+    """SQLite-backed dashboard templates (one short-lived connection per call)."""
+
+    def __init__(self, path: str = settings.dashboard_db_path) -> None:
+        self.path = path
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                if not self._initialized:
+                    conn.execute(SCHEMA_SQL)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, name: str, spec: Dict[str, Any], sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+        sources = validate_sources(sources)
+        record = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "spec": spec,
+            "sources": sources,
+            "digest": template_digest(spec, sources),
+            "createdAt": time.time(),
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO dashboards (id, name, spec, sources, digest, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    record["id"], name, json.dumps(spec), json.dumps(sources),
+                    record["digest"], record["createdAt"],
+                ),
+            )
+        return record
+
+    def get(self, dashboard_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM dashboards WHERE id = ?", (dashboard_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "spec": json.loads(row["spec"]),
+            "sources": json.loads(row["sources"]),
+            "digest": row["digest"],
+            "createdAt": row["created_at"],
+        }
+
+    def list_all(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, name, created_at FROM dashboards ORDER BY created_at DESC"
+            ).fetchall()
+        return [{"id": r["id"], "name": r["name"], "createdAt": r["created_at"]} for r in rows]
+
+    def delete(self, dashboard_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM dashboards WHERE id = ?", (dashboard_id,))
+        return cursor.rowcount > 0
+
+
+def _run_source(source: Dict[str, Any]) -> List[Any]:
+    """Re-run one data-tool call; the tool applies its own SQL guardrails."""
+    from app.services.tools import get_all_tools
+
+    tools = {t.name: t for t in get_all_tools()}
+    output = json.loads(tools[source["tool"]].invoke(source["args"]))
+    if isinstance(output, dict) and "error" in output:
+        raise TemplateError(f"{source['tool']} failed: {output['error']}")
+    return output if isinstance(output, list) else []
+
+
+async def run_sources(sources: List[Dict[str, Any]]) -> List[List[Any]]:
+    """Re-run every source concurrently, in placeholder order."""
+    return list(await asyncio.gather(*(asyncio.to_thread(_run_source, s) for s in sources)))
+
+
+dashboard_store = DashboardStore()
@@ -1,45 +1,680 @@
+"""DuckDB access for the FinanceFlip warehouse.
+
+The warehouse is served from immutable, versioned snapshot files.  The sync
+job (``scripts/sync_data.py``) builds a new ``finance-<version>.db`` next to
+the previous ones and atomically rewrites the ``CURRENT`` pointer file.
+``DuckDBService`` polls that pointer and switches new queries to the new
+snapshot while in-flight queries finish on the old one.
+
+A snapshot is either a single DuckDB file or a directory of Parquet files
+laid out as ``<table>/year=<Y>/*.parquet`` with rows sorted by ticker and
+date in small row groups (``sync_data.py --format parquet``).  Parquet
+snapshots are exposed as views on an in-memory connection; ``ticker`` and
+``date`` filters prune row groups through their min/max statistics, so a
+single-ticker query reads the same few row groups however many tickers the
+warehouse holds.  Derived tables and indexes built by the sync job (such as
+the ``news_search`` BM25 index) live in the snapshot's ``derived.db``, which
+is attached read-only and put first on every cursor's search path.
+
+Every connection is opened with the engine limits from ``Settings``
+(``DUCKDB_THREADS``, ``DUCKDB_MEMORY_LIMIT``, ``DUCKDB_TEMP_DIRECTORY``), so
+one runaway statement cannot take every core and all memory of the process,
+and each statement is interrupted after ``DUCKDB_QUERY_TIMEOUT_S``.
+Statements slower than ``SLOW_QUERY_MS`` are written with their DuckDB
+profile to the slow-query log (``app.services.slow_log``).
+
+When no snapshot has been published yet, the legacy single file at
+``settings.db_path`` is served instead.  That file is writable and may be
+shared with other worker processes or the sync job, so it is opened per unit
+of work rather than held open: DuckDB locks a file for as long as any
+read-write connection to it exists.  Its version is taken from the file's
+modification time and size, so cached results and refresh ETags change when
+anything rewrites it.
+"""
+
 from __future__ import annotations
 
+import glob
+import json
 import logging
-from typing import Any, Dict, List
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
 
 import duckdb
 
 from app.core.config import settings
+from app.services.cancellation import current_scope, is_interrupt
+from app.services.slow_log import PROFILING_SETUP, slow_query_log
 
 logger = logging.getLogger(__name__)
 
+POINTER_FILE = "CURRENT"
+DERIVED_DB = "derived.db"
+LEGACY_VERSION = "legacy"
+# How long a query waits for an identical one already running before running itself
+INFLIGHT_WAIT_S = 30.0
+
+# Column order of each warehouse table, as exposed by Parquet snapshot views
+WAREHOUSE_COLUMNS = {
+    "stock_prices": ["ticker", "date", "open", "high", "low", "close", "volume"],
+    "financial_metrics": [
+        "ticker", "report_period", "market_cap", "pe_ratio", "pb_ratio",
+        "current_ratio", "debt_to_equity", "revenue_growth",
+        "net_income_growth", "free_cash_flow_yield",
+    ],
+    "news": ["ticker", "date", "title", "author", "source", "url", "sentiment"],
+}
+# Stored intraday bar sizes in minutes, finest first: tables intraday_bars_<bar>
+# (sync_data.py builds each from the one before it)
+INTRADAY_STORED_BARS = {"1m": 1, "5m": 5, "30m": 30, "1d": 1440}
+WAREHOUSE_COLUMNS.update({
+    f"intraday_bars_{bar}": ["ticker", "ts", "open", "high", "low", "close", "volume"]
+    for bar in INTRADAY_STORED_BARS
+})
+
+
+class QueryTimeout(Exception):
+    """A statement interrupted for running longer than ``DUCKDB_QUERY_TIMEOUT_S``."""
+
+
+def engine_config() -> Dict[str, Any]:
+    """DuckDB ``config`` for every connection the service opens."""
+    config: Dict[str, Any] = {}
+    if settings.duckdb_threads > 0:
+        config["threads"] = settings.duckdb_threads
+    if settings.duckdb_memory_limit:
+        config["memory_limit"] = settings.duckdb_memory_limit
+    if settings.duckdb_temp_directory:
+        config["temp_directory"] = settings.duckdb_temp_directory
+    return config
+
+
+class _Deadline:
+    """Interrupts a cursor's statement once it has run for ``timeout_s``."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, timeout_s: float) -> None:
+        self.expired = False
+        self._done = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(timeout_s, self._expire, args=(conn,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self, conn: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            if self._done:
+                return
+            self.expired = True
+            conn.interrupt()
+
+    def cancel(self) -> None:
+        """Disarm before the cursor goes back to the pool, so it is never interrupted there."""
+        with self._lock:
+            self._done = True
+        self._timer.cancel()
+
+
+# Operators DuckDB leaves unestimated; their output is bounded by the product of their inputs
+_PRODUCT_OPERATORS = {"CROSS_PRODUCT", "NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN", "POSITIONAL_JOIN"}
+# Operators that pass their input through; DuckDB reports 0 (e.g. a PROJECTION above ORDER_BY) or nothing
+_PASS_THROUGH_OPERATORS = {"PROJECTION", "ORDER_BY", "FILTER"}
+
+
+def plan_estimates(plan: Any) -> Tuple[int, int]:
+    """``(output rows, largest operator)`` from an ``EXPLAIN (FORMAT JSON)`` plan."""
+    peak = 0
+
+    def walk(node: Dict[str, Any]) -> int:
+        nonlocal peak
+        children = [walk(child) for child in node.get("children", [])]
+        value = node.get("extra_info", {}).get("Estimated Cardinality")
+        if node.get("name") in _PASS_THROUGH_OPERATORS and str(value or 0) == "0" and children:
+            rows = max(children)
+        elif isinstance(value, (int, str)) and str(value).isdigit():
+            rows = int(value)
+        elif node.get("name") in _PRODUCT_OPERATORS and children:
+            rows = 1
+            for child in children:
+                rows *= child
+        else:
+            rows = max(children, default=0)
+        peak = max(peak, rows)
+        return rows
+
+    output = 0
+    for root in plan if isinstance(plan, list) else [plan]:
+        output = max(output, walk(root))
+    return output, peak
+
+
+def read_snapshot_pointer(snapshot_dir: str) -> Optional[str]:
+    """Return the snapshot file name published in ``CURRENT``, if any."""
+    try:
+        with open(os.path.join(snapshot_dir, POINTER_FILE), encoding="utf-8") as fh:
+            name = fh.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def snapshot_version(name: str) -> str:
+    """``finance-20250308T120000Z.db`` -> ``20250308T120000Z``."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return stem.split("-", 1)[1] if "-" in stem else stem
+
+
+def legacy_version(path: str) -> str:
+    """``legacy-<mtime_ns>-<size>`` of the single-file warehouse (``legacy`` if missing)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return LEGACY_VERSION
+    return f"{LEGACY_VERSION}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+# Column types DuckDB already returns as JSON-ready Python values
+_PLAIN_TYPES = {
+    "VARCHAR", "BOOLEAN", "TINYINT", "SMALLINT", "INTEGER", "BIGINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT", "HUGEINT",
+}
+_FLOAT_TYPES = {"DOUBLE", "FLOAT"}
+
+
+def _json_value(value: Any) -> Any:
+    """Convert one DuckDB value to JSON-ready form (NaN -> null, ISO timestamps)."""
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="milliseconds")
+    if isinstance(value, date):
+        return f"{value.isoformat()}T00:00:00.000"
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    return str(value)
+
+
+def _float_column(values: Tuple[Any, ...]) -> Any:
+    if all(v is None or math.isfinite(v) for v in values):
+        return values
+    return [v if v is None or math.isfinite(v) else None for v in values]
+
+
+def _timestamp_column(values: Tuple[Any, ...]) -> List[Optional[str]]:
+    return [v.isoformat(timespec="milliseconds") if v is not None else None for v in values]
+
+
+def _generic_column(values: Sequence[Any]) -> List[Any]:
+    return [_json_value(v) for v in values]
+
+
+_TIMESTAMPTZ = "TIMESTAMP WITH TIME ZONE"
+
+
+def _fetch_numpy_records(
+    result: duckdb.DuckDBPyConnection, columns: List[str], types: List[str]
+) -> List[Dict[str, Any]]:
+    """Slow path for results with time-zone aware columns.
+
+    ``fetchall`` needs pytz to build aware datetimes; ``fetchnumpy`` returns
+    them as UTC ``datetime64`` instead, rendered with a ``Z`` suffix as the
+    pandas path used to.
+    """
+    arrays = result.fetchnumpy()
+    values: List[Any] = []
+    for name, type_name in zip(columns, types):
+        column = arrays[name].tolist()
+        if type_name == _TIMESTAMPTZ:
+            values.append(
+                [v.isoformat(timespec="milliseconds") + "Z" if v is not None else None for v in column]
+            )
+        else:
+            values.append(_generic_column(column))
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def fetch_records(result: duckdb.DuckDBPyConnection) -> List[Dict[str, Any]]:
+    """Fetch a result as JSON-ready dicts without a pandas round-trip.
+
+    Conversion runs column by column so plain columns (text, integers) are
+    never touched and float columns are only rewritten when they hold NaN/inf.
+    """
+    columns = [col[0] for col in result.description]
+    types = [str(col[1]) for col in result.description]
+    if any("WITH TIME ZONE" in t for t in types):
+        return _fetch_numpy_records(result, columns, types)
+    rows = result.fetchall()
+    if not rows or all(t in _PLAIN_TYPES for t in types):
+        return [dict(zip(columns, row)) for row in rows]
+
+    values: List[Any] = list(zip(*rows))
+    for i, type_name in enumerate(types):
+        if type_name in _PLAIN_TYPES:
+            continue
+        if type_name in _FLOAT_TYPES:
+            values[i] = _float_column(values[i])
+        elif type_name == "TIMESTAMP":
+            values[i] = _timestamp_column(values[i])
+        else:
+            values[i] = _generic_column(values[i])
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def register_parquet_views(conn: duckdb.DuckDBPyConnection, root: str) -> None:
+    """Create one view per warehouse table over its year-partitioned Parquet files."""
+    # Snapshot files never change, so footers can be cached across queries
+    conn.execute("SET parquet_metadata_cache = true")
+    for table, columns in WAREHOUSE_COLUMNS.items():
+        table_dir = os.path.join(root, table)
+        pattern = os.path.join(table_dir, "*", "*.parquet")
+        if not glob.glob(pattern):
+            logger.warning("Parquet snapshot %s has no files for %s", root, table)
+            continue
+        escaped = pattern.replace("'", "''")
+        conn.execute(
+            f"CREATE OR REPLACE VIEW {table} AS "
+            f"SELECT {', '.join(columns)} FROM read_parquet('{escaped}', "
+            "hive_partitioning = true, hive_types = {'year': INTEGER})"
+        )
+
+
+def load_extensions(conn: duckdb.DuckDBPyConnection) -> None:
+    """Load optional extensions used by derived tables (BM25 search needs ``fts``)."""
+    try:
+        conn.execute("LOAD fts")
+    except duckdb.Error:
+        logger.warning("DuckDB fts extension unavailable; news search falls back to substring scans")
+
+
+class _Snapshot:
+    """One opened warehouse version with a small pool of reusable cursors.
+
+    Writable (legacy) files are not pooled: each ``acquire`` opens its own
+    connection and ``release`` closes it, so the file lock is only held while
+    a query runs.
+    """
+
+    def __init__(self, version: str, path: str, read_only: bool) -> None:
+        self.version = version
+        self.path = path
+        self.read_only = read_only
+        # Run on every new cursor; profiling feeds the slow-query log
+        self._cursor_setup: List[str] = [PROFILING_SETUP] if slow_query_log.enabled else []
+        self.conn: Optional[duckdb.DuckDBPyConnection] = None
+        if read_only and os.path.isdir(path):
+            self.conn = duckdb.connect(":memory:", config=engine_config())
+            register_parquet_views(self.conn, path)
+            derived = os.path.join(path, DERIVED_DB)
+            if os.path.exists(derived):
+                escaped = derived.replace("'", "''")
+                self.conn.execute(f"ATTACH '{escaped}' AS derived (READ_ONLY)")
+                self._cursor_setup.append("SET search_path = 'derived.main,memory.main'")
+        elif read_only:
+            self.conn = duckdb.connect(path, read_only=True, config=engine_config())
+        if self.conn is not None:
+            load_extensions(self.conn)
+        self._idle: List[duckdb.DuckDBPyConnection] = []
+        self._in_use = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[duckdb.DuckDBPyConnection]:
+        """Return a cursor, or ``None`` if this snapshot was retired meanwhile."""
+        with self._lock:
+            if self._retired:
+                return None
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+        cursor: Optional[duckdb.DuckDBPyConnection] = None
+        try:
+            if self.conn is None:
+                cursor = duckdb.connect(self.path, config=engine_config())
+            else:
+                cursor = self.conn.cursor()
+            for statement in self._cursor_setup:
+                cursor.execute(statement)
+        except Exception:
+            if cursor is not None:
+                cursor.close()
+            with self._lock:
+                self._in_use -= 1
+            raise
+        return cursor
+
+    def release(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            self._in_use -= 1
+            if not self._retired and self.conn is not None:
+                self._idle.append(cursor)
+                return
+            close_all = self._retired and self._in_use == 0
+        cursor.close()
+        if close_all:
+            self._close()
+
+    def retire(self) -> None:
+        """Stop handing out cursors; close once the last one is released."""
+        with self._lock:
+            self._retired = True
+            close_now = self._in_use == 0
+        if close_now:
+            self._close()
+
+    def _close(self) -> None:
+        for cursor in self._idle:
+            cursor.close()
+        self._idle.clear()
+        if self.conn is not None:
+            self.conn.close()
+        logger.info("Closed warehouse snapshot %s", self.version)
+
+
+class QueryCache:
+    """Thread-safe LRU of query results keyed by snapshot version.
+
+    Entries stored speculatively (see ``app.services.prefetch``) are tracked
+    until their owner collects them, so wasted speculation can be measured.
+    """
+
+    def __init__(self, max_entries: int = settings.query_cache_size) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, List[Dict[str, Any]]]" = OrderedDict()
+        # speculative key -> whether it has been read since it was stored
+        self._speculative: Dict[Hashable, bool] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(version: str, sql: str, params: Any) -> Optional[Hashable]:
+        if params is None:
+            return (version, sql, None)
+        try:
+            key = (version, sql, tuple(params) if isinstance(params, list) else params)
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                if key in self._speculative:
+                    self._speculative[key] = True
+            return rows
+
+    def put(self, key: Hashable, rows: List[Dict[str, Any]], speculative: bool = False) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            if speculative:
+                self._speculative[key] = False
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._speculative.pop(evicted, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def collect_speculative(self, key: Hashable) -> Optional[bool]:
+        """Stop tracking a speculative entry; return whether it was read (None if gone)."""
+        with self._lock:
+            return self._speculative.pop(key, None)
+
+    def discard_unread(self, key: Hashable) -> bool:
+        """Drop a speculative entry nobody has read yet; return whether it was dropped."""
+        with self._lock:
+            if self._speculative.get(key) is not False:
+                return False
+            del self._speculative[key]
+            self._entries.pop(key, None)
+            return True
+
+    def invalidate(self, keep_version: Optional[str] = None) -> None:
+        """Drop every entry that does not belong to ``keep_version``."""
+        with self._lock:
+            if keep_version is None:
+                self._entries.clear()
+                self._speculative.clear()
+                return
+            for key in [k for k in self._entries if k[0] != keep_version]:
+                del self._entries[key]
+                self._speculative.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class DuckDBService:
-    def __init__(self, db_path: str = settings.db_path) -> None:
+    def __init__(
+        self,
+        db_path: str = settings.db_path,
+        snapshot_dir: str = settings.snapshot_dir,
+        poll_interval_s: float = settings.snapshot_poll_interval_s,
+    ) -> None:
         self.db_path = db_path
+        self.snapshot_dir = snapshot_dir
+        self.poll_interval_s = poll_interval_s
+        self.cache = QueryCache()
+        self._current: Optional[_Snapshot] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        # Queries still running, so identical ones can wait for their result
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        return self._get_snapshot().version
+
+    def _resolve_target(self) -> Tuple[str, str, bool]:
+        name = read_snapshot_pointer(self.snapshot_dir)
+        if name:
+            return snapshot_version(name), os.path.join(self.snapshot_dir, name), True
+        return legacy_version(self.db_path), self.db_path, False
+
+    def _get_snapshot(self) -> _Snapshot:
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._checked_at < self.poll_interval_s:
+            return current
+        with self._lock:
+            self._checked_at = now
+            version, path, read_only = self._resolve_target()
+            current = self._current
+            if current is not None and current.version == version:
+                return current
+            snapshot = _Snapshot(version, path, read_only)
+            self._current = snapshot
+        logger.info("Serving warehouse snapshot %s (%s)", version, path)
+        self.cache.invalidate(keep_version=version)
+        if current is not None:
+            current.retire()
+        return snapshot
+
+    def refresh(self) -> str:
+        """Re-read the snapshot pointer now; return the active version."""
+        self._checked_at = float("-inf")
+        return self.version
+
+    @contextmanager
+    def connection(self) -> Iterator[Tuple[str, duckdb.DuckDBPyConnection]]:
+        """Borrow a cursor pinned to the current snapshot for one unit of work."""
+        while True:
+            snapshot = self._get_snapshot()
+            cursor = snapshot.acquire()
+            if cursor is not None:
+                break
+        try:
+            yield snapshot.version, cursor
+        finally:
+            snapshot.release(cursor)
 
     def query(self, sql: str, params: Any = None) -> List[Dict[str, Any]]:
-        conn = duckdb.connect(self.db_path)
+        """Run a read query; results are cached per snapshot and must not be mutated."""
+        rows, _ = self._query(sql, params)
+        return rows
+
+    def query_prepared(self, name: str, sql: str, args: str) -> List[Dict[str, Any]]:
+        """Run ``EXECUTE name(args)``, preparing ``sql`` on each cursor's first use.
+
+        Prepared statements live on pooled cursors, so a query shape is parsed
+        and planned once per cursor instead of once per call.  DuckDB does not
+        accept bound parameters in ``EXECUTE``, so ``args`` is inlined and must
+        be rendered from validated literals (see ``app.services.statements``).
+        Results are cached like ``query``.
+        """
+        rows, _ = self._query(f"EXECUTE {name}({args})", None, prepared=(name, sql))
+        return rows
+
+    def estimate_rows(self, sql: str) -> Optional[Tuple[int, int]]:
+        """DuckDB's cardinality estimates for ``sql`` (see ``plan_estimates``).
+
+        Only plans the statement; ``None`` if it does not plan, in which case
+        running it reports the error.
+        """
+        with self.connection() as (_, conn):
+            try:
+                rows = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()
+            except duckdb.Error:
+                return None
+        return plan_estimates(json.loads(rows[0][1]))
+
+    def prefetch(
+        self, sql: str, params: Any = None, prepared: Optional[Tuple[str, str]] = None
+    ) -> Optional[Hashable]:
+        """Run a read query speculatively so a later identical ``query`` hits the cache.
+
+        Returns the cache key to collect later, or ``None`` when the result
+        was already cached or being computed (or cannot be cached) and
+        nothing was run.
+        """
+        key = QueryCache.make_key(self.version, sql, params)
+        if key is None or key in self.cache:
+            return None
+        _, executed = self._query(sql, params, speculative=True, prepared=prepared)
+        return key if executed else None
+
+    def prefetch_prepared(self, name: str, sql: str, args: str) -> Optional[Hashable]:
+        """``prefetch`` for a later ``query_prepared`` with the same arguments."""
+        return self.prefetch(f"EXECUTE {name}({args})", prepared=(name, sql))
+
+    def _query(
+        self,
+        sql: str,
+        params: Any,
+        speculative: bool = False,
+        prepared: Optional[Tuple[str, str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Cached, single-flight read; also says whether this call ran the query."""
+        with self.connection() as (version, conn):
+            key = QueryCache.make_key(version, sql, params)
+            if key is None:
+                return self._execute_query(conn, sql, params, prepared), True
+            cached = self.cache.get(key)
+            if cached is not None:
+                return list(cached), False
+            with self._inflight_lock:
+                running = self._inflight.get(key)
+                if running is None:
+                    self._inflight[key] = threading.Event()
+            if running is None:
+                try:
+                    rows = self._execute_query(conn, sql, params, prepared)
+                    self.cache.put(key, rows, speculative=speculative)
+                finally:
+                    with self._inflight_lock:
+                        self._inflight.pop(key).set()
+                return list(rows), True
+        # The same statement is already running (often a prefetch): wait for
+        # its result instead of running it twice
+        running.wait(timeout=INFLIGHT_WAIT_S)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached), False
+        with self.connection() as (_, conn):
+            rows = self._execute_query(conn, sql, params, prepared)
+        self.cache.put(key, rows)
+        return list(rows), True
+
+    @staticmethod
+    def _execute_query(
+        conn: duckdb.DuckDBPyConnection,
+        sql: str,
+        params: Any,
+        prepared: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        # Attach the cursor to the calling agent run so a disconnect can interrupt it
+        scope = current_scope()
+        timeout_s = settings.duckdb_query_timeout_s
+        deadline: Optional[_Deadline] = None
         try:
-            if params is not None:
-                result = conn.execute(sql, params)
-            else:
-                result = conn.execute(sql)
-            df = result.fetchdf()
-            # use to_json to handle NaN/NaT -> null conversion reliably
-            import json as json_mod
-            return json_mod.loads(df.to_json(orient="records", date_format="iso"))
+            with scope.running(conn) if scope is not None else nullcontext():
+                if timeout_s > 0:
+                    deadline = _Deadline(conn, timeout_s)
+                started = time.perf_counter()
+                try:
+                    if params is not None:
+                        result = conn.execute(sql, params)
+                    else:
+                        result = conn.execute(sql)
+                except duckdb.BinderException as exc:
+                    if prepared is None or "does not exist" not in str(exc):
+                        raise
+                    # First use of this statement on this cursor
+                    name, body = prepared
+                    conn.execute(f"PREPARE {name} AS {body}")
+                    result = conn.execute(sql)
+                rows = fetch_records(result)
+                slow_query_log.observe(sql, time.perf_counter() - started, conn, prepared[1] if prepared else None)
+                return rows
         except Exception as exc:
-            logger.exception("DuckDB query failed", extra={"sql": sql})
+            if deadline is not None and deadline.expired and is_interrupt(exc):
+                logger.warning("DuckDB query timed out after %.0f s", timeout_s, extra={"sql": sql})
+                slow_query_log.observe(sql, timeout_s, conn, prepared[1] if prepared else None, timed_out=True)
+                raise QueryTimeout(
+                    f"Query stopped after {timeout_s:g} s; narrow the date range or tickers, "
+                    "or aggregate"
+                ) from None
+            if is_interrupt(exc):
+                logger.info("DuckDB query cancelled", extra={"sql": sql})
+            else:
+                logger.exception("DuckDB query failed", extra={"sql": sql})
             raise exc
         finally:
-            conn.close()
+            if deadline is not None:
+                deadline.cancel()
 
     def execute(self, sql: str, params: Any = None) -> None:
-        conn = duckdb.connect(self.db_path)
-        try:
+        """Run a write statement (legacy single-file mode only; snapshots are read-only)."""
+        with self.connection() as (_, conn):
             if params is not None:
                 conn.execute(sql, params)
             else:
                 conn.execute(sql)
-        finally:
-            conn.close()
+        self.cache.invalidate()
+
+    def close(self) -> None:
+        with self._lock:
+            current, self._current = self._current, None
+        if current is not None:
+            current.retire()
 
 
 db_service = DuckDBService()
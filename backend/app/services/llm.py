@@ -22,6 +22,7 @@ DATABASE SCHEMA (DuckDB):
 - stock_prices (ticker: VARCHAR, date: TIMESTAMP, open: DOUBLE, high: DOUBLE, low: DOUBLE, close: DOUBLE, volume: BIGINT)
 - financial_metrics (ticker: VARCHAR, report_period: DATE, market_cap: DOUBLE, pe_ratio: DOUBLE, pb_ratio: DOUBLE, current_ratio: DOUBLE, debt_to_equity: DOUBLE, revenue_growth: DOUBLE, net_income_growth: DOUBLE, free_cash_flow_yield: DOUBLE)
 - news (ticker: VARCHAR, date: TIMESTAMP, title: VARCHAR, author: VARCHAR, source: VARCHAR, url: VARCHAR, sentiment: DOUBLE)
+- event_impacts (news_id: BIGINT, ticker: VARCHAR, date: TIMESTAMP, url: VARCHAR, base_date: TIMESTAMP, base_close: DOUBLE, return_1d_pct: DOUBLE, return_5d_pct: DOUBLE, abnormal_1d_pct: DOUBLE, abnormal_5d_pct: DOUBLE)
 
 AVAILABLE TICKERS: AAPL, MSFT, TSLA (fixtures).
 
@@ -35,7 +36,8 @@ COMPONENT CONTRACTS (each block MUST be { type, props }):
 
 EVENT MAPPING:
 - Use the news table for event-timeline data.
-- Shape SQL results to match event fields via aliases (entry_type='news', summary=source, sentiment_score=sentiment, price_impact_pct=0.0).
+- Shape SQL results to match event fields via aliases (entry_type='news', summary=source, sentiment_score=sentiment).
+- LEFT JOIN event_impacts ON (ticker, date, url) and use return_1d_pct as price_impact_pct.
 
 CHAOS COMMANDS:
 - "flip", "upside down" -> rotation: 180
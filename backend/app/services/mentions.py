@@ -0,0 +1,82 @@
+"""Tickers and time windows mentioned in free text.
+
+One set of rules for every place that reads them from a message or a block
+title: prefetch, trace memory, the router and the chart fallback in the
+routes.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from app.services.db import db_service
+
+logger = logging.getLogger(__name__)
+
+# Company names users type instead of the ticker
+TICKER_ALIASES = {
+    "APPLE": "AAPL",
+    "MICROSOFT": "MSFT",
+    "TESLA": "TSLA",
+}
+
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "quarter": 90, "year": 365}
+_WINDOW_RE = re.compile(
+    r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|quarter|year)s?\b", re.IGNORECASE
+)
+_UNIT_RE = re.compile(
+    r"\b(?:last|past|previous|this)\s+(day|week|month|quarter|year)\b", re.IGNORECASE
+)
+_YTD_RE = re.compile(r"\b(?:ytd|year[- ]to[- ]date)\b", re.IGNORECASE)
+
+
+def known_tickers() -> List[str]:
+    """Tickers in the current snapshot (cached like any other query)."""
+    try:
+        rows = db_service.query("SELECT DISTINCT ticker FROM stock_prices ORDER BY ticker")
+    except Exception:
+        logger.warning("Could not list tickers", exc_info=True)
+        return []
+    return [str(row["ticker"]).upper() for row in rows if row.get("ticker")]
+
+
+def infer_tickers(text: str, universe: List[str]) -> List[str]:
+    """Tickers mentioned in ``text`` by symbol or company name, in order of mention.
+
+    Symbols must be written in capitals (optionally ``$``-prefixed) so short
+    tickers such as ``ON`` or ``IT`` do not match ordinary words.
+    """
+    if not text:
+        return []
+    found: List[Tuple[int, str]] = []
+    for ticker in universe:
+        match = re.search(rf"(?<![A-Za-z0-9]){re.escape(ticker)}(?![A-Za-z0-9])", text)
+        if match is not None:
+            found.append((match.start(), ticker))
+    known = set(universe)
+    for name, ticker in TICKER_ALIASES.items():
+        match = re.search(rf"\b{name}\b", text, flags=re.IGNORECASE)
+        if match is not None and ticker in known:
+            found.append((match.start(), ticker))
+    ordered: List[str] = []
+    for _, ticker in sorted(found):
+        if ticker not in ordered:
+            ordered.append(ticker)
+    return ordered
+
+
+def infer_days(text: str) -> Optional[int]:
+    """Length of the time window ``text`` asks about, in days, if it names one."""
+    if not text:
+        return None
+    match = _WINDOW_RE.search(text)
+    if match:
+        return max(1, int(match.group(1))) * _UNIT_DAYS[match.group(2).lower()]
+    if _YTD_RE.search(text):
+        return 365
+    match = _UNIT_RE.search(text)
+    if match:
+        return _UNIT_DAYS[match.group(1).lower()]
+    return None
@@ -0,0 +1,183 @@
+"""Plan-then-execute agent graph (``AGENT_GRAPH=plan``).
+
+The ReAct graph alternates one LLM turn and one tool call, so a three-ticker
+dashboard costs four to eight sequential model calls.  This graph makes one
+planning call that lists every tool call as JSON, runs the calls together on
+the DB pool, then makes one synthesis call that writes the spec: two model
+calls whatever the number of queries.
+
+A plan that does not validate (not JSON, unknown tool, bad arguments, unsafe
+SQL, too many calls) is handed to the ReAct graph unchanged, so the worst
+case costs one extra model call.
+
+The calls first run concurrently, which fills the SQL result cache, and are
+then replayed through the tools in plan order; tool events, and with them the
+``QUERY_RESULT_N`` numbering, therefore follow the plan rather than the order
+in which queries happened to finish.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Annotated, Any, Dict, List, Optional, TypedDict
+
+from app.core.config import settings
+from app.services.prompts import PLAN_PROMPT, SYNTHESIS_PROMPT
+from app.utils.json_tools import parse_json_from_text
+from app.utils.sql_guard import is_safe_sql
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable, RunnableConfig
+    from langchain_core.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+# Tag on the planning model call; its output is a plan, not an answer to stream
+PLAN_TAG = "ff:plan"
+
+# Tools the planner may schedule (get_schema is only useful interactively)
+PLAN_TOOLS = (
+    "get_prices", "get_intraday_bars", "get_metrics", "get_news", "get_kpis", "search_news", "run_query",
+    "open_table",
+)
+
+# Rows of each data result shown to the synthesis call
+_PREVIEW_ROWS = 3
+
+
+class PlanError(ValueError):
+    """A plan that cannot be executed as written."""
+
+
+def validate_plan(text: str, tools: Dict[str, "BaseTool"], max_calls: int) -> List[Dict[str, Any]]:
+    """Parse the planner's reply into ``[{"tool", "args"}]`` with validated arguments."""
+    try:
+        plan = parse_json_from_text(text)
+    except Exception as exc:
+        raise PlanError(f"plan is not JSON: {exc}") from None
+    calls = plan.get("calls") if isinstance(plan, dict) else None
+    if not isinstance(calls, list):
+        raise PlanError("plan has no calls list")
+    if len(calls) > max_calls:
+        raise PlanError(f"{len(calls)} calls planned; at most {max_calls} allowed")
+    checked = []
+    for index, call in enumerate(calls):
+        name = call.get("tool") if isinstance(call, dict) else None
+        if name not in tools:
+            raise PlanError(f"call {index}: unknown tool {name!r}")
+        args = call.get("args") or {}
+        try:
+            args = tools[name].args_schema.model_validate(args).model_dump(exclude_none=True)
+        except Exception as exc:
+            raise PlanError(f"call {index}: invalid arguments for {name}: {exc}") from None
+        if name in ("run_query", "open_table") and not is_safe_sql(args.get("sql", "")):
+            raise PlanError(f"call {index}: SQL rejected by the guard")
+        checked.append({"tool": name, "args": args})
+    return checked
+
+
+def describe_outputs(calls: List[Dict[str, Any]], outputs: List[str], offset: int) -> str:
+    """Summarize tool outputs for the synthesis call, numbered like the agent's tool results."""
+    from app.services.tools import DATA_TOOLS
+
+    lines = []
+    index = offset
+    for call, output in zip(calls, outputs):
+        label = f"{call['tool']} {json.dumps(call['args'], default=str)}"
+        try:
+            parsed = json.loads(output)
+        except ValueError:
+            parsed = None
+        if call["tool"] in DATA_TOOLS and isinstance(parsed, list):
+            preview = json.dumps(parsed[:_PREVIEW_ROWS], default=str)
+            lines.append(f"QUERY_RESULT_{index} = {label}: {len(parsed)} rows, first rows: {preview}")
+            index += 1
+        elif isinstance(parsed, dict) and "error" in parsed:
+            lines.append(f"{label} failed: {parsed['error']}")
+        else:
+            lines.append(f"{label} returned (copy what you need into props): {output[:4000]}")
+    return "\n".join(lines) or "(no calls were needed)"
+
+
+def build_plan_graph(llm: Any, tools: List["BaseTool"], fallback: "Runnable") -> Any:
+    """Compile the plan → execute → synthesize graph, with ``fallback`` for bad plans."""
+    from langchain_core.messages import HumanMessage
+    from langgraph.graph import END, START, StateGraph
+    from langgraph.graph.message import add_messages
+
+    from app.services.agent import _extract_text
+
+    by_name = {t.name: t for t in tools if t.name in PLAN_TOOLS}
+    planner = llm.with_config(tags=[PLAN_TAG])
+
+    # result_offset: placeholders already taken by earlier session results
+    State = TypedDict(
+        "State",
+        {
+            "messages": Annotated[list, add_messages],
+            "result_offset": int,
+            "calls": Optional[List[Dict[str, Any]]],
+            "outputs": List[str],
+        },
+        total=False,
+    )
+
+    async def plan(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        if state.get("calls") is not None:
+            # Calls given by the caller (a remembered trace being replayed)
+            return {}
+        prompt = PLAN_PROMPT.format(
+            tools=", ".join(by_name),
+            max_calls=settings.plan_max_calls,
+            offset=state.get("result_offset", 0),
+        )
+        reply = await planner.ainvoke(state["messages"] + [HumanMessage(content=prompt)], config)
+        try:
+            calls = validate_plan(_extract_text(reply.content), by_name, settings.plan_max_calls)
+        except PlanError as exc:
+            logger.info("Plan rejected (%s); falling back to ReAct", exc)
+            return {"calls": None}
+        return {"calls": calls}
+
+    async def execute(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        calls = state["calls"] or []
+        # Run everything at once on the DB pool; the replay below is served from cache
+        await asyncio.gather(
+            *(asyncio.to_thread(by_name[c["tool"]].func, **c["args"]) for c in calls),
+            return_exceptions=True,
+        )
+        outputs = [str(await by_name[c["tool"]].ainvoke(c["args"], config)) for c in calls]
+        return {"outputs": outputs}
+
+    async def synthesize(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        results = describe_outputs(
+            state.get("calls") or [], state.get("outputs") or [], state.get("result_offset", 0)
+        )
+        reply = await llm.ainvoke(
+            state["messages"] + [HumanMessage(content=SYNTHESIS_PROMPT.format(results=results))],
+            config,
+        )
+        return {"messages": [reply]}
+
+    async def react(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        result = await fallback.ainvoke({"messages": state["messages"]}, config)
+        return {"messages": result["messages"][len(state["messages"]):]}
+
+    def route(state: Dict[str, Any]) -> str:
+        if state.get("calls") is None:
+            return "react"
+        return "execute" if state["calls"] else "synthesize"
+
+    graph = StateGraph(State)
+    graph.add_node("plan", plan)
+    graph.add_node("execute", execute)
+    graph.add_node("synthesize", synthesize)
+    graph.add_node("react", react)
+    graph.add_edge(START, "plan")
+    graph.add_conditional_edges("plan", route, ["execute", "synthesize", "react"])
+    graph.add_edge("execute", "synthesize")
+    graph.add_edge("synthesize", END)
+    graph.add_edge("react", END)
+    return graph.compile()
@@ -0,0 +1,158 @@
+"""Speculative prefetch of the queries an agent run is likely to need.
+
+While the model is still reading the prompt, ``Prefetch.start`` guesses the
+tickers and time window from the user message (see ``app.services.mentions``)
+and runs the usual price, metrics and news statements (``get_prices``,
+``get_metrics`` and ``get_news``) concurrently into the SQL result cache.  The
+exact calls are listed in the system prompt (``Prefetch.hint``) so the agent
+can make them with the same arguments and get cached rows back.
+
+Every speculative result is tracked by the cache; ``Prefetch.finish``
+reports how many were used and how many were wasted, which ends up in the
+run's ``queryMetadata`` so the hit rate can be watched.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+from app.services.db import db_service
+from app.services.mentions import infer_days, infer_tickers, known_tickers
+from app.services.statements import LATEST_METRICS, NEWS_WINDOW, PRICE_WINDOW, Statement, tickers_literal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS = 30
+
+LATEST_DATE_SQL = "SELECT max(date) AS latest FROM stock_prices WHERE ticker = ANY({tickers})"
+
+
+@dataclass(frozen=True)
+class PlannedCall:
+    """A typed tool call, and the statement it runs, worth making ahead of the agent."""
+
+    tool: str
+    statement: Statement
+    args: Dict[str, Any]
+
+    def __str__(self) -> str:
+        return f"{self.tool}({json.dumps(self.args)})"
+
+    def prefetch(self) -> Optional[Hashable]:
+        return db_service.prefetch_prepared(
+            self.statement.name, self.statement.sql, self.statement.render_args(self.args)
+        )
+
+
+def latest_date(tickers: List[str]) -> Optional[date]:
+    """Last trading date of ``tickers``, which price windows are counted back from."""
+    try:
+        rows = db_service.query(LATEST_DATE_SQL.format(tickers=tickers_literal(tickers)))
+    except Exception:
+        logger.warning("Could not read the latest price date for prefetch", exc_info=True)
+        return None
+    latest = rows[0]["latest"] if rows else None
+    return date.fromisoformat(str(latest)[:10]) if latest is not None else None
+
+
+def plan_calls(tickers: List[str], days: int, latest: Optional[date], max_queries: int) -> List[PlannedCall]:
+    """Tool calls worth running before the agent asks for them."""
+    if not tickers:
+        return []
+    # Price history first: every dashboard needs it, metrics and news less so
+    calls = []
+    if latest is not None:
+        start = (latest - timedelta(days=days)).isoformat()
+        calls.append(PlannedCall("get_prices", PRICE_WINDOW, {"tickers": tickers, "start": start}))
+    calls.append(PlannedCall("get_metrics", LATEST_METRICS, {"tickers": tickers, "periods": 4}))
+    calls.append(PlannedCall("get_news", NEWS_WINDOW, {"tickers": tickers, "limit": 20}))
+    return calls[:max_queries]
+
+
+class Prefetch:
+    """Speculative queries for one agent run."""
+
+    def __init__(self, message: str) -> None:
+        self.message = message
+        self.queries: List[PlannedCall] = []
+        self._tasks: List[asyncio.Task] = []
+        self._started = 0.0
+        self._finished = 0.0
+
+    async def start(self) -> "Prefetch":
+        """Plan and launch the queries; returns without waiting for them."""
+        if not settings.prefetch_enabled:
+            return self
+        self._started = time.monotonic()
+        universe = await asyncio.to_thread(known_tickers)
+        tickers = infer_tickers(self.message, universe)
+        latest = await asyncio.to_thread(latest_date, tickers) if tickers else None
+        days = infer_days(self.message) or DEFAULT_DAYS
+        self.queries = plan_calls(tickers, days, latest, settings.prefetch_max_queries)
+        self._tasks = [
+            asyncio.create_task(asyncio.to_thread(call.prefetch), name="prefetch")
+            for call in self.queries
+        ]
+        for task in self._tasks:
+            task.add_done_callback(self._on_done)
+        return self
+
+    def _on_done(self, _task: asyncio.Task) -> None:
+        self._finished = max(self._finished, time.monotonic())
+
+    def hint(self) -> str:
+        """System-prompt addendum listing the prefetched tool calls."""
+        if not self.queries:
+            return ""
+        lines = "\n".join(f"- {call}" for call in self.queries)
+        return (
+            "\n\nPREFETCHED QUERIES\n"
+            "These tool calls are already running against the database. If you need "
+            "this data, make the call with exactly these arguments (results are "
+            "served from cache):\n" + lines
+        )
+
+    async def finish(self) -> Dict[str, Any]:
+        """Wait for outstanding queries and report how much speculation paid off."""
+        stats = {"issued": 0, "alreadyCached": 0, "failed": 0, "hits": 0, "wasted": 0, "ms": 0}
+        if not self._tasks:
+            return stats
+        outcomes = await asyncio.gather(*self._tasks, return_exceptions=True)
+        keys: List[Hashable] = []
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                stats["failed"] += 1
+            elif outcome is None:
+                stats["alreadyCached"] += 1
+            else:
+                keys.append(outcome)
+        stats["issued"] = len(keys)
+        for key in keys:
+            if db_service.cache.collect_speculative(key):
+                stats["hits"] += 1
+            else:
+                stats["wasted"] += 1
+        # How long the speculative work itself took, not the whole run
+        stats["ms"] = round((self._finished - self._started) * 1000)
+        return stats
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def discard(self) -> int:
+        """Drop the results nobody read (the run was abandoned); return how many."""
+        freed = 0
+        for task in self._tasks:
+            if task.done() and not task.cancelled() and task.exception() is None:
+                key = task.result()
+                if key is not None and db_service.cache.discard_unread(key):
+                    freed += 1
+        return freed
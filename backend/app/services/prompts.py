@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 
 FINANCEFLIP_SYSTEM_PROMPT = """\
@@ -18,18 +18,35 @@ Tables:
 • stock_prices   (ticker VARCHAR, date TIMESTAMP, open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, volume BIGINT)
 • financial_metrics (ticker VARCHAR, report_period DATE, market_cap DOUBLE, pe_ratio DOUBLE, pb_ratio DOUBLE, current_ratio DOUBLE, debt_to_equity DOUBLE, revenue_growth DOUBLE, net_income_growth DOUBLE, free_cash_flow_yield DOUBLE)
 • news            (ticker VARCHAR, date TIMESTAMP, title VARCHAR, author VARCHAR, source VARCHAR, url VARCHAR, sentiment DOUBLE)
+• event_impacts   (news_id BIGINT, ticker VARCHAR, date TIMESTAMP, url VARCHAR, base_date TIMESTAMP, base_close DOUBLE, return_1d_pct DOUBLE, return_5d_pct DOUBLE, abnormal_1d_pct DOUBLE, abnormal_5d_pct DOUBLE)
+                  — precomputed price reaction per news article; join to news ON (ticker, date, url).
+                    abnormal_* = return minus the mean return of the other tickers.
+• intraday_bars_1m / _5m / _30m / _1d (ticker VARCHAR, ts TIMESTAMP, open, high, low, close DOUBLE, volume BIGINT)
+                  — intraday bars in exchange time; query them through get_intraday_bars.
 
 Available tickers: AAPL, MSFT, TSLA.
 
 ──────────────────
 TOOLS
 ──────────────────
-• run_query  — execute a SELECT-only SQL query and get back rows as JSON.
-• get_schema — return the list of tables and their columns (no args needed).
+• get_prices  — OHLCV bars (tickers, start?, end?, interval? 1d|1w|1mo|1q|1y), oldest first.
+• get_intraday_bars — intraday OHLCV bars (tickers, start?, end?, bar? auto|1m|5m|15m|30m|1h|1d|1w);
+                the bar size follows the range, so ask for the whole range in one call.
+• get_metrics — latest financial_metrics rows (tickers, periods?).
+• get_news    — recent news rows (tickers, start?, end?, limit?), newest first.
+• run_query   — execute a SELECT-only SQL query and get back rows as JSON.  Use it only for
+                shapes the typed tools above do not cover (pivots, joins, aggregates).
+• open_table  — register a SELECT whose raw rows the user wants to browse (more than run_query's
+                200); returns a handle for a data-table block, the columns, rowCount and a preview.
+• search_news — relevance-ranked news search (query, ticker?, date_range?, k?); rows are
+                already shaped as event-timeline events.  Prefer it over LIKE scans on news.
+• get_kpis    — ready-made kpi-card props (tickers, metrics?, period?) from a precomputed KPI
+                snapshot: price and period change, 52-week high/low, volume vs average, P/E.
+• get_schema  — return the list of tables and their columns (no args needed).
 
 WORKFLOW:
 1. Read the user question.
-2. Decide which queries to run.  Call `run_query` one or more times to fetch data.
+2. Decide which data you need.  Prefer the typed tools; call `run_query` for anything else.
 3. Synthesize the results into the JSON response described below.
 
 TIME RANGE GUIDANCE:
@@ -59,15 +76,23 @@ Block types and required props:
 • line-chart         — {{ "title", "data": "QUERY_RESULT_N", "xKey", "yKeys": [string] }}
 • candlestick-chart  — {{ "ticker", "data": "QUERY_RESULT_N" }}
 • event-timeline     — {{ "events": "QUERY_RESULT_N" }}
+                       (search_news already returns events; from SQL, alias news columns and use
+                        event_impacts.return_1d_pct as price_impact_pct, never a constant)
 • correlation-matrix — {{ "tickers": [string], "data": "QUERY_RESULT_N", "period" }}
+• data-table         — {{ "title", "handle": "<handle from open_table>", "columns"?: [string] }}
+                       (rows are paged from the server; never inline rows or use a placeholder here)
 
 IMPORTANT:
-• Use "QUERY_RESULT_0", "QUERY_RESULT_1", etc. as placeholders in the props for data that you fetch using the `run_query` tool.
+• Use "QUERY_RESULT_0", "QUERY_RESULT_1", etc. as placeholders in the props for data that you fetch using the
+  `get_prices`, `get_intraday_bars`, `get_metrics`, `get_news`, `get_kpis`, `run_query` or `search_news` tools (numbered in call order across all of them).
 • The backend will automatically replace these placeholders with the actual tool results.
+• For kpi-card blocks, call `get_kpis` once for all tickers; if it is QUERY_RESULT_N, give the block for its i-th
+  object "props": "QUERY_RESULT_N[i]" (it already formats values and changes). Only fall back to `run_query`
+  and literal props if it returns an error.
 • Format numbers nicely in kpi-card values/changes (e.g. "$182.34", "+4.5%").
 • Always include an executive-summary block first for data questions.
 • If the user is greeting, small talk, or not asking for data, set intent to "conversation" and return dashboardSpec.blocks as [].
-• ONLY use the `run_query` tool to fetch data from the database.
+• ONLY use the tools listed above to fetch data from the database.
 
 ──────────────────
 CHAOS COMMANDS
@@ -84,8 +109,15 @@ If the user says any of these, update the chaos object accordingly:
 """
 
 
-def build_agent_prompt(current_chaos: Optional[Dict[str, Any]] = None) -> str:
-    """Build the full system prompt, optionally injecting current chaos state."""
+def build_agent_prompt(
+    current_chaos: Optional[Dict[str, Any]] = None,
+    examples: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Build the full system prompt, optionally injecting current chaos state.
+
+    ``examples`` are similar questions answered before (see
+    ``app.services.traces``), shown with the calls that answered them.
+    """
     if current_chaos:
         chaos_ctx = (
             "CURRENT CHAOS STATE (carry forward unless a chaos command overrides it):\n"
@@ -93,4 +125,65 @@ def build_agent_prompt(current_chaos: Optional[Dict[str, Any]] = None) -> str:
         )
     else:
         chaos_ctx = ""
-    return FINANCEFLIP_SYSTEM_PROMPT.format(chaos_context=chaos_ctx)
+    prompt = FINANCEFLIP_SYSTEM_PROMPT.format(chaos_context=chaos_ctx)
+    if examples:
+        lines = []
+        for example in examples:
+            calls = "; ".join(
+                f"{call['tool']} {json.dumps(call['args'], default=str)}" for call in example["calls"]
+            )
+            lines.append(f"- \"{example['question']}\" -> {calls} -> blocks: {', '.join(example['blocks'])}")
+        prompt += (
+            "\nSIMILAR QUESTIONS ANSWERED BEFORE\n"
+            "These calls answered similar questions without errors. Adapt them (tickers, dates, "
+            "numbers) rather than exploring the schema; {T0}, {T1}... stand for the tickers and "
+            "{N0}, {N1}... for the numbers of the current question, in order of mention:\n"
+            + "\n".join(lines)
+            + "\n"
+        )
+    return prompt
+
+
+# ── Plan-then-execute graph (AGENT_GRAPH=plan) ──
+
+PLAN_PROMPT = """\
+PLANNING STEP: do not answer yet and do not call tools directly.
+List every tool call needed to answer the message above, as JSON only:
+{{"calls": [{{"tool": "<tool name>", "args": {{...}}}}]}}
+Allowed tools: {tools}. At most {max_calls} calls; they run in parallel, so no call may
+depend on another call's result (use the latest data when dates are unknown).
+Data results are numbered in the order listed, starting at QUERY_RESULT_{offset}.
+If no data is needed (greeting, chaos command), return {{"calls": []}}.
+"""
+
+SYNTHESIS_PROMPT = """\
+The planned calls have run. Do not call any tools. Using the results below, reply now in the
+required output format; reference data results by their placeholders.
+
+{results}
+"""
+
+
+# ── Model cascade (ROUTER_MODE=model) ──
+
+ROUTER_PROMPT = """\
+You route messages for FinanceFlip, an assistant that answers questions about stocks with
+dashboards built from a market database (prices, fundamentals, news).
+Decide whether the message below needs that data (anything about companies, tickers, markets,
+prices, metrics or news) or is plain conversation (greetings, thanks, questions about you).
+Reply with JSON only, either {{"route": "data"}} or
+{{"route": "conversation", "assistantMessage": "<short friendly reply>"}}.
+When unsure, reply {{"route": "data"}}.
+
+Message: {message}
+"""
+
+
+# ── Trace replay (see app.services.traces) ──
+
+REPLAY_LAYOUT_PROMPT = """
+DASHBOARD LAYOUT
+A very similar question was answered with the dashboard below; the same calls have been run
+for this question. Build the same layout from the new results, rewriting every text.
+{spec}
+"""
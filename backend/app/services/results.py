@@ -0,0 +1,241 @@
+"""Result handles: query results paged from DuckDB instead of inlined in props.
+
+``run_query`` keeps at most ``MAX_TOOL_ROWS`` rows, which is right for the
+model's context but not for a user scrolling through raw rows.  ``open_table``
+registers a checked SELECT under a handle instead; a ``data-table`` block
+carries only the handle, and the client reads pages from
+``GET /api/results/{handle}`` as it scrolls.
+
+Pages use keyset pagination: the statement is wrapped as a subquery, ordered
+by the requested column and a hash of the whole row, and the next page starts
+after the last row of the previous one.  DuckDB runs each page as a filtered
+top-N, so no page materializes or sorts the full result, and a filter on a
+sorted warehouse column is pushed into the scan.  Identical rows share a
+hash; the cursor counts how many of them were already sent so none are
+skipped or repeated at a page boundary.  Pages always read the current
+snapshot: keyset cursors stay valid when a sync publishes a new one.
+
+Handles are the hash of the statement, so asking for the same result again
+(or refreshing a saved dashboard) yields the same handle.  They live in a
+small SQLite file (``RESULTS_DB_PATH``), capped at ``RESULTS_MAX_HANDLES`` by
+least-recent use.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.db import db_service
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS results (
+    handle TEXT PRIMARY KEY,
+    sql TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+)
+"""
+
+# Helper columns added around the statement; stripped from the rows returned
+KEY_COLUMN = "__ff_key"
+SORT_COLUMN = "__ff_sort"
+
+PAGE_SQL = """
+SELECT * FROM (
+    SELECT ff_row.*, hash(ff_row) AS {key}{sort_text}
+    FROM ({sql}) AS ff_row
+) AS ff_page
+WHERE {after}
+ORDER BY {order}
+LIMIT {limit} OFFSET {skip}
+"""
+
+# Nested values have no total order worth paging by
+_UNSORTABLE = ("[", "STRUCT", "MAP", "UNION")
+
+
+class ResultError(ValueError):
+    """A bad sort column, direction or cursor for a result handle."""
+
+
+@dataclass
+class ResultHandle:
+    handle: str
+    sql: str
+    columns: List[Dict[str, str]]  # {"name", "type"}, in result order
+
+    def column_type(self, name: str) -> Optional[str]:
+        return next((c["type"] for c in self.columns if c["name"] == name), None)
+
+
+def handle_for(sql: str) -> str:
+    return hashlib.sha256(sql.strip().rstrip(";").encode("utf-8")).hexdigest()[:24]
+
+
+def describe(sql: str) -> List[Dict[str, str]]:
+    """Column names and DuckDB types of ``sql``'s result, without running it."""
+    rows = db_service.query(f"DESCRIBE {sql.strip().rstrip(';')}")
+    return [{"name": row["column_name"], "type": row["column_type"]} for row in rows]
+
+
+class ResultStore:
+    """SQLite-backed handles (one short-lived connection per call, as in ``DashboardStore``)."""
+
+    def __init__(self, path: str = settings.results_db_path, max_handles: int = settings.results_max_handles) -> None:
+        self.path = path
+        self.max_handles = max_handles
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                if not self._initialized:
+                    conn.execute(SCHEMA_SQL)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, sql: str, columns: List[Dict[str, str]]) -> ResultHandle:
+        """Store a checked statement; the same statement always gets the same handle."""
+        sql = sql.strip().rstrip(";")
+        handle = handle_for(sql)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO results (handle, sql, columns, created_at, used_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (handle) DO UPDATE SET columns = excluded.columns, used_at = excluded.used_at",
+                (handle, sql, json.dumps(columns), now, now),
+            )
+            conn.execute(
+                "DELETE FROM results WHERE handle IN "
+                "(SELECT handle FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_handles,),
+            )
+        return ResultHandle(handle, sql, columns)
+
+    def get(self, handle: str) -> Optional[ResultHandle]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT sql, columns FROM results WHERE handle = ?", (handle,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET used_at = ? WHERE handle = ?", (time.time(), handle))
+        return ResultHandle(handle, row["sql"], json.loads(row["columns"]))
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as exc:
+        raise ResultError("Malformed cursor") from exc
+    if not isinstance(position, dict) or not all(isinstance(position.get(f), int) for f in ("k", "n")):
+        raise ResultError("Malformed cursor")
+    return position
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def page_query(
+    result: ResultHandle,
+    sort: Optional[str],
+    descending: bool,
+    position: Optional[Dict[str, Any]],
+    limit: int,
+) -> Tuple[str, List[Any]]:
+    """SQL and parameters for the ``limit`` rows after ``position`` (``None``: the first page)."""
+    if sort is None:
+        order, sort_text, after, params = KEY_COLUMN, "", "TRUE", []
+        if position is not None:
+            after, params = f"{KEY_COLUMN} >= ?", [position["k"]]
+    else:
+        column_type = result.column_type(sort)
+        if column_type is None:
+            raise ResultError(f"Unknown sort column {sort!r}")
+        if any(marker in column_type.upper() for marker in _UNSORTABLE):
+            raise ResultError(f"Cannot sort by {sort!r} ({column_type})")
+        column = _quote(sort)
+        # The sort value round-trips through its text form, so the cursor is exact for every type
+        sort_text = f", CAST({column} AS VARCHAR) AS {SORT_COLUMN}"
+        order = f"{column} IS NULL, {column} {'DESC' if descending else 'ASC'}, {KEY_COLUMN}"
+        after, params = "TRUE", []
+        if position is not None and position.get("v") is None:
+            # Past every non-NULL value: NULLs sort last in either direction
+            after, params = f"{column} IS NULL AND {KEY_COLUMN} >= ?", [position["k"]]
+        elif position is not None:
+            value = f"CAST(? AS {column_type})"
+            after = (
+                f"({column} IS NULL OR {column} {'<' if descending else '>'} {value} "
+                f"OR ({column} = {value} AND {KEY_COLUMN} >= ?))"
+            )
+            params = [position["v"], position["v"], position["k"]]
+    skip = position["n"] if position is not None else 0
+    sql = PAGE_SQL.format(
+        key=KEY_COLUMN, sort_text=sort_text, sql=result.sql, after=after, order=order,
+        limit=limit + 1, skip=skip,
+    )
+    return sql, params
+
+
+def fetch_page(
+    result: ResultHandle,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = settings.results_page_rows,
+) -> Dict[str, Any]:
+    """One page of ``result`` and the cursor of the next (``None`` after the last)."""
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None and (position.get("s") != sort or bool(position.get("d")) != descending):
+        raise ResultError("Cursor belongs to a different sort order; start again without it")
+    sql, params = page_query(result, sort, descending, position, limit)
+    rows = db_service.query(sql, params)
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if more:
+        last = rows[-1]
+        boundary = (last.get(SORT_COLUMN), last[KEY_COLUMN])
+        # Rows identical to the last one that the next page must skip
+        sent = 0
+        for row in reversed(rows):
+            if (row.get(SORT_COLUMN), row[KEY_COLUMN]) != boundary:
+                break
+            sent += 1
+        if sent == len(rows) and position is not None and (position.get("v"), position["k"]) == boundary:
+            sent += position["n"]
+        next_cursor = encode_cursor(
+            {"s": sort, "d": int(descending), "v": boundary[0], "k": boundary[1], "n": sent}
+        )
+    return {
+        "rows": [{k: v for k, v in row.items() if k not in (KEY_COLUMN, SORT_COLUMN)} for row in rows],
+        "nextCursor": next_cursor,
+    }
+
+
+def count_rows(result: ResultHandle) -> int:
+    rows = db_service.query(f"SELECT count(*) AS n FROM ({result.sql}) AS ff_row")
+    return int(rows[0]["n"])
+
+
+result_store = ResultStore()
@@ -0,0 +1,190 @@
+"""Server-side conversation sessions for follow-up questions.
+
+A session remembers, per worker, what earlier turns of a conversation
+produced: a compacted history (each user message and the assistant's short
+reply, not the tool chatter), the data-tool results with the call behind
+each one, and the latest dashboard spec with its ``QUERY_RESULT_N``
+placeholders.  A follow-up such as "now add MSFT to that chart" starts with
+those results already in place as ``QUERY_RESULT_0..k-1``, so the agent only
+fetches the new data and extends the previous spec.
+
+Sessions are evicted least-recently-used beyond ``SESSION_MAX_COUNT`` and
+after ``SESSION_TTL_S`` of inactivity.  Each one is capped at
+``SESSION_MAX_BYTES``: the rows of the oldest results are dropped first (their
+calls are kept and re-run when a later turn needs them), then the oldest
+turns.  Results are also re-run when a new warehouse snapshot is published.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Characters of each earlier assistant reply kept in the history
+_REPLY_CHARS = 400
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+@dataclass
+class SessionResult:
+    source: Dict[str, Any]
+    rows: Optional[List[Any]]
+    size: int = 0
+
+
+@dataclass
+class Session:
+    id: str
+    turns: List[Tuple[str, str]] = field(default_factory=list)
+    results: List[SessionResult] = field(default_factory=list)
+    spec: Optional[Dict[str, Any]] = None
+    version: Optional[str] = None
+    updated_at: float = field(default_factory=time.monotonic)
+    # False for a stateless request's session, which is never kept
+    stored: bool = True
+
+    @property
+    def empty(self) -> bool:
+        """No earlier turn, so nothing a replayed trace could contradict."""
+        return not self.turns and not self.results and self.spec is None
+
+    @property
+    def size(self) -> int:
+        return sum(r.size for r in self.results) + sum(len(q) + len(a) for q, a in self.turns)
+
+    def history(self) -> List[Tuple[str, str]]:
+        """Earlier turns as ``(user message, assistant reply)``, oldest first."""
+        return list(self.turns[-settings.session_max_turns :])
+
+    def context_prompt(self) -> str:
+        """System-prompt addendum describing earlier results and the current dashboard."""
+        if not self.results and self.spec is None:
+            return ""
+        lines = []
+        for index, result in enumerate(self.results):
+            rows = result.rows or []
+            columns = ", ".join(rows[0]) if rows and isinstance(rows[0], dict) else ""
+            args = json.dumps(result.source.get("args"), default=str)[:300]
+            lines.append(
+                f"- QUERY_RESULT_{index}: {result.source.get('tool')} {args} "
+                f"({len(rows)} rows; columns: {columns})"
+            )
+        spec = json.dumps(self.spec, default=str) if self.spec else "(none)"
+        return (
+            "\n\nCONVERSATION CONTEXT\n"
+            "This message follows up on earlier turns of the conversation. Data already "
+            "fetched is available without calling any tool:\n"
+            + ("\n".join(lines) or "(no data yet)")
+            + f"\nThe dashboard currently shown is:\n{spec}\n"
+            "If the user asks to change or extend it, start from this spec: keep its blocks "
+            "and placeholders, call tools only for data not listed above (their results are "
+            f"numbered from QUERY_RESULT_{len(self.results)}), and return the full updated spec."
+        )
+
+    def record(
+        self,
+        message: str,
+        result: Dict[str, Any],
+        tool_results: List[List[Any]],
+        tool_sources: List[Dict[str, Any]],
+        version: str,
+    ) -> None:
+        """Remember one finished turn, then shrink the session under its cap."""
+        self.turns.append((message, str(result.get("assistantMessage") or "")[:_REPLY_CHARS]))
+        del self.turns[: -settings.session_max_turns]
+        known = len(self.results)
+        for rows, source in zip(tool_results[known:], tool_sources[known:]):
+            self.results.append(SessionResult(source, rows, _size(rows)))
+        spec = result.get("dashboardSpec")
+        if isinstance(spec, dict) and spec.get("blocks"):
+            self.spec = spec
+        self.version = version
+        self.updated_at = time.monotonic()
+        self._shrink(settings.session_max_bytes)
+
+    def _shrink(self, max_bytes: int) -> None:
+        for result in self.results:
+            if self.size <= max_bytes:
+                return
+            result.rows, result.size = None, 0
+        while self.turns and self.size > max_bytes:
+            self.turns.pop(0)
+
+    async def load_results(self, version: str) -> Tuple[List[List[Any]], List[Dict[str, Any]]]:
+        """Rows and sources of every earlier result, re-running the evicted or stale ones."""
+        from app.services.dashboards import _run_source
+
+        stale = [
+            r for r in self.results if r.rows is None or self.version != version
+        ]
+        if stale:
+            outcomes = await asyncio.gather(
+                *(asyncio.to_thread(_run_source, r.source) for r in stale), return_exceptions=True
+            )
+            for result, rows in zip(stale, outcomes):
+                if isinstance(rows, BaseException):
+                    logger.warning("Could not reload session result: %s", rows)
+                    rows = []
+                result.rows, result.size = rows, _size(rows)
+            self.version = version
+        return [r.rows or [] for r in self.results], [r.source for r in self.results]
+
+
+class SessionStore:
+    """Per-worker LRU of sessions with an inactivity TTL."""
+
+    def __init__(
+        self,
+        max_sessions: int = settings.session_max_count,
+        ttl_s: float = settings.session_ttl_s,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, session_id: Optional[str] = None) -> Session:
+        """Return the live session ``session_id``, or start one under that id.
+
+        Without a (valid) id the request is stateless: its session is never
+        stored, so one-off calls neither hold results nor push conversations
+        out of the LRU.
+        """
+        if not session_id or not SESSION_ID_RE.match(session_id):
+            return Session(id=uuid.uuid4().hex, stored=False)
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, s in self._sessions.items() if now - s.updated_at > self.ttl_s]:
+                del self._sessions[expired]
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(id=session_id)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.updated_at = now
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore()
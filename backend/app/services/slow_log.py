@@ -0,0 +1,215 @@
+"""Slow-query log: DuckDB profiles of expensive statements, grouped by shape.
+
+Agent-written SQL differs in its literals far more than in its structure, so
+every executed statement is reduced to a shape (string and number literals
+become ``?``, literal lists collapse to ``(?, ...)``) and each worker counts
+calls and total time per shape.  A statement slower than ``SLOW_QUERY_MS`` is
+written as one JSON line with its shape, the shape's counters so far and
+DuckDB's profile of that very run: cursors are opened with profiling enabled
+(``no_output``), so nothing has to be re-run under ``EXPLAIN ANALYZE``.
+Every ``SLOW_QUERY_SUMMARY_S``, and at shutdown, the counters of the busiest
+shapes are written as well, so cheap but frequent shapes are ranked too.
+
+The log rotates at ``SLOW_QUERY_LOG_MAX_BYTES``, keeping
+``SLOW_QUERY_LOG_BACKUPS`` older files.  ``scripts/slow_query_report.py``
+reads it offline and suggests rollups, sort orders and indexes for the sync
+job.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILING_SETUP = "SET enable_profiling = 'no_output'"
+# Shapes counted per worker (least recently run dropped first) and written per summary
+MAX_SHAPES = 2000
+SUMMARY_SHAPES = 100
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.$])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# extra_info entries of profiled operators kept in the log, by their log name
+_OPERATOR_INFO = {
+    "Table": "table",
+    "Function": "function",
+    "Filters": "filters",
+    "Groups": "groups",
+    "Aggregates": "aggregates",
+    "Conditions": "conditions",
+    "Join Type": "joinType",
+}
+
+
+def query_shape(sql: str) -> str:
+    """``sql`` with its literals replaced by ``?`` and whitespace collapsed."""
+    shape = _NUMBER.sub("?", _STRING.sub("?", sql))
+    return _SPACE.sub(" ", _LIST.sub("(?, ...)", shape)).strip().rstrip(";")
+
+
+def _text(value: Any) -> str:
+    return ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+
+
+def summarize_profile(profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Totals and a flat, depth-annotated operator list from a DuckDB JSON profile."""
+    if "children" not in profile:
+        return None
+    operators: List[Dict[str, Any]] = []
+
+    def walk(node: Dict[str, Any], depth: int) -> None:
+        info = node.get("extra_info") or {}
+        operator = {
+            "name": node.get("operator_name") or node.get("operator_type"),
+            "depth": depth,
+            "ms": round(float(node.get("operator_timing") or 0.0) * 1000, 3),
+            "rows": node.get("operator_cardinality"),
+            "rowsScanned": node.get("operator_rows_scanned"),
+        }
+        operator.update({name: _text(info[key]) for key, name in _OPERATOR_INFO.items() if key in info})
+        operators.append(operator)
+        for child in node.get("children", []):
+            walk(child, depth + 1)
+
+    for child in profile["children"]:
+        walk(child, 0)
+    return {
+        "latencyMs": round(float(profile.get("latency") or 0.0) * 1000, 3),
+        "cpuMs": round(float(profile.get("cpu_time") or 0.0) * 1000, 3),
+        "rowsScanned": profile.get("cumulative_rows_scanned"),
+        "rowsReturned": profile.get("rows_returned"),
+        "peakMemory": profile.get("system_peak_buffer_memory"),
+        "spilledBytes": profile.get("system_peak_temp_dir_size"),
+        "operators": operators,
+    }
+
+
+class SlowQueryLog:
+    """One worker's per-shape counters and the rotating JSON-lines log they go to."""
+
+    def __init__(
+        self,
+        path: str = settings.slow_query_log_path,
+        threshold_ms: float = settings.slow_query_ms,
+        max_bytes: int = settings.slow_query_log_max_bytes,
+        backups: int = settings.slow_query_log_backups,
+        summary_s: float = settings.slow_query_summary_s,
+    ) -> None:
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.summary_s = summary_s
+        # Counters restart with the process, so the report sums them per worker
+        self.worker = uuid.uuid4().hex[:12]
+        self._shapes: "OrderedDict[str, List[float]]" = OrderedDict()  # shape -> [calls, total ms]
+        self._summarized_at = time.monotonic()
+        self._handler: Optional[RotatingFileHandler] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def observe(
+        self,
+        sql: str,
+        elapsed_s: float,
+        conn: Any,
+        shape_sql: Optional[str] = None,
+        timed_out: bool = False,
+    ) -> None:
+        """Count one executed statement; log it with its profile if it was slow.
+
+        ``conn`` is the cursor that ran it (read before it goes back to the
+        pool); ``shape_sql`` is the prepared body when ``sql`` is an ``EXECUTE``.
+        """
+        if not self.enabled:
+            return
+        shape = query_shape(shape_sql or sql)
+        elapsed_ms = elapsed_s * 1000
+        now = time.monotonic()
+        with self._lock:
+            counters = self._shapes.pop(shape, None) or [0, 0.0]
+            counters[0] += 1
+            counters[1] += elapsed_ms
+            self._shapes[shape] = counters
+            while len(self._shapes) > MAX_SHAPES:
+                self._shapes.popitem(last=False)
+            calls, total_ms = counters
+            summarize = now - self._summarized_at >= self.summary_s
+            if summarize:
+                self._summarized_at = now
+        if elapsed_ms >= self.threshold_ms:
+            self._write({
+                "kind": "slow",
+                "at": time.time(),
+                "worker": self.worker,
+                "shape": shape,
+                "sql": sql,
+                "ms": round(elapsed_ms, 1),
+                "calls": calls,
+                "totalMs": round(total_ms, 1),
+                "timedOut": timed_out,
+                "profile": None if timed_out else self._profile(conn),
+            })
+        if summarize:
+            self.flush()
+
+    @staticmethod
+    def _profile(conn: Any) -> Optional[Dict[str, Any]]:
+        try:
+            return summarize_profile(json.loads(conn.get_profiling_information(format="json")))
+        except Exception as exc:
+            logger.debug("No DuckDB profile for slow query: %s", exc)
+            return None
+
+    def flush(self) -> None:
+        """Write the counters of the busiest shapes."""
+        with self._lock:
+            counted = [(shape, calls, total) for shape, (calls, total) in self._shapes.items()]
+        counted.sort(key=lambda item: item[2], reverse=True)
+        if counted:
+            self._write({
+                "kind": "shapes",
+                "at": time.time(),
+                "worker": self.worker,
+                "shapes": [
+                    {"shape": shape, "calls": calls, "totalMs": round(total, 1)}
+                    for shape, calls, total in counted[:SUMMARY_SHAPES]
+                ],
+            })
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._handler is None:
+                self._handler = RotatingFileHandler(
+                    self.path, maxBytes=self.max_bytes, backupCount=self.backups,
+                    encoding="utf-8", delay=True,
+                )
+            handler = self._handler
+        handler.handle(logging.makeLogRecord({"msg": json.dumps(entry, default=str)}))
+
+    def close(self) -> None:
+        if self.enabled:
+            self.flush()
+        with self._lock:
+            handler, self._handler = self._handler, None
+        if handler is not None:
+            handler.close()
+
+
+slow_query_log = SlowQueryLog()
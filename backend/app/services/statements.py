@@ -0,0 +1,247 @@
+"""Named, parameterized query shapes behind the typed agent tools.
+
+Most agent questions need one of a few queries: a price window for some
+tickers, the latest fundamentals, or recent news.  Rather than have the model
+write that SQL each time (and DuckDB parse, bind and plan it each time), each
+shape is registered here once as a ``Statement`` and run through
+``DuckDBService.query_prepared``, which prepares it on each pooled cursor on
+first use and then only sends ``EXECUTE``.
+
+``EXECUTE`` cannot take bound parameters, so every argument is validated and
+rendered as a literal by its parameter kind before it reaches SQL.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.services.db import INTRADAY_STORED_BARS, db_service
+
+TICKER_RE = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,14}$")
+
+# get_prices interval -> date_trunc part
+INTERVALS = {"1d": "day", "1w": "week", "1mo": "month", "1q": "quarter", "1y": "year"}
+
+# get_intraday_bars bar -> minutes; each is read from the coarsest stored table
+# (INTRADAY_STORED_BARS) whose bars tile it
+INTRADAY_BARS = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "1d": 1440, "1w": 7 * 1440}
+# Regular session length, to estimate how many bars a range holds
+SESSION_MINUTES = 390
+# Sub-day buckets start at the 09:30 open rather than on the clock hour
+SESSION_ORIGIN = "2000-01-03 09:30:00"
+DAY_ORIGIN = "2000-01-03 00:00:00"  # a Monday, so weekly bars start on Mondays
+
+
+def normalize_tickers(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    tickers = list(dict.fromkeys(str(t).strip().upper() for t in value or [] if str(t).strip()))
+    if not tickers:
+        raise ValueError("At least one ticker is required")
+    for ticker in tickers:
+        if not TICKER_RE.match(ticker):
+            raise ValueError(f"Invalid ticker {ticker!r}")
+    return tickers
+
+
+def tickers_literal(value: Any) -> str:
+    return "[" + ", ".join(f"'{t}'" for t in normalize_tickers(value)) + "]"
+
+
+def date_literal(value: Any) -> str:
+    if value is None or value == "":
+        return "NULL"
+    try:
+        return f"'{date.fromisoformat(str(value)[:10]).isoformat()}'"
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}; use YYYY-MM-DD") from None
+
+
+def interval_literal(value: Any) -> str:
+    part = INTERVALS.get(str(value or "1d").strip().lower())
+    if part is None:
+        raise ValueError(f"Invalid interval {value!r}; use one of {', '.join(INTERVALS)}")
+    return f"'{part}'"
+
+
+def parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip().rstrip("Z"))
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}; use YYYY-MM-DD or YYYY-MM-DDTHH:MM") from None
+
+
+def timestamp_literal(value: Any) -> str:
+    return f"'{parse_timestamp(value).isoformat(sep=' ')}'"
+
+
+def bar_minutes(value: Any) -> int:
+    minutes = INTRADAY_BARS.get(str(value or "").strip().lower())
+    if minutes is None:
+        raise ValueError(f"Invalid bar {value!r}; use auto or one of {', '.join(INTRADAY_BARS)}")
+    return minutes
+
+
+def bar_interval_literal(value: Any) -> str:
+    return f"'{bar_minutes(value)} minutes'"
+
+
+def bar_origin_literal(value: Any) -> str:
+    return f"'{DAY_ORIGIN if bar_minutes(value) >= 1440 else SESSION_ORIGIN}'"
+
+
+def weekdays(first: date, last: date) -> int:
+    """Monday-to-Friday dates from ``first`` to ``last``, inclusive."""
+    total = (last - first).days + 1
+    if total <= 0:
+        return 0
+    weeks, rest = divmod(total, 7)
+    return weeks * 5 + sum((first.weekday() + i) % 7 < 5 for i in range(rest))
+
+
+def estimate_bars(start: datetime, end: datetime, minutes: int) -> int:
+    """Bars of ``minutes`` per ticker in [start, end), counting session time only."""
+    days = max(weekdays(start.date(), (end - timedelta(microseconds=1)).date()), 1)
+    if minutes >= 1440:
+        return math.ceil(days / max(minutes // 1440 * 5 / 7, 1))
+    if days == 1:
+        session = min(max((end - start).total_seconds() / 60, 0.0), SESSION_MINUTES)
+    else:
+        session = days * SESSION_MINUTES
+    return math.ceil(session / minutes)
+
+
+def choose_bar(start: datetime, end: datetime, tickers: int, max_rows: int, requested: str = "auto") -> str:
+    """The finest bar, no finer than ``requested``, whose rows for the range fit in ``max_rows``.
+
+    Multi-month ranges thus come from the daily rollup, never from raw minutes.
+    """
+    floor = 0 if str(requested or "auto").lower() == "auto" else bar_minutes(requested)
+    for bar, minutes in INTRADAY_BARS.items():
+        if minutes >= floor and estimate_bars(start, end, minutes) * tickers <= max_rows:
+            return bar
+    return "1w"
+
+
+def stored_bar(bar: str) -> str:
+    """The coarsest stored bar size that ``bar`` can be resampled from."""
+    minutes = bar_minutes(bar)
+    return max(
+        (stored for stored, size in INTRADAY_STORED_BARS.items() if minutes % size == 0),
+        key=INTRADAY_STORED_BARS.__getitem__,
+    )
+
+
+def limit_literal(maximum: int) -> Callable[[Any], str]:
+    def render(value: Any) -> str:
+        try:
+            return str(max(1, min(int(value), maximum)))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid limit {value!r}") from None
+
+    return render
+
+
+@dataclass(frozen=True)
+class Statement:
+    """A query shape with ``$1..$n`` placeholders and one renderer per argument."""
+
+    name: str
+    sql: str
+    params: Tuple[Tuple[str, Callable[[Any], str]], ...]
+
+    def render_args(self, args: Dict[str, Any]) -> str:
+        return ", ".join(render(args.get(param)) for param, render in self.params)
+
+    def run(self, **args: Any) -> List[Dict[str, Any]]:
+        return db_service.query_prepared(self.name, self.sql, self.render_args(args))
+
+
+PRICE_WINDOW = Statement(
+    name="ff_price_window",
+    sql="""
+SELECT ticker, date_trunc($4::VARCHAR, date) AS date,
+       arg_min(open, date) AS open, max(high) AS high, min(low) AS low,
+       arg_max(close, date) AS close, sum(volume) AS volume
+FROM stock_prices
+WHERE list_contains($1::VARCHAR[], ticker)
+  AND ($2::TIMESTAMP IS NULL OR date >= $2::TIMESTAMP)
+  AND ($3::TIMESTAMP IS NULL OR date < $3::TIMESTAMP + INTERVAL 1 DAY)
+GROUP BY ALL
+ORDER BY ticker, date
+""",
+    params=(
+        ("tickers", tickers_literal),
+        ("start", date_literal),
+        ("end", date_literal),
+        ("interval", interval_literal),
+    ),
+)
+
+LATEST_METRICS = Statement(
+    name="ff_latest_metrics",
+    sql="""
+SELECT * FROM financial_metrics
+WHERE list_contains($1::VARCHAR[], ticker)
+QUALIFY row_number() OVER (PARTITION BY ticker ORDER BY report_period DESC) <= $2::INTEGER
+ORDER BY ticker, report_period DESC
+""",
+    params=(("tickers", tickers_literal), ("periods", limit_literal(20))),
+)
+
+NEWS_WINDOW = Statement(
+    name="ff_news_window",
+    sql="""
+SELECT date, ticker, title, source, url, sentiment
+FROM news
+WHERE list_contains($1::VARCHAR[], ticker)
+  AND ($2::TIMESTAMP IS NULL OR date >= $2::TIMESTAMP)
+  AND ($3::TIMESTAMP IS NULL OR date < $3::TIMESTAMP + INTERVAL 1 DAY)
+ORDER BY date DESC
+LIMIT $4::INTEGER
+""",
+    params=(
+        ("tickers", tickers_literal),
+        ("start", date_literal),
+        ("end", date_literal),
+        ("limit", limit_literal(200)),
+    ),
+)
+
+
+def _intraday_window(stored: str) -> Statement:
+    # ticker = ANY(...) rather than list_contains: only the former prunes row groups
+    return Statement(
+        name=f"ff_intraday_{stored}",
+        sql=f"""
+SELECT ticker, time_bucket($4::INTERVAL, ts, $5::TIMESTAMP) AS date,
+       arg_min(open, ts) AS open, max(high) AS high, min(low) AS low,
+       arg_max(close, ts) AS close, sum(volume) AS volume
+FROM intraday_bars_{stored}
+WHERE ticker = ANY($1::VARCHAR[])
+  AND ts >= $2::TIMESTAMP AND ts < $3::TIMESTAMP
+GROUP BY ALL
+ORDER BY ticker, date
+""",
+        params=(
+            ("tickers", tickers_literal),
+            ("start", timestamp_literal),
+            ("end", timestamp_literal),
+            ("bar", bar_interval_literal),
+            ("bar", bar_origin_literal),
+        ),
+    )
+
+
+# Stored bar size -> resampling statement over its table
+INTRADAY_WINDOWS = {stored: _intraday_window(stored) for stored in INTRADAY_STORED_BARS}
+
+STATEMENTS = {
+    s.name: s for s in (PRICE_WINDOW, LATEST_METRICS, NEWS_WINDOW, *INTRADAY_WINDOWS.values())
+}
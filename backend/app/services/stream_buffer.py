@@ -0,0 +1,334 @@
+"""Replay buffers that make ``/api/query/stream`` resumable.
+
+A streamed agent run is decoupled from the connection that started it: the
+run writes its SSE frames, each tagged ``id: <run>:<seq>``, to a
+``StreamHub`` and every connection (the original one or a reconnect carrying
+``Last-Event-ID``) follows the hub from the last sequence number it saw.  A
+dropped connection therefore loses nothing, and a reconnect neither re-runs
+the agent nor receives frames twice.
+
+Frames are kept for ``STREAM_BUFFER_TTL_S`` after a run's last frame, at most
+``STREAM_BUFFER_MAX_BYTES`` per run (oldest frames are dropped first; the
+final ``result`` and ``done`` frames are always the newest) and at most
+``STREAM_BUFFER_MAX_RUNS`` runs.  Two stores are available
+(``STREAM_BUFFER_STORE``):
+
+- ``memory``: per worker; a reconnect must reach the same worker.
+- ``sqlite``: a small SQLite file (``STREAM_BUFFER_PATH``) shared by all
+  workers on the host; followers on other workers poll it.
+
+Followers also record when they last read a run, so the run can be cancelled
+once nobody has been attached for ``STREAM_RESUME_GRACE_S``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from app.core.config import settings
+
+# Frames after a sequence number, and whether the run has finished
+ReadResult = Tuple[List[Tuple[int, bytes]], bool]
+
+T = TypeVar("T")
+
+# Followers record that they are attached at most this often
+_TOUCH_INTERVAL_S = 1.0
+
+
+class _Run:
+    __slots__ = ("frames", "size", "finished", "updated_at", "read_at")
+
+    def __init__(self, now: float) -> None:
+        self.frames: Deque[Tuple[int, bytes]] = deque()
+        self.size = 0
+        self.finished = False
+        self.updated_at = now
+        self.read_at = now
+
+
+class MemoryStreamStore:
+    """Per-worker frame buffers, bounded per run and in run count."""
+
+    def __init__(self, ttl_s: float, max_run_bytes: int, max_runs: int) -> None:
+        self.ttl_s = ttl_s
+        self.max_run_bytes = max_run_bytes
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, _Run]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        for run_id in [r for r, run in self._runs.items() if now - run.updated_at > self.ttl_s]:
+            del self._runs[run_id]
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+
+    def open(self, run_id: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._runs[run_id] = _Run(now)
+            self._purge(now)
+
+    def append(self, run_id: str, seq: int, frame: bytes) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run.frames.append((seq, frame))
+            run.size += len(frame)
+            run.updated_at = time.monotonic()
+            while run.size > self.max_run_bytes and len(run.frames) > 1:
+                run.size -= len(run.frames.popleft()[1])
+
+    def finish(self, run_id: str) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run.finished = True
+                run.updated_at = time.monotonic()
+
+    def read(self, run_id: str, after: int) -> Optional[ReadResult]:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or time.monotonic() - run.updated_at > self.ttl_s:
+                return None
+            return [(seq, frame) for seq, frame in run.frames if seq > after], run.finished
+
+    def touch(self, run_id: str) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run.read_at = time.monotonic()
+
+    def idle_s(self, run_id: str) -> float:
+        """Seconds since a follower last read the run (infinite if it is gone)."""
+        with self._lock:
+            run = self._runs.get(run_id)
+            return float("inf") if run is None else time.monotonic() - run.read_at
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS stream_runs (
+    id TEXT PRIMARY KEY,
+    finished INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    read_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stream_events (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    frame BLOB NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+
+class SqliteStreamStore:
+    """Frame buffers in a SQLite file shared by the workers on one host.
+
+    Wall-clock timestamps are used because they are compared across
+    processes; one short-lived connection per call, as in ``DashboardStore``.
+    """
+
+    def __init__(self, path: str, ttl_s: float, max_run_bytes: int, max_runs: int) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_run_bytes = max_run_bytes
+        self.max_runs = max_runs
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                if not self._initialized:
+                    conn.executescript(SCHEMA_SQL)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    def open(self, run_id: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            expired = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM stream_runs WHERE updated_at < ?", (now - self.ttl_s,)
+                )
+            ]
+            expired += [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM stream_runs WHERE updated_at >= ? "
+                    "ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                    (now - self.ttl_s, max(self.max_runs - 1, 0)),
+                )
+            ]
+            if expired:
+                marks = ", ".join("?" * len(expired))
+                conn.execute(f"DELETE FROM stream_events WHERE run_id IN ({marks})", expired)
+                conn.execute(f"DELETE FROM stream_runs WHERE id IN ({marks})", expired)
+            conn.execute(
+                "INSERT OR REPLACE INTO stream_runs (id, updated_at, read_at) VALUES (?, ?, ?)",
+                (run_id, now, now),
+            )
+
+    def append(self, run_id: str, seq: int, frame: bytes) -> None:
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE stream_runs SET size = size + ?, updated_at = ? WHERE id = ?",
+                (len(frame), time.time(), run_id),
+            )
+            if updated.rowcount == 0:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO stream_events (run_id, seq, frame) VALUES (?, ?, ?)",
+                (run_id, seq, frame),
+            )
+            (size,) = conn.execute("SELECT size FROM stream_runs WHERE id = ?", (run_id,)).fetchone()
+            if size > self.max_run_bytes:
+                self._trim(conn, run_id)
+
+    def _trim(self, conn: sqlite3.Connection, run_id: str) -> None:
+        """Drop the oldest frames until the run fits its byte budget again."""
+        kept, cutoff = 0, None
+        for seq, length in conn.execute(
+            "SELECT seq, length(frame) FROM stream_events WHERE run_id = ? ORDER BY seq DESC",
+            (run_id,),
+        ):
+            if kept and kept + length > self.max_run_bytes:
+                cutoff = seq
+                break
+            kept += length
+        if cutoff is not None:
+            conn.execute("DELETE FROM stream_events WHERE run_id = ? AND seq <= ?", (run_id, cutoff))
+            conn.execute("UPDATE stream_runs SET size = ? WHERE id = ?", (kept, run_id))
+
+    def finish(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE stream_runs SET finished = 1, updated_at = ? WHERE id = ?", (time.time(), run_id)
+            )
+
+    def read(self, run_id: str, after: int) -> Optional[ReadResult]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT finished, updated_at FROM stream_runs WHERE id = ?", (run_id,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl_s:
+                return None
+            frames = conn.execute(
+                "SELECT seq, frame FROM stream_events WHERE run_id = ? AND seq > ? ORDER BY seq",
+                (run_id, after),
+            ).fetchall()
+        return [(seq, bytes(frame)) for seq, frame in frames], bool(row[0])
+
+    def touch(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE stream_runs SET read_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def idle_s(self, run_id: str) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT read_at FROM stream_runs WHERE id = ?", (run_id,)).fetchone()
+        return float("inf") if row is None else time.time() - row[0]
+
+
+StreamStore = Union[MemoryStreamStore, SqliteStreamStore]
+
+
+def build_stream_store() -> StreamStore:
+    if settings.stream_buffer_store == "sqlite":
+        return SqliteStreamStore(
+            settings.stream_buffer_path,
+            settings.stream_buffer_ttl_s,
+            settings.stream_buffer_max_bytes,
+            settings.stream_buffer_max_runs,
+        )
+    return MemoryStreamStore(
+        settings.stream_buffer_ttl_s, settings.stream_buffer_max_bytes, settings.stream_buffer_max_runs
+    )
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """``"<run>:<seq>"`` (an SSE ``Last-Event-ID``) -> ``(run, seq)``."""
+    run_id, _, seq = (value or "").strip().partition(":")
+    if not run_id.isalnum() or not seq.isdigit():
+        return None
+    return run_id, int(seq)
+
+
+class StreamHub:
+    """Publishes a run's frames to the store and serves followers from it.
+
+    SQLite store calls run in a thread (as the other SQLite stores' callers
+    do), so a slow disk delays that stream rather than the event loop.
+    """
+
+    def __init__(self, store: StreamStore, poll_s: float) -> None:
+        self.store = store
+        self.poll_s = poll_s
+        # run -> event set on the next publish (followers in this worker)
+        self._wakeups: Dict[str, asyncio.Event] = {}
+
+    async def _call(self, method: Callable[..., T], *args: Any) -> T:
+        if isinstance(self.store, SqliteStreamStore):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def open(self, run_id: str) -> None:
+        await self._call(self.store.open, run_id)
+
+    async def exists(self, run_id: str) -> bool:
+        return await self._call(self.store.read, run_id, 2**62) is not None
+
+    async def publish(self, run_id: str, seq: int, frame: bytes) -> None:
+        await self._call(self.store.append, run_id, seq, frame)
+        self._wake(run_id)
+
+    async def close(self, run_id: str) -> None:
+        await self._call(self.store.finish, run_id)
+        self._wake(run_id)
+
+    def _wake(self, run_id: str) -> None:
+        wakeup = self._wakeups.pop(run_id, None)
+        if wakeup is not None:
+            wakeup.set()
+
+    async def abandoned(self, run_id: str, grace_s: float) -> bool:
+        return await self._call(self.store.idle_s, run_id) > grace_s
+
+    async def follow(self, run_id: str, after: int = 0) -> AsyncIterator[bytes]:
+        """Yield the run's frames after ``after`` until it finishes (or expires)."""
+        touched = 0.0
+        while True:
+            now = time.monotonic()
+            if now - touched >= _TOUCH_INTERVAL_S:
+                await self._call(self.store.touch, run_id)
+                touched = now
+            batch = await self._call(self.store.read, run_id, after)
+            if batch is None:
+                return
+            frames, finished = batch
+            for seq, frame in frames:
+                after = seq
+                yield frame
+            if finished:
+                return
+            wakeup = self._wakeups.setdefault(run_id, asyncio.Event())
+            try:
+                # Frames published by other workers are only seen by polling
+                await asyncio.wait_for(wakeup.wait(), timeout=self.poll_s)
+            except asyncio.TimeoutError:
+                pass
+
+
+stream_hub = StreamHub(build_stream_store(), settings.stream_buffer_poll_s)
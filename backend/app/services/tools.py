@@ -8,11 +8,28 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import List
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import duckdb
 from langchain_core.tools import tool
 
-from app.services.db import db_service
+from app.core.config import settings
+from app.services.db import QueryTimeout, db_service
+from app.services.results import count_rows, describe, fetch_page, result_store
+from app.services.statements import (
+    INTRADAY_WINDOWS,
+    LATEST_METRICS,
+    NEWS_WINDOW,
+    PRICE_WINDOW,
+    Statement,
+    choose_bar,
+    normalize_tickers,
+    parse_timestamp,
+    stored_bar,
+    tickers_literal,
+)
 from app.utils.sql_guard import is_safe_sql
 
 logger = logging.getLogger(__name__)
@@ -33,15 +50,74 @@ DB_SCHEMA = {
         "author VARCHAR", "source VARCHAR", "url VARCHAR",
         "sentiment DOUBLE",
     ],
+    "event_impacts": [
+        "news_id BIGINT", "ticker VARCHAR", "date TIMESTAMP", "url VARCHAR", "base_date TIMESTAMP",
+        "base_close DOUBLE", "return_1d_pct DOUBLE", "return_5d_pct DOUBLE",
+        "abnormal_1d_pct DOUBLE", "abnormal_5d_pct DOUBLE",
+    ],
+    "ticker_kpis": [
+        "ticker VARCHAR", "period VARCHAR", "as_of TIMESTAMP", "latest_close DOUBLE",
+        "start_close DOUBLE", "change_pct DOUBLE", "high_52w DOUBLE", "low_52w DOUBLE",
+        "latest_volume BIGINT", "avg_volume DOUBLE", "report_period DATE", "pe_ratio DOUBLE",
+        "prev_pe_ratio DOUBLE", "market_cap DOUBLE", "prev_market_cap DOUBLE",
+    ],
+    **{
+        f"intraday_bars_{bar}": [
+            "ticker VARCHAR", "ts TIMESTAMP", "open DOUBLE", "high DOUBLE",
+            "low DOUBLE", "close DOUBLE", "volume BIGINT",
+        ]
+        for bar in ("1m", "5m", "30m", "1d")
+    },
 }
 
 
+# Row cap shared by the data tools, to keep the model's context manageable
+MAX_TOOL_ROWS = 200
+
+_TRAILING_LIMIT = re.compile(r"\blimit\s+\d+(\s+offset\s+\d+)?\s*;?\s*$", re.IGNORECASE)
+
+
+class QueryTooExpensive(ValueError):
+    """A statement whose estimated cardinality is over ``QUERY_MAX_ESTIMATED_ROWS``."""
+
+
+def govern_sql(sql: str, max_rows: Optional[int] = MAX_TOOL_ROWS) -> str:
+    """Check ``sql`` against DuckDB's cardinality estimates before it runs.
+
+    A plan with an operator estimated above ``QUERY_MAX_ESTIMATED_ROWS`` (a
+    cross join, an unbounded self-join) is rejected.  A statement estimated to
+    return more than ``max_rows`` rows gets a ``LIMIT`` so the rest is never
+    materialized; pass ``None`` for statements that are paged instead (see
+    ``open_table``).  Sampling is not used: it would silently change the
+    numbers on a financial dashboard.
+    """
+    budget = settings.query_max_estimated_rows
+    if budget <= 0:
+        return sql
+    estimate = db_service.estimate_rows(sql)
+    if estimate is None:
+        return sql
+    output_rows, peak_rows = estimate
+    if peak_rows > budget:
+        logger.info("run_query rejected by cost pre-check", extra={"sql": sql, "estimate": peak_rows})
+        raise QueryTooExpensive(
+            f"Query rejected before running: DuckDB estimates {peak_rows:,} intermediate rows "
+            f"(limit {budget:,}). Filter by ticker and date, aggregate, or avoid cross joins."
+        )
+    if max_rows is not None and output_rows > max_rows and not _TRAILING_LIMIT.search(sql):
+        return f"SELECT * FROM ({sql.strip().rstrip(';')}) AS bounded LIMIT {max_rows}"
+    return sql
+
+
 @tool
 def run_query(sql: str) -> str:
     """Execute a read-only SQL query against the FinanceFlip DuckDB database.
 
     Only SELECT queries are allowed.  Tables: stock_prices, financial_metrics, news.
-    Returns results as a JSON array of objects (max 200 rows).
+    Returns results as a JSON array of objects (max 200 rows); use open_table
+    to show the user more rows than that.  Statements DuckDB estimates to be
+    too expensive are rejected before they run, and long-running ones are
+    stopped; filter and aggregate in SQL.
 
     Args:
         sql: A valid SELECT SQL query.
@@ -50,16 +126,429 @@ def run_query(sql: str) -> str:
         return json.dumps({"error": "Query rejected — only SELECT on allowed tables."})
 
     try:
-        rows = db_service.query(sql)
-        # Cap at 200 rows to keep context manageable
-        if len(rows) > 200:
-            rows = rows[:200]
+        rows = db_service.query(govern_sql(sql))
+        rows = rows[:MAX_TOOL_ROWS]
         return json.dumps(rows, default=str)
+    except (QueryTooExpensive, QueryTimeout) as exc:
+        return json.dumps({"error": str(exc)})
     except Exception as exc:
         logger.exception("Tool run_query failed", extra={"sql": sql})
         return json.dumps({"error": str(exc)})
 
 
+# Rows of an opened table shown to the model
+TABLE_PREVIEW_ROWS = 5
+
+
+@tool
+def open_table(sql: str) -> str:
+    """Register a read-only SQL query as a paged table for a data-table block.
+
+    Use it when the user wants to browse raw rows, more than run_query's 200.
+    Nothing is loaded here: the dashboard pages through the result on the
+    server as the user scrolls and sorts.  Returns the handle to put in a
+    data-table block's props, the columns, the row count and a few rows.
+
+    Args:
+        sql: A valid SELECT SQL query; leave out LIMIT and ORDER BY.
+    """
+    if not is_safe_sql(sql):
+        return json.dumps({"error": "Query rejected — only SELECT on allowed tables."})
+
+    try:
+        sql = govern_sql(sql, max_rows=None)
+        result = result_store.register(sql, describe(sql))
+        preview = fetch_page(result, limit=TABLE_PREVIEW_ROWS)["rows"]
+        return json.dumps(
+            {
+                "handle": result.handle,
+                "columns": [c["name"] for c in result.columns],
+                "rowCount": count_rows(result),
+                "preview": preview,
+            },
+            default=str,
+        )
+    except (QueryTooExpensive, QueryTimeout) as exc:
+        return json.dumps({"error": str(exc)})
+    except Exception as exc:
+        logger.exception("Tool open_table failed", extra={"sql": sql})
+        return json.dumps({"error": str(exc)})
+
+
+# Event-timeline event shape shared by news-derived tools
+EVENT_COLUMNS = """
+    strftime(n.date, '%Y-%m-%d') AS date, n.ticker, 'news' AS entry_type, n.title,
+    n.source AS summary, n.sentiment AS sentiment_score, {impact} AS price_impact_pct
+"""
+
+IMPACT_JOIN = """
+LEFT JOIN event_impacts e ON e.news_id = n.news_id
+"""
+
+NEWS_FILTERS = """
+    (?::VARCHAR IS NULL OR n.ticker = ?)
+    AND (?::TIMESTAMP IS NULL OR n.date >= ?::TIMESTAMP)
+    AND (?::TIMESTAMP IS NULL OR n.date < ?::TIMESTAMP + INTERVAL 1 DAY)
+"""
+
+BM25_SEARCH_SQL = """
+SELECT {columns}
+FROM (
+    SELECT *, fts_main_news_search.match_bm25(news_id, ?) AS score
+    FROM news_search
+) n
+{join}
+WHERE n.score IS NOT NULL AND {filters}
+ORDER BY n.score DESC, n.date DESC
+LIMIT ?
+"""
+
+SUBSTRING_SEARCH_SQL = """
+SELECT {columns}
+FROM {source} n
+{join}
+WHERE (n.title ILIKE '%' || ? || '%' OR n.source ILIKE '%' || ? || '%') AND {filters}
+ORDER BY n.date DESC
+LIMIT ?
+"""
+
+DERIVED_OBJECTS_SQL = """
+SELECT table_name AS name FROM duckdb_tables()
+UNION ALL
+SELECT schema_name AS name FROM duckdb_schemas()
+"""
+
+
+def _derived_objects() -> set:
+    # Cached per snapshot version by the DB service
+    return {row["name"] for row in db_service.query(DERIVED_OBJECTS_SQL)}
+
+
+def _has_news_index() -> bool:
+    return "fts_main_news_search" in _derived_objects()
+
+
+def _news_events_sql(template: str) -> str:
+    """Fill a news search template, joining precomputed price impacts when present.
+
+    Impacts are keyed by ``news_search.news_id``; a snapshot that has them
+    always has ``news_search`` too.
+    """
+    if "event_impacts" in _derived_objects():
+        source, join = "news_search", IMPACT_JOIN
+        impact = "coalesce(round(e.return_1d_pct, 2), 0.0)"
+    else:
+        source, impact, join = "news", "0.0", ""
+    return template.format(
+        columns=EVENT_COLUMNS.format(impact=impact), join=join, filters=NEWS_FILTERS, source=source
+    )
+
+
+def _parse_date_range(
+    date_range: Union[List[Optional[str]], str, None],
+) -> Tuple[Optional[str], Optional[str]]:
+    """Accept ``[start, end]`` or a ``"start..end"`` / ``"start,end"`` string.
+
+    A bare date string is read as that single day.
+    """
+    if isinstance(date_range, str):
+        parts = re.split(r"\.\.|,", date_range)
+        if len(parts) == 1:
+            parts = parts * 2
+    else:
+        parts = list(date_range or [])
+    if len(parts) > 2:
+        raise ValueError(f"date_range takes at most two dates, got {date_range!r}")
+    start, end = ([(p or "").strip() or None for p in parts] + [None, None])[:2]
+    return start, end
+
+
+@tool
+def search_news(
+    query: str,
+    ticker: Optional[str] = None,
+    date_range: Union[List[Optional[str]], str, None] = None,
+    k: int = 10,
+) -> str:
+    """Search news headlines and sources, ranked by relevance (BM25).
+
+    Returns up to k articles already shaped as event-timeline events:
+    { date, ticker, entry_type, title, summary, sentiment_score, price_impact_pct },
+    where price_impact_pct is the return over the article's trading day.
+    Use this instead of LIKE scans over the news table.
+
+    Args:
+        query: Keywords to search for, e.g. "earnings guidance" or "recall".
+        ticker: Optional ticker to restrict results to, e.g. "TSLA".
+        date_range: Optional [start, end] ISO dates (inclusive); either may be null.
+            "start..end" is also accepted.
+        k: Maximum number of articles to return (1-50).
+    """
+    ticker = ticker.upper() if ticker else None
+    k = max(1, min(int(k), 50))
+
+    try:
+        start, end = _parse_date_range(date_range)
+        filters = [ticker, ticker, start, start, end, end]
+        if _has_news_index():
+            rows = db_service.query(_news_events_sql(BM25_SEARCH_SQL), [query, *filters, k])
+        else:
+            rows = db_service.query(
+                _news_events_sql(SUBSTRING_SEARCH_SQL), [query, query, *filters, k]
+            )
+        return json.dumps(rows, default=str)
+    except Exception as exc:
+        logger.exception("Tool search_news failed", extra={"query": query})
+        return json.dumps({"error": str(exc)})
+
+
+KPI_PERIODS = ("1w", "1m", "3m", "6m", "ytd", "1y")
+KPI_METRICS = ("price", "52w_high", "52w_low", "volume", "pe_ratio", "market_cap")
+DEFAULT_KPI_METRICS = ("price", "52w_high", "52w_low", "volume", "pe_ratio")
+
+KPI_LOOKUP_SQL = "SELECT * FROM ticker_kpis WHERE period = ? AND ticker IN ({placeholders})"
+
+
+def _compact(value: float) -> str:
+    for threshold, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            return f"{value / threshold:.2f}{suffix}"
+    return f"{value:,.0f}"
+
+
+def _pct_change(current: Optional[float], base: Optional[float]) -> Optional[float]:
+    if current is None or not base:
+        return None
+    return 100 * (current / base - 1)
+
+
+def _kpi_card(
+    ticker: str, metric: str, value: str, change: Optional[float], benchmark: str
+) -> Dict[str, Any]:
+    return {
+        "ticker": ticker,
+        "metric": metric,
+        "value": value,
+        "change": f"{change:+.1f}%" if change is not None else "n/a",
+        "changeDirection": "down" if change is not None and change < 0 else "up",
+        "comparisonBenchmark": benchmark,
+    }
+
+
+def _kpi_cards(row: Dict[str, Any], metrics: List[str], period: str) -> List[Dict[str, Any]]:
+    """Format one ``ticker_kpis`` row as kpi-card props."""
+    ticker = row["ticker"]
+    close = row["latest_close"]
+    cards = []
+    for metric in metrics:
+        if metric == "price":
+            cards.append(_kpi_card(ticker, "Price", f"${close:,.2f}", row["change_pct"], f"{period} change"))
+        elif metric == "52w_high":
+            high = row["high_52w"]
+            cards.append(_kpi_card(
+                ticker, "52W High", f"${high:,.2f}", _pct_change(close, high), "price vs 52W high"
+            ))
+        elif metric == "52w_low":
+            low = row["low_52w"]
+            cards.append(_kpi_card(
+                ticker, "52W Low", f"${low:,.2f}", _pct_change(close, low), "price vs 52W low"
+            ))
+        elif metric == "volume":
+            cards.append(_kpi_card(
+                ticker, "Volume", _compact(row["latest_volume"] or 0),
+                _pct_change(row["latest_volume"], row["avg_volume"]), f"vs {period} average",
+            ))
+        elif metric == "pe_ratio" and row["pe_ratio"] is not None:
+            cards.append(_kpi_card(
+                ticker, "P/E Ratio", f"{row['pe_ratio']:.1f}x",
+                _pct_change(row["pe_ratio"], row["prev_pe_ratio"]), "vs prior report",
+            ))
+        elif metric == "market_cap" and row["market_cap"] is not None:
+            cards.append(_kpi_card(
+                ticker, "Market Cap", f"${_compact(row['market_cap'])}",
+                _pct_change(row["market_cap"], row["prev_market_cap"]), "vs prior report",
+            ))
+    return cards
+
+
+@tool
+def get_kpis(
+    tickers: Union[List[str], str],
+    metrics: Optional[List[str]] = None,
+    period: str = "1m",
+) -> str:
+    """Return ready-to-render kpi-card props from the precomputed KPI snapshot.
+
+    One call replaces the queries for latest close, period change, 52-week
+    range, volume vs average and P/E.  Each returned object is one kpi-card's
+    props; refer to the i-th as "QUERY_RESULT_N[i]".
+
+    Args:
+        tickers: Tickers to report on, e.g. ["AAPL", "MSFT"] (or "AAPL,MSFT").
+        metrics: Any of price, 52w_high, 52w_low, volume, pe_ratio, market_cap.
+            Defaults to all but market_cap.
+        period: Change / average window: 1w, 1m, 3m, 6m, ytd or 1y.
+    """
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    period = period.strip().lower()
+    wanted = [m.strip().lower() for m in metrics] if metrics else list(DEFAULT_KPI_METRICS)
+    if not symbols:
+        return json.dumps({"error": "No tickers given."})
+    if period not in KPI_PERIODS:
+        return json.dumps({"error": f"Unknown period {period!r}; use one of {', '.join(KPI_PERIODS)}."})
+    unknown = [m for m in wanted if m not in KPI_METRICS]
+    if unknown:
+        return json.dumps({"error": f"Unknown metrics {unknown}; use any of {', '.join(KPI_METRICS)}."})
+    if "ticker_kpis" not in _derived_objects():
+        return json.dumps({"error": "KPI snapshot not available; compute KPIs with run_query."})
+
+    try:
+        sql = KPI_LOOKUP_SQL.format(placeholders=", ".join("?" for _ in symbols))
+        rows = {row["ticker"]: row for row in db_service.query(sql, [period, *symbols])}
+        cards = [card for t in symbols if t in rows for card in _kpi_cards(rows[t], wanted, period)]
+        missing = [t for t in symbols if t not in rows]
+        if missing and not cards:
+            return json.dumps({"error": f"No price data for {', '.join(missing)}."})
+        return json.dumps(cards, default=str)
+    except Exception as exc:
+        logger.exception("Tool get_kpis failed", extra={"tickers": symbols})
+        return json.dumps({"error": str(exc)})
+
+
+def _run_statement(statement: Statement, **args: Any) -> str:
+    try:
+        rows = statement.run(**args)
+    except ValueError as exc:
+        return json.dumps({"error": str(exc)})
+    except Exception as exc:
+        logger.exception("Tool %s failed", statement.name, extra={"args": args})
+        return json.dumps({"error": str(exc)})
+    return json.dumps(rows[:MAX_TOOL_ROWS], default=str)
+
+
+@tool
+def get_prices(
+    tickers: Union[List[str], str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    interval: str = "1d",
+) -> str:
+    """Return OHLCV bars for one or more tickers, oldest first.
+
+    Rows: { ticker, date, open, high, low, close, volume }, one per ticker and
+    interval.  Prefer this over writing price SQL with run_query.  For long
+    ranges use a wider interval (at most 200 rows are returned).
+
+    Args:
+        tickers: e.g. ["AAPL", "MSFT"] (or "AAPL,MSFT").
+        start: Optional first date, YYYY-MM-DD (inclusive).
+        end: Optional last date, YYYY-MM-DD (inclusive).
+        interval: Bar size: 1d, 1w, 1mo, 1q or 1y.
+    """
+    return _run_statement(PRICE_WINDOW, tickers=tickers, start=start, end=end, interval=interval)
+
+
+@tool
+def get_metrics(tickers: Union[List[str], str], periods: int = 1) -> str:
+    """Return the latest financial_metrics rows per ticker, newest first.
+
+    Args:
+        tickers: e.g. ["AAPL", "MSFT"] (or "AAPL,MSFT").
+        periods: Reports per ticker (1 = latest only, max 20).
+    """
+    return _run_statement(LATEST_METRICS, tickers=tickers, periods=periods)
+
+
+@tool
+def get_news(
+    tickers: Union[List[str], str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 20,
+) -> str:
+    """Return recent news rows { date, ticker, title, source, url, sentiment }, newest first.
+
+    Use search_news instead when looking for a topic.
+
+    Args:
+        tickers: e.g. ["TSLA"] (or "TSLA,AAPL").
+        start: Optional first date, YYYY-MM-DD (inclusive).
+        end: Optional last date, YYYY-MM-DD (inclusive).
+        limit: Maximum number of articles (max 200).
+    """
+    return _run_statement(NEWS_WINDOW, tickers=tickers, start=start, end=end, limit=limit)
+
+
+INTRADAY_LATEST_SQL = "SELECT max(ts) AS latest FROM intraday_bars_1d WHERE ticker = ANY({tickers})"
+
+
+def _intraday_range(
+    tickers: List[str], start: Optional[str], end: Optional[str]
+) -> Optional[Tuple[datetime, datetime]]:
+    """``[start, end)`` of an intraday request, or None when there are no bars.
+
+    A bare end date includes that day; missing bounds default to the latest
+    session in the data.
+    """
+    last = parse_timestamp(end) if end else None
+    if last is not None and len(str(end).strip()) <= 10:
+        last += timedelta(days=1)
+    if last is None:
+        rows = db_service.query(INTRADAY_LATEST_SQL.format(tickers=tickers_literal(tickers)))
+        if not rows or rows[0]["latest"] is None:
+            return None
+        last = parse_timestamp(rows[0]["latest"]) + timedelta(days=1)
+    first = parse_timestamp(start) if start else last - timedelta(days=1)
+    if first >= last:
+        raise ValueError("start must be before end")
+    return first, last
+
+
+@tool
+def get_intraday_bars(
+    tickers: Union[List[str], str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bar: str = "auto",
+) -> str:
+    """Return intraday OHLCV bars { ticker, date, open, high, low, close, volume }, oldest first.
+
+    The bar size follows the range so at most 200 rows come back: minute bars
+    within a session, 5-60 minute bars over days to weeks, daily or weekly
+    bars over months.  Without start/end the latest session in the data is returned.
+    Use get_prices for daily history.
+
+    Args:
+        tickers: e.g. ["AAPL"] (or "AAPL,MSFT").
+        start: Optional first time, YYYY-MM-DD or YYYY-MM-DDTHH:MM (exchange time, inclusive).
+        end: Optional end time (exclusive); a bare YYYY-MM-DD includes that whole day.
+        bar: "auto", or the finest bar wanted: 1m, 5m, 15m, 30m, 1h, 1d or 1w
+            (widened when the range would return too many rows).
+    """
+    try:
+        symbols = normalize_tickers(tickers)
+        window = _intraday_range(symbols, start, end)
+        if window is None:
+            return json.dumps({"error": "No intraday bars for these tickers; use get_prices for daily bars"})
+        first, last = window
+        chosen = choose_bar(first, last, len(symbols), MAX_TOOL_ROWS, bar)
+    except ValueError as exc:
+        return json.dumps({"error": str(exc)})
+    except duckdb.CatalogException:
+        return json.dumps({"error": "This snapshot has no intraday bars; use get_prices for daily bars"})
+    return _run_statement(
+        INTRADAY_WINDOWS[stored_bar(chosen)], tickers=symbols, start=first, end=last, bar=chosen
+    )
+
+
+# Tools whose JSON array output is collected for QUERY_RESULT_N placeholders
+DATA_TOOLS = {
+    "run_query", "search_news", "get_prices", "get_intraday_bars", "get_metrics", "get_news", "get_kpis",
+}
+
+
 @tool
 def get_schema() -> str:
     """Return the database schema — tables and their columns.
@@ -74,4 +563,7 @@ def get_schema() -> str:
 
 def get_all_tools() -> List:
     """Return the list of tools the agent can use."""
-    return [run_query, get_schema]
+    return [
+        run_query, open_table, get_prices, get_intraday_bars, get_metrics, get_news, search_news, get_kpis,
+        get_schema,
+    ]
@@ -0,0 +1,290 @@
+"""Memory of successful agent runs, reused for similar questions.
+
+Users ask the same kinds of questions with different tickers and windows,
+yet every run used to rediscover the right calls, often after a failed
+``run_query``.  A trace is a question, the data-tool calls that answered it
+and the spec built from their results, stored with tickers and numbers
+abstracted into slots: "Compare AAPL and MSFT over 90 days" is remembered as
+``compare {T0} and {T1} over {N0} days`` with ``{T0}`` in place of ``AAPL``
+in the calls and the spec as well.
+
+A new question is abstracted the same way and scored against every trace
+(Jaccard similarity of word unigrams and bigrams).  The nearest few above
+``TRACE_MIN_SCORE`` are shown to the agent as worked examples.  When the best
+one scores at least ``TRACE_REPLAY_SCORE`` and has the same slots, its calls
+are replayed with the new tickers and numbers and a single synthesis call
+writes the answer (see ``AgentService``).
+
+Traces live in a small SQLite file (``TRACE_DB_PATH``), one per abstracted
+question, capped at ``TRACE_MAX_ENTRIES`` by least-recent use.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from app.core.config import settings
+from app.services.mentions import TICKER_ALIASES, infer_tickers
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS traces (
+    template TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    calls TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    tickers INTEGER NOT NULL,
+    numbers INTEGER NOT NULL,
+    steps INTEGER NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    used_at REAL NOT NULL
+)
+"""
+
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_SLOT = re.compile(r"\{([TN])(\d+)\}")
+_WORD = re.compile(r"\{[TN]\d+\}|[A-Za-z0-9']+")
+
+
+@dataclass
+class Slots:
+    """The tickers and numbers of one question, in order of mention."""
+
+    tickers: List[str] = field(default_factory=list)
+    numbers: List[str] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, message: str, universe: List[str]) -> "Slots":
+        return cls(infer_tickers(message, universe), _NUMBER.findall(message))
+
+    def abstract(self, text: str) -> str:
+        """``text`` with its tickers and numbers replaced by slot markers."""
+        for index, ticker in enumerate(self.tickers):
+            names = [ticker] + [name for name, t in TICKER_ALIASES.items() if t == ticker]
+            for name in names:
+                text = re.sub(
+                    rf"(?<![A-Za-z0-9])\$?{re.escape(name)}(?![A-Za-z0-9])",
+                    f"{{T{index}}}",
+                    text,
+                    flags=re.IGNORECASE if name != ticker else 0,
+                )
+        for index, number in enumerate(self.numbers):
+            text = re.sub(rf"(?<![\w.]){re.escape(number)}(?![\w.])", f"{{N{index}}}", text)
+        return text
+
+    def template(self, message: str) -> str:
+        """The abstracted question, as lower-case words and slot markers."""
+        words = _WORD.findall(self.abstract(message))
+        return " ".join(w if _SLOT.fullmatch(w) else w.lower() for w in words)
+
+    def parametrize(self, value: Any) -> Any:
+        """Slot markers in place of this question's tickers and numbers, recursively."""
+        if isinstance(value, dict):
+            return {k: self.parametrize(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.parametrize(v) for v in value]
+        if isinstance(value, str):
+            return self.abstract(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            for index, number in enumerate(self.numbers):
+                if float(number) == value:
+                    return f"{{N{index}}}"
+        return value
+
+    def fill(self, value: Any) -> Any:
+        """Inverse of ``parametrize`` with this question's tickers and numbers."""
+        if isinstance(value, dict):
+            return {k: self.fill(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.fill(v) for v in value]
+        if not isinstance(value, str):
+            return value
+        whole = _SLOT.fullmatch(value)
+        if whole and whole.group(1) == "N":
+            number = self.numbers[int(whole.group(2))]
+            return float(number) if "." in number else int(number)
+        return _SLOT.sub(self._value, value)
+
+    def _value(self, match: "re.Match[str]") -> str:
+        values = self.tickers if match.group(1) == "T" else self.numbers
+        return values[int(match.group(2))]
+
+
+def _features(template: str) -> Set[str]:
+    words = [_SLOT.sub(lambda m: "{" + m.group(1) + "}", w) for w in template.split()]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def similarity(a: str, b: str) -> float:
+    fa, fb = _features(a), _features(b)
+    return len(fa & fb) / len(fa | fb) if fa and fb else 0.0
+
+
+@dataclass
+class TraceMatch:
+    score: float
+    template: str
+    question: str
+    calls: List[Dict[str, Any]]
+    spec: Dict[str, Any]
+    tickers: int
+    numbers: int
+    steps: int
+
+    def replayable(self, slots: Slots) -> bool:
+        return self.score >= settings.trace_replay_score and self.fits(slots)
+
+    def fits(self, slots: Slots) -> bool:
+        return self.tickers == len(slots.tickers) and self.numbers == len(slots.numbers)
+
+    def example(self, slots: Slots) -> Dict[str, Any]:
+        """Compact form for the agent prompt, filled with ``slots`` when they fit."""
+        return {
+            "question": self.question,
+            "calls": slots.fill(self.calls) if self.fits(slots) else self.calls,
+            "blocks": [b.get("type") for b in self.spec.get("blocks", []) if isinstance(b, dict)],
+        }
+
+
+class TraceStore:
+    """SQLite-backed traces (one short-lived connection per call, as in ``DashboardStore``)."""
+
+    def __init__(self, path: str = settings.trace_db_path, max_entries: int = settings.trace_max_entries) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                if not self._initialized:
+                    conn.execute(SCHEMA_SQL)
+                    self._initialized = True
+                yield conn
+        finally:
+            conn.close()
+
+    def record(
+        self,
+        message: str,
+        slots: Slots,
+        sources: List[Dict[str, Any]],
+        spec: Dict[str, Any],
+        steps: int,
+    ) -> None:
+        """Remember a successful run; an existing trace keeps whichever took fewer steps."""
+        template = slots.template(message)
+        calls = json.dumps(slots.parametrize(sources), default=str)
+        spec_json = json.dumps(slots.parametrize(spec), default=str)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT steps FROM traces WHERE template = ?", (template,)).fetchone()
+            if row is not None and row["steps"] <= steps:
+                conn.execute("UPDATE traces SET used_at = ? WHERE template = ?", (now, template))
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO traces "
+                "(template, question, calls, spec, tickers, numbers, steps, uses, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    template, message, calls, spec_json, len(slots.tickers), len(slots.numbers),
+                    steps, 0, now,
+                ),
+            )
+            conn.execute(
+                "DELETE FROM traces WHERE template IN "
+                "(SELECT template FROM traces ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def nearest(self, message: str, slots: Slots, k: int) -> List[TraceMatch]:
+        """The ``k`` most similar traces scoring at least ``TRACE_MIN_SCORE``."""
+        template = slots.template(message)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM traces").fetchall()
+        scored = sorted(
+            ((similarity(template, row["template"]), row) for row in rows),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        return [
+            TraceMatch(
+                score=score,
+                template=row["template"],
+                question=row["question"],
+                calls=json.loads(row["calls"]),
+                spec=json.loads(row["spec"]),
+                tickers=row["tickers"],
+                numbers=row["numbers"],
+                steps=row["steps"],
+            )
+            for score, row in scored[:k]
+            if score >= settings.trace_min_score
+        ]
+
+    def used(self, template: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE traces SET uses = uses + 1, used_at = ? WHERE template = ?", (time.time(), template)
+            )
+
+
+class TraceStats:
+    """Process-wide counters of how often traces helped, and by how many LLM turns."""
+
+    def __init__(self) -> None:
+        self.lookups = 0
+        self.hits = 0
+        self.replays = 0
+        self.replay_turns_saved = 0
+        self.steps_with = 0
+        self.steps_without = 0
+        self.runs_with = 0
+        self.runs_without = 0
+        self._lock = threading.Lock()
+
+    def finished(self, hit: bool, replayed: Optional[TraceMatch], steps: int) -> None:
+        with self._lock:
+            self.lookups += 1
+            if replayed is not None:
+                self.replays += 1
+                self.replay_turns_saved += max(replayed.steps - steps, 0)
+            if hit:
+                self.hits += 1
+                if replayed is None:
+                    self.runs_with += 1
+                    self.steps_with += steps
+            else:
+                self.runs_without += 1
+                self.steps_without += steps
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg_with = self.steps_with / self.runs_with if self.runs_with else None
+            avg_without = self.steps_without / self.runs_without if self.runs_without else None
+            # Prompted runs are compared with runs that found no trace
+            saved = self.replay_turns_saved
+            if avg_with is not None and avg_without is not None:
+                saved += max(avg_without - avg_with, 0) * self.runs_with
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hitRate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "replays": self.replays,
+                "avgStepsWithExamples": avg_with,
+                "avgStepsWithout": avg_without,
+                "turnsSaved": round(saved, 1),
+            }
+
+
+trace_store = TraceStore()
+trace_stats = TraceStats()
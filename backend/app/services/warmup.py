@@ -0,0 +1,105 @@
+"""Startup warm-up for API workers.
+
+Run from the FastAPI lifespan in a background thread: opens the current
+warehouse snapshot, runs a few cheap queries so the catalog and Parquet
+metadata are loaded, imports the agent tools and pre-builds the LangGraph
+agent.  ``GET /ready`` reports 503 until this has finished, while
+``GET /health`` stays a plain liveness check.  A failed warm-up (snapshot
+not yet readable, LLM misconfigured) is retried with capped exponential
+backoff, so a worker becomes ready as soon as its dependencies are.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from app.services.db import db_service
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RETRY_BASE_S = 1.0
+WARMUP_RETRY_MAX_S = 60.0
+
+WARMUP_QUERIES = {
+    "stock_prices": "SELECT ticker, max(date) AS latest FROM stock_prices GROUP BY ticker",
+    "financial_metrics": "SELECT * FROM financial_metrics LIMIT 1",
+    "news": "SELECT * FROM news LIMIT 1",
+}
+
+
+@dataclass
+class WarmupState:
+    status: str = "pending"  # pending | warming | ready | failed | skipped
+    steps_ms: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+    data_version: Optional[str] = None
+    attempts: int = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.status in {"ready", "skipped"}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "stepsMs": dict(self.steps_ms),
+            "dataVersion": self.data_version,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _timed(name: str, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        warmup_state.steps_ms[name] = int((time.perf_counter() - start) * 1000)
+
+
+def run_warmup() -> bool:
+    """One blocking warm-up attempt; failures of individual warm-up queries are not fatal."""
+    from app.services import agent, tools
+
+    warmup_state.status = "warming"
+    warmup_state.error = None
+    warmup_state.attempts += 1
+    try:
+        warmup_state.data_version = _timed("db_open", lambda: db_service.version)
+        for table, sql in WARMUP_QUERIES.items():
+            try:
+                _timed(f"query_{table}", lambda sql=sql: db_service.query(sql))
+            except Exception:
+                logger.warning("Warm-up query on %s failed", table)
+        _timed("derived_objects", tools._derived_objects)
+        _timed("agent_graph", agent._get_graph)
+        _timed("router_model", agent._get_router_llm)
+    except Exception as exc:
+        logger.exception("Warm-up failed")
+        warmup_state.status = "failed"
+        warmup_state.error = str(exc)
+        return False
+    warmup_state.status = "ready"
+    logger.info("Warm-up finished: %s", warmup_state.steps_ms)
+    return True
+
+
+async def warmup_until_ready() -> None:
+    """Run warm-up attempts off the event loop until one succeeds."""
+    delay = WARMUP_RETRY_BASE_S
+    while not await asyncio.to_thread(run_warmup):
+        logger.warning("Warm-up attempt %d failed; retrying in %.1fs", warmup_state.attempts, delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+
+
+def start_warmup() -> "asyncio.Task[None]":
+    """Schedule the warm-up so /health answers immediately; cancel the task on shutdown."""
+    return asyncio.create_task(warmup_until_ready(), name="warmup")
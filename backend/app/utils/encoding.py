@@ -0,0 +1,68 @@
+"""Wire encoding for JSON responses and SSE events.
+
+``dumps`` returns UTF-8 bytes ready to write to the socket.  It uses orjson
+when it is installed (it ships with langsmith) and falls back to the stdlib
+encoder; ``JSON_ENCODER=json`` forces the fallback.  Both paths stringify
+unknown objects like ``json.dumps(..., default=str)`` did.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable, Optional
+
+from fastapi.responses import Response
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, default=str, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _load_encoder() -> Callable[[Any], bytes]:
+    if settings.json_encoder == "json":
+        return _stdlib_dumps
+    try:
+        import orjson
+    except ImportError:
+        if settings.json_encoder == "orjson":
+            logger.warning("JSON_ENCODER=orjson but orjson is not installed; using json")
+        return _stdlib_dumps
+
+    options = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=str, option=options)
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return _stdlib_dumps(obj)
+
+    return _orjson_dumps
+
+
+dumps = _load_encoder()
+
+
+def sse_event(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    """Encode one Server-Sent Event frame (with an ``id:`` line when given)."""
+    id_line = b"\nid: " + event_id.encode("utf-8") if event_id else b""
+    return b"event: " + event.encode("utf-8") + id_line + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+def ndjson_line(data: Any) -> bytes:
+    """Encode one newline-delimited JSON record."""
+    return dumps(data) + b"\n"
+
+
+class FastJSONResponse(Response):
+    """JSONResponse that encodes with ``dumps`` and skips re-validation."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
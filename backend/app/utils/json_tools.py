@@ -4,7 +4,8 @@ import json
 import re
 from typing import Any, Dict, List
 
-PLACEHOLDER_RE = re.compile(r"^QUERY_RESULT_(\d+)$")
+# QUERY_RESULT_N is the N-th tool result; QUERY_RESULT_N[i] one element of it
+PLACEHOLDER_RE = re.compile(r"^QUERY_RESULT_(\d+)(?:\[(\d+)\])?$")
 
 
 import logging
@@ -76,8 +77,9 @@ def normalize_dashboard_spec(spec: Any) -> Dict[str, Any]:
         block_type = block.get("type")
         if not block_type:
             continue
-        if "props" in block and isinstance(block.get("props"), dict):
-            normalized_blocks.append({"type": block_type, "props": block["props"]})
+        props = block.get("props")
+        if isinstance(props, dict) or (isinstance(props, str) and PLACEHOLDER_RE.match(props)):
+            normalized_blocks.append({"type": block_type, "props": props})
             continue
         props = {k: v for k, v in block.items() if k != "type"}
         normalized_blocks.append({"type": block_type, "props": props})
@@ -97,7 +99,11 @@ def replace_query_placeholders(value: Any, query_results: List[Any]) -> Any:
         match = PLACEHOLDER_RE.match(value)
         if match:
             idx = int(match.group(1))
-            return query_results[idx] if idx < len(query_results) else []
+            rows = query_results[idx] if idx < len(query_results) else []
+            if match.group(2) is None:
+                return rows
+            item = int(match.group(2))
+            return rows[item] if item < len(rows) else {}
         return value
 
     if isinstance(value, list):
@@ -3,7 +3,10 @@ from __future__ import annotations
 import re
 from typing import Iterable, List
 
-ALLOWED_TABLES = {"stock_prices", "financial_metrics", "news"}
+ALLOWED_TABLES = {
+    "stock_prices", "financial_metrics", "news", "event_impacts", "ticker_kpis",
+    "intraday_bars_1m", "intraday_bars_5m", "intraday_bars_30m", "intraday_bars_1d",
+}
 
 DISALLOWED_KEYWORDS = re.compile(
     r"\b(insert|update|delete|drop|alter|create|copy|export|import|attach|detach|pragma|set)\b",
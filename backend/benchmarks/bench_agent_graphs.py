@@ -0,0 +1,170 @@
+"""Agent graph comparison: ReAct vs. plan-then-execute (``AGENT_GRAPH``).
+
+Runs the same multi-ticker questions through both graphs and reports model
+turns, tokens and latency.  By default the model is scripted (fixed latency
+per call, tokens estimated at four characters each) over a synthetic DuckDB
+file, so the numbers isolate the graph topology; ``--live`` uses Gemini and
+the configured warehouse instead.
+
+    uv run python benchmarks/bench_agent_graphs.py --runs 20 --tickers 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LIVE_QUESTIONS = [
+    "Compare AAPL, MSFT and NVDA closing prices over the last quarter",
+    "Show GOOGL and AMZN revenue with their latest news",
+    "How did TSLA, META and NFLX trade this year?",
+]
+
+
+def build_db(root: str, n_tickers: int, days: int) -> str:
+    import duckdb
+
+    path = os.path.join(root, "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute(f"""
+        CREATE TABLE stock_prices AS
+        SELECT printf('T%03d', t) AS ticker,
+               (DATE '2025-01-01' - INTERVAL (d) DAY)::TIMESTAMP AS date,
+               random() AS open, random() AS high, random() AS low, random() AS close,
+               (random() * 1e6)::BIGINT AS volume
+        FROM range({n_tickers}) a(t), range({days}) b(d)
+    """)
+    conn.close()
+    return path
+
+
+def scripted_model(latency_s: float):
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    def price_sql(ticker: str) -> str:
+        return f"SELECT date, close FROM stock_prices WHERE ticker = '{ticker}' ORDER BY date"
+
+    def final(count: int) -> str:
+        blocks = [{"type": "line-chart", "props": {"data": f"QUERY_RESULT_{i}"}} for i in range(count)]
+        return json.dumps({"intent": "prices", "assistantMessage": "Here they are.", "dashboardSpec": {"blocks": blocks}})
+
+    class ScriptedModel(BaseChatModel):
+        """Plans, calls tools one turn at a time, or answers, like Gemini would."""
+
+        @property
+        def _llm_type(self) -> str:
+            return "scripted"
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        def _reply(self, messages) -> AIMessage:
+            tickers = [w.strip("?,.") for w in messages[1].content.split() if w.startswith("T0")]
+            last = messages[-1].content
+            done = sum(isinstance(m, ToolMessage) for m in messages)
+            if last.startswith("PLANNING STEP"):
+                calls = [{"tool": "run_query", "args": {"sql": price_sql(t)}} for t in tickers]
+                reply = AIMessage(content=json.dumps({"calls": calls}))
+            elif last.startswith("The planned calls have run") or done >= len(tickers):
+                reply = AIMessage(content=final(len(tickers)))
+            else:
+                call = {"name": "run_query", "args": {"sql": price_sql(tickers[done])}, "id": f"call-{done}"}
+                reply = AIMessage(content="", tool_calls=[call])
+            prompt = sum(len(str(m.content)) for m in messages) // 4
+            output = len(reply.content) // 4 + 25 * len(reply.tool_calls)
+            reply.usage_metadata = {"input_tokens": prompt, "output_tokens": output, "total_tokens": prompt + output}
+            return reply
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(latency_s)
+            return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(latency_s)
+            return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    return ScriptedModel()
+
+
+def percentile(values: List[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def run_graph(agent, graph: Any, questions: List[str]) -> List[dict]:
+    agent._get_graph = lambda: graph
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        result = await agent.agent_service.process_query(question)
+        budget = result.get("budget", {})
+        samples.append({
+            "ms": (time.perf_counter() - start) * 1000,
+            "turns": budget.get("steps", 0),
+            "tokens": budget.get("inputTokens", 0) + budget.get("outputTokens", 0),
+        })
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--tickers", type=int, default=3, help="tickers per question (scripted model)")
+    parser.add_argument("--latency-ms", type=float, default=400, help="per model call (scripted model)")
+    parser.add_argument("--live", action="store_true", help="use Gemini and the configured warehouse")
+    args = parser.parse_args()
+
+    if not args.live:
+        root = tempfile.mkdtemp()
+        os.environ["FINANCE_DB_PATH"] = build_db(root, n_tickers=100, days=365)
+        os.environ["FINANCE_SNAPSHOT_DIR"] = os.path.join(root, "snapshots")
+        os.environ.setdefault("GOOGLE_API_KEY", "unused")
+    os.environ["PREFETCH_ENABLED"] = "false"
+
+    from langgraph.prebuilt import create_react_agent
+
+    from app.services import agent
+    from app.services.db import db_service
+    from app.services.planner import build_plan_graph
+    from app.services.tools import get_all_tools
+
+    tools = get_all_tools()
+    if args.live:
+        llm = agent._get_llm()
+        questions = [LIVE_QUESTIONS[i % len(LIVE_QUESTIONS)] for i in range(args.runs)]
+    else:
+        llm = scripted_model(args.latency_ms / 1000)
+        # Distinct tickers per question so the SQL cache does not serve repeats
+        questions = [
+            "Compare " + ", ".join(f"T{(i * args.tickers + k) % 100:03d}" for k in range(args.tickers))
+            for i in range(args.runs)
+        ]
+    react = create_react_agent(llm, tools).with_config({"recursion_limit": 50})
+    graphs = {"react": react, "plan": build_plan_graph(llm, tools, react)}
+
+    print(f"model: {'gemini (live)' if args.live else f'scripted, {args.latency_ms:.0f} ms/call'}, runs: {args.runs}")
+    print(f"{'graph':>6} {'turns':>6} {'tokens':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, graph in graphs.items():
+        # Each graph starts from a cold SQL cache
+        db_service.cache.invalidate()
+        samples = asyncio.run(run_graph(agent, graph, questions))
+        latencies = [s["ms"] for s in samples]
+        print(
+            f"{name:>6} {statistics.mean(s['turns'] for s in samples):>6.1f} "
+            f"{statistics.mean(s['tokens'] for s in samples):>8.0f} "
+            f"{percentile(latencies, 50):>8.0f} {percentile(latencies, 95):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Intraday bars: chart queries over growing ranges, rollups vs. raw minutes.
+
+Builds a synthetic minute-bar snapshot (390 bars per weekday session per
+ticker, prices in cents) through the sync job's ``build_intraday_bars``, then
+times the bar size ``get_intraday_bars`` picks for each range, read from its
+rollup, against the same bars resampled from raw minutes, with a cold SQL
+cache for every run.
+
+    uv run python benchmarks/bench_intraday.py --tickers 200 --days 260
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYNC_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "sync_data.py")
+FIRST_SESSION = date(2024, 1, 1)  # a Monday
+RANGES = {"1 session": 1, "1 week": 5, "1 month": 21, "3 months": 63, "1 year": 252}
+
+SYNTHETIC_SQL = """
+INSERT INTO intraday_bars_1m
+SELECT printf('T%03d', t),
+       (DATE '{first}' + ((d // 5) * 7 + d % 5)::INTEGER)::TIMESTAMP + INTERVAL 570 MINUTE + to_minutes(m),
+       p, p + 0.05, p - 0.05, p + 0.01, (100 + hash(t, d, m) % 1000)::BIGINT
+FROM (
+    SELECT t, d, m, round(100 + t + 5 * sin((d * 390 + m) / 700.0 + t), 2) AS p
+    FROM range({tickers}) a(t), range({days}) b(d), range(390) c(m)
+)
+"""
+
+
+def session_date(index: int) -> date:
+    return FIRST_SESSION + timedelta(days=(index // 5) * 7 + index % 5)
+
+
+def build_snapshot(root: str, tickers: int, days: int) -> str:
+    import duckdb
+
+    spec = importlib.util.spec_from_file_location("sync_data", SYNC_SCRIPT)
+    sync = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sync)
+
+    name = "finance-bench.db"
+    path = os.path.join(root, name)
+    started = time.perf_counter()
+    conn = duckdb.connect(path)
+    sync.setup_db(conn)
+    conn.execute(SYNTHETIC_SQL.format(first=FIRST_SESSION.isoformat(), tickers=tickers, days=days))
+    sync.build_intraday_bars(conn)
+    conn.execute("CHECKPOINT")
+    rows = conn.execute("SELECT count(*) FROM intraday_bars_1m").fetchone()[0]
+    conn.close()
+    size = os.path.getsize(path)
+    print(
+        f"built {rows:,} minute bars in {time.perf_counter() - started:.1f} s: "
+        f"{size / 2**20:.0f} MiB with rollups, {size / rows:.1f} bytes per minute bar"
+    )
+    sync.publish_snapshot(root, name)
+    return path
+
+
+def p50(run: Callable[[], object], runs: int, reset: Callable[[], None]) -> float:
+    samples: List[float] = []
+    for _ in range(runs):
+        reset()
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=200, help="tickers in the synthetic snapshot")
+    parser.add_argument("--days", type=int, default=260, help="weekday sessions per ticker")
+    parser.add_argument("--query-tickers", type=int, default=1, help="tickers per chart query")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    os.environ["FINANCE_DB_PATH"] = os.path.join(root, "unused.db")
+    os.environ["FINANCE_SNAPSHOT_DIR"] = root
+    os.environ["SLOW_QUERY_MS"] = "0"
+    build_snapshot(root, args.tickers, args.days)
+
+    from app.services.db import db_service
+    from app.services.statements import INTRADAY_WINDOWS, choose_bar, stored_bar
+    from app.services.tools import MAX_TOOL_ROWS
+
+    tickers = [f"T{t:03d}" for t in range(min(args.query_tickers, args.tickers))]
+    last = session_date(args.days - 1)
+    print(f"{'range':>10} {'bar':>4} {'table':>16} {'rows':>5} {'rollup ms':>10} {'raw ms':>8} {'speedup':>8}")
+    for label, sessions in RANGES.items():
+        if sessions > args.days:
+            continue
+        first = session_date(args.days - sessions)
+        start = datetime.combine(first, datetime.min.time())
+        end = datetime.combine(last + timedelta(days=1), datetime.min.time())
+        bar = choose_bar(start, end, len(tickers), MAX_TOOL_ROWS)
+        timings = {}
+        for table in (stored_bar(bar), "1m"):
+            statement = INTRADAY_WINDOWS[table]
+            rows = len(statement.run(tickers=tickers, start=start, end=end, bar=bar))
+            timings[table] = p50(
+                lambda: statement.run(tickers=tickers, start=start, end=end, bar=bar),
+                args.runs,
+                db_service.cache.invalidate,
+            )
+        rollup_ms, raw_ms = timings[stored_bar(bar)], timings["1m"]
+        print(
+            f"{label:>10} {bar:>4} {'intraday_bars_' + stored_bar(bar):>16} {rows:>5} "
+            f"{rollup_ms:>10.1f} {raw_ms:>8.1f} {raw_ms / rollup_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Final-result encoding cost for large dashboards.
+
+Compares the previous path (``DashboardSpec.model_validate().model_dump()``
+followed by ``json.dumps(default=str)``) with structural validation plus
+``app.utils.encoding.dumps``.
+
+    uv run python benchmarks/bench_serialization.py --points 10000 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.api import DashboardSpec, validate_dashboard_structure  # noqa: E402
+from app.utils.encoding import dumps  # noqa: E402
+
+
+def make_spec(points: int) -> dict:
+    rows = [
+        {
+            "date": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.000",
+            "open": 100.0 + i * 0.01, "high": 101.0 + i * 0.01,
+            "low": 99.0 + i * 0.01, "close": 100.5 + i * 0.01, "volume": 1000 + i,
+        }
+        for i in range(points)
+    ]
+    return {
+        "blocks": [
+            {"type": "executive-summary", "props": {"content": "Summary"}},
+            {"type": "line-chart", "props": {"title": "AAPL", "data": rows, "xKey": "date", "yKeys": ["close"]}},
+            {"type": "candlestick-chart", "props": {"ticker": "AAPL", "data": rows}},
+        ],
+        "chaos": {"rotation": 0, "fontFamily": "Inter", "animation": None, "theme": "professional"},
+    }
+
+
+def previous_path(spec: dict) -> bytes:
+    final = {"dashboardSpec": DashboardSpec.model_validate(spec).model_dump(), "intent": "x"}
+    return f"event: result\ndata: {json.dumps(final, default=str)}\n\n".encode("utf-8")
+
+
+def current_path(spec: dict) -> bytes:
+    final = {"dashboardSpec": validate_dashboard_structure(spec), "intent": "x"}
+    return b"event: result\ndata: " + dumps(final) + b"\n\n"
+
+
+def measure(fn, spec: dict, repeats: int) -> float:
+    fn(spec)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(spec)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", nargs="+", type=int, default=[10000, 50000])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"encoder: {dumps.__name__}")
+    print(f"{'points':>8} {'bytes':>11} {'previous ms':>12} {'current ms':>11}")
+    for points in args.points:
+        spec = make_spec(points)
+        size = len(current_path(spec))
+        before = measure(previous_path, spec, args.repeats)
+        after = measure(current_path, spec, args.repeats)
+        print(f"{points:>8} {size:>11,} {before:>12.1f} {after:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
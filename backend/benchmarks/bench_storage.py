@@ -0,0 +1,82 @@
+"""Single-ticker chart query latency: one DuckDB file vs. partitioned Parquet.
+
+Builds synthetic daily bars for a growing number of tickers and times the
+typical ``line-chart`` query for one ticker over the last 90 days.
+
+    uv run python benchmarks/bench_storage.py --tickers 3 300 3000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.db import DuckDBService, POINTER_FILE  # noqa: E402
+
+CHART_SQL = """
+    SELECT date, close FROM stock_prices
+    WHERE ticker = 'T00001' AND date >= TIMESTAMP '2024-12-31' - INTERVAL 90 DAY
+    ORDER BY date
+"""
+
+
+def build(root: str, n_tickers: int, days: int) -> None:
+    conn = duckdb.connect(os.path.join(root, "finance-file.db"))
+    conn.execute(f"""
+        CREATE TABLE stock_prices AS
+        SELECT printf('T%05d', t) AS ticker,
+               (DATE '2025-01-01' - INTERVAL (d) DAY)::TIMESTAMP AS date,
+               random() AS open, random() AS high, random() AS low, random() AS close,
+               (random() * 1e6)::BIGINT AS volume
+        FROM range({n_tickers}) a(t), range({days}) b(d)
+    """)
+    os.makedirs(os.path.join(root, "finance-parquet"))
+    conn.execute(f"""
+        COPY (SELECT *, year(date) AS year FROM stock_prices ORDER BY ticker, date)
+        TO '{os.path.join(root, "finance-parquet", "stock_prices")}'
+        (FORMAT parquet, PARTITION_BY (year), COMPRESSION zstd, ROW_GROUP_SIZE 8192)
+    """)
+    conn.close()
+
+
+def time_query(root: str, snapshot: str, repeats: int) -> float:
+    with open(os.path.join(root, POINTER_FILE), "w") as fh:
+        fh.write(snapshot)
+    service = DuckDBService(db_path="unused.db", snapshot_dir=root, poll_interval_s=3600)
+    service.cache.max_entries = 0
+    service.query(CHART_SQL)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        service.query(CHART_SQL)
+        samples.append((time.perf_counter() - start) * 1000)
+    service.close()
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", nargs="+", type=int, default=[3, 300, 3000])
+    parser.add_argument("--days", type=int, default=750)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'rows':>12} {'duckdb ms':>10} {'parquet ms':>11}")
+    for n in args.tickers:
+        with tempfile.TemporaryDirectory() as root:
+            build(root, n, args.days)
+            file_ms = time_query(root, "finance-file.db", args.repeats)
+            parquet_ms = time_query(root, "finance-parquet", args.repeats)
+        print(f"{n:>8} {n * args.days:>12,} {file_ms:>10.2f} {parquet_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Rank the hottest query shapes in the slow-query log and suggest precomputation.
+
+Reads the rotating log written by ``app.services.slow_log`` (the current file
+and its ``.1``, ``.2``, ... backups).  Shapes are ranked by their total time
+across workers; the slowest captured profile of each is then turned into
+suggestions for the snapshot build in ``scripts/sync_data.py``:
+
+- a scan of a warehouse table that keeps few of the rows it reads: an index
+  on the filtered columns, or a (ticker, date) sort order so zone maps skip
+- a GROUP BY over date_trunc / time_bucket / strftime buckets: a rollup
+  table at that grain
+- LAG/LEAD windows: precomputed returns
+- joins between warehouse tables: a materialized join
+- spills to disk: more memory or a smaller input
+
+    uv run python scripts/slow_query_report.py --top 10
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DB_PATH = os.environ.get("FINANCE_DB_PATH", os.path.join(BASE_DIR, "data", "finance.db"))
+# Must match app.core.config.Settings.slow_query_log_path
+LOG_PATH = os.environ.get("SLOW_QUERY_LOG_PATH", os.path.join(os.path.dirname(DB_PATH), "slow_queries.jsonl"))
+
+# Warehouse tables and their date column, as built by sync_data.py
+WAREHOUSE_DATES = {"stock_prices": "date", "financial_metrics": "report_period", "news": "date"}
+# A scan keeping fewer than 1 in SELECTIVE_RATIO of MIN_SCANNED or more rows is worth skipping
+MIN_SCANNED = 100_000
+SELECTIVE_RATIO = 20
+# Below this many kept rows an index lookup beats a sorted scan
+POINT_LOOKUP_ROWS = 1000
+
+_TRUNC = re.compile(r"date_trunc\s*\(\s*'(\w+)'", re.IGNORECASE)
+_BUCKET = re.compile(r"time_bucket\s*\(\s*(?:interval\s*)?'([^']+)'", re.IGNORECASE)
+_MONTH = re.compile(r"strftime\s*\([^)]*'%Y-%m'\s*\)", re.IGNORECASE)
+_OFFSET = re.compile(r"\b(lag|lead)\s*\(", re.IGNORECASE)
+
+
+def log_files(path):
+    """The log and its rotated backups, oldest first."""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_entries(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def aggregate(entries):
+    """One report per shape, hottest (largest total time) first."""
+    # Counters are cumulative per worker: keep each worker's latest, then add workers up
+    counters = {}
+    samples = defaultdict(list)
+
+    def keep(worker, shape, calls, total_ms):
+        previous = counters.get((worker, shape))
+        if previous is None or calls >= previous[0]:
+            counters[(worker, shape)] = (calls, total_ms)
+
+    for entry in entries:
+        if entry.get("kind") == "slow":
+            keep(entry.get("worker"), entry["shape"], entry["calls"], entry["totalMs"])
+            samples[entry["shape"]].append(entry)
+        elif entry.get("kind") == "shapes":
+            for item in entry.get("shapes", []):
+                keep(entry.get("worker"), item["shape"], item["calls"], item["totalMs"])
+
+    reports = {}
+    for (_, shape), (calls, total_ms) in counters.items():
+        report = reports.setdefault(shape, {"shape": shape, "calls": 0, "totalMs": 0.0})
+        report["calls"] += calls
+        report["totalMs"] += total_ms
+    for shape, report in reports.items():
+        slow = samples.get(shape, [])
+        profiled = [s for s in slow if s.get("profile")]
+        slowest = max(profiled or slow, key=lambda s: s["ms"], default=None)
+        report.update({
+            "slow": len(slow),
+            "timeouts": sum(1 for s in slow if s.get("timedOut")),
+            "maxMs": max((s["ms"] for s in slow), default=None),
+            "sql": slowest["sql"] if slowest else None,
+            "profile": slowest.get("profile") if slowest else None,
+        })
+        report["suggestions"] = suggest(report)
+    return sorted(reports.values(), key=lambda r: r["totalMs"], reverse=True)
+
+
+def _tables(sql):
+    return [t for t in WAREHOUSE_DATES if re.search(rf"\b{t}\b", sql, re.IGNORECASE)]
+
+
+def _scan_table(operator, sql):
+    table = (operator.get("table") or "").rsplit(".", 1)[-1]
+    if table in WAREHOUSE_DATES:
+        return table
+    # Parquet snapshots scan read_parquet() behind a view; fall back to the statement
+    tables = _tables(sql)
+    return tables[0] if len(tables) == 1 else None
+
+
+def _grain(sql):
+    match = _TRUNC.search(sql) or _BUCKET.search(sql)
+    if match:
+        return match.group(1).lower()
+    return "month" if _MONTH.search(sql) else None
+
+
+def _scan_suggestions(operator, sql):
+    scanned, kept = operator.get("rowsScanned") or 0, operator.get("rows") or 0
+    table = _scan_table(operator, sql)
+    if table is None or scanned < MIN_SCANNED or kept * SELECTIVE_RATIO > scanned:
+        return []
+    date_col = WAREHOUSE_DATES[table]
+    filters = operator.get("filters", "")
+    columns = [c for c in ("ticker", date_col) if re.search(rf"\b{c}\b", filters)]
+    if not columns:
+        return []
+    if kept <= POINT_LOOKUP_ROWS:
+        return [
+            f"index: {table} keeps {kept:,} of {scanned:,} scanned rows; add "
+            f"`CREATE INDEX {table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})` "
+            "to build_snapshot()"
+        ]
+    return [
+        f"sort order: {table} keeps {kept:,} of {scanned:,} scanned rows; write it "
+        f"`ORDER BY ticker, {date_col}` in build_snapshot() (as export_parquet does) so "
+        "zone maps skip the other row groups"
+    ]
+
+
+def _rollup_suggestion(table, grain):
+    slug = re.sub(r"\W+", "_", grain).strip("_")
+    if table == "stock_prices":
+        bucket = f"date_trunc('{grain}', date)" if " " not in grain else f"time_bucket(INTERVAL '{grain}', date)"
+        return (
+            f"rollup: `CREATE TABLE stock_prices_{slug} AS SELECT ticker, {bucket} AS date, "
+            "arg_min(open, date) AS open, max(high) AS high, min(low) AS low, "
+            "arg_max(close, date) AS close, sum(volume) AS volume FROM stock_prices "
+            "GROUP BY ALL ORDER BY ticker, date` in build_snapshot(), and point the prompt at it"
+        )
+    return f"rollup: pre-aggregate {table} per ticker and {grain} in build_snapshot()"
+
+
+def suggest(report):
+    """Plain-text suggestions for one shape's slowest sample."""
+    sql, profile = report.get("sql") or report["shape"], report.get("profile")
+    if profile is None:
+        if report.get("timeouts"):
+            return [
+                f"timed out {report['timeouts']} time(s) without a profile; run it under "
+                "EXPLAIN ANALYZE against the current snapshot"
+            ]
+        return []
+    operators = profile.get("operators", [])
+    names = [op.get("name") or "" for op in operators]
+    tables = _tables(sql)
+    suggestions = []
+    for operator in operators:
+        if "SCAN" in operator.get("name", "") or "PARQUET" in operator.get("name", ""):
+            suggestions.extend(_scan_suggestions(operator, sql))
+    grain = _grain(sql)
+    if grain and any("GROUP_BY" in name for name in names):
+        suggestions.extend(_rollup_suggestion(table, grain) for table in tables)
+    if any("WINDOW" in name for name in names) and _OFFSET.search(sql) and "stock_prices" in tables:
+        suggestions.append(
+            "returns: add `close / lag(close) OVER (PARTITION BY ticker ORDER BY date) - 1 "
+            "AS daily_return` to a derived price table in build_snapshot()"
+        )
+    if any("JOIN" in name for name in names) and len(tables) > 1:
+        suggestions.append(
+            f"materialize: join {' and '.join(tables)} on ticker once per snapshot in "
+            "build_snapshot(), as build_ticker_kpis() does for the latest metrics"
+        )
+    if profile.get("spilledBytes"):
+        suggestions.append(
+            f"memory: spilled {profile['spilledBytes'] / 2**20:.0f} MiB to disk; raise "
+            "DUCKDB_MEMORY_LIMIT or pre-aggregate its input"
+        )
+    return suggestions
+
+
+def hottest_operator(profile):
+    operators = (profile or {}).get("operators", [])
+    return max(operators, key=lambda op: op.get("ms") or 0, default=None)
+
+
+def print_report(reports):
+    if not reports:
+        print("No queries logged yet.")
+        return
+    for rank, report in enumerate(reports, 1):
+        slow = f"slow {report['slow']}"
+        if report["slow"]:
+            slow += f" (max {report['maxMs']:.0f} ms, {report['timeouts']} timed out)"
+        print(f"#{rank}  total {report['totalMs'] / 1000:.1f} s  calls {report['calls']}  {slow}")
+        shape = report["shape"]
+        print(f"    {shape if len(shape) <= 200 else shape[:197] + '...'}")
+        operator = hottest_operator(report["profile"])
+        if operator is not None:
+            print(f"    hottest operator: {operator['name']} {operator['ms']:.0f} ms, {operator.get('rows') or 0:,} rows")
+        for suggestion in report["suggestions"]:
+            print(f"    - {suggestion}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank slow-query log shapes and suggest rollups, sort orders and indexes.")
+    parser.add_argument("--log", default=LOG_PATH, help="Slow-query log written by the API (backups are read too)")
+    parser.add_argument("--top", type=int, default=10, help="Number of shapes to report")
+    parser.add_argument("--json", action="store_true", help="Print the ranked shapes as JSON")
+    args = parser.parse_args()
+
+    reports = aggregate(read_entries(log_files(args.log)))[: args.top]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_report(reports)
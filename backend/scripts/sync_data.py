@@ -1,26 +1,56 @@
 import json
 import os
+import shutil
 import requests
 import duckdb
-from datetime import datetime
+from datetime import datetime, timezone
 
 import argparse
 
 # Root finance.db path relative to this script (backend/scripts/sync_data.py)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DB_PATH = os.path.join(BASE_DIR, "data", "finance.db")
+# Snapshots live next to the legacy DB file, matching app.core.config defaults
+SNAPSHOT_DIR = os.environ.get(
+    "FINANCE_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.environ.get("FINANCE_DB_PATH", DB_PATH)), "snapshots"),
+)
+# Must match app.services.db.POINTER_FILE / DERIVED_DB
+POINTER_FILE = "CURRENT"
+DERIVED_DB = "derived.db"
 
 # Default fixtures from ai-hedge-fund
 DEFAULT_TICKERS = ["AAPL", "MSFT", "TSLA"]
 DEFAULT_DATE_SUFFIX = "_2024-03-01_2025-03-08"
 BASE_URL = "https://raw.githubusercontent.com/virattt/ai-hedge-fund/main/tests/fixtures/api"
 
-def setup_db():
-    conn = duckdb.connect(DB_PATH)
-    
-    # Create tables
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS stock_prices (
+# Parquet layout: <table>/year=<Y>/*.parquet, rows sorted by (ticker, <date column>).
+# Tickers are pruned through row-group statistics rather than ticker=<T>/ directories:
+# DuckDB expands and filters the full hive file list on every query, which made
+# single-ticker reads grow ~100x going from 3 to 3000 tickers.
+PARQUET_ROW_GROUP_SIZE = 8192
+PARQUET_PARTITIONS = {
+    "stock_prices": "date",
+    "financial_metrics": "report_period",
+    "news": "date",
+}
+
+# Intraday bar family: raw minutes plus rollups, each built from the one before it.
+# Must match app.services.db.INTRADAY_STORED_BARS
+INTRADAY_ROLLUPS = [
+    # (bar, built from, bucket expression over ts)
+    ("5m", "1m", "time_bucket(INTERVAL '5 minutes', ts, TIMESTAMP '2000-01-03 09:30:00')"),
+    ("30m", "5m", "time_bucket(INTERVAL '30 minutes', ts, TIMESTAMP '2000-01-03 09:30:00')"),
+    ("1d", "30m", "date_trunc('day', ts)"),
+]
+INTRADAY_TABLES = ["intraday_bars_1m"] + [f"intraday_bars_{bar}" for bar, _, _ in INTRADAY_ROLLUPS]
+PARQUET_PARTITIONS.update({table: "ts" for table in INTRADAY_TABLES})
+
+def setup_db(conn, temp=False):
+    # Create tables (TEMP when they are only staged before a Parquet export)
+    kind = "TEMP TABLE" if temp else "TABLE"
+    conn.execute(f"""
+    CREATE {kind} IF NOT EXISTS stock_prices (
         ticker VARCHAR,
         date TIMESTAMP,
         open DOUBLE,
@@ -31,8 +61,8 @@ def setup_db():
     )
     """)
     
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS financial_metrics (
+    conn.execute(f"""
+    CREATE {kind} IF NOT EXISTS financial_metrics (
         ticker VARCHAR,
         report_period DATE,
         market_cap DOUBLE,
@@ -46,8 +76,8 @@ def setup_db():
     )
     """)
     
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS news (
+    conn.execute(f"""
+    CREATE {kind} IF NOT EXISTS news (
         ticker VARCHAR,
         date TIMESTAMP,
         title VARCHAR,
@@ -57,11 +87,23 @@ def setup_db():
         sentiment DOUBLE
     )
     """)
-    
-    conn.close()
 
-def sync_prices(tickers, suffix):
-    conn = duckdb.connect(DB_PATH)
+    # Exchange-local bars (ts = bar start): minutes from sync_intraday, rollups
+    # from build_intraday_bars
+    for table in INTRADAY_TABLES:
+        conn.execute(f"""
+        CREATE {kind} IF NOT EXISTS {table} (
+            ticker VARCHAR,
+            ts TIMESTAMP,
+            open DOUBLE,
+            high DOUBLE,
+            low DOUBLE,
+            close DOUBLE,
+            volume BIGINT
+        )
+        """)
+
+def sync_prices(conn, tickers, suffix):
     conn.execute("DELETE FROM stock_prices")
     
     for ticker in tickers:
@@ -79,10 +121,8 @@ def sync_prices(tickers, suffix):
                 )
         else:
             print(f"Failed to fetch prices for {ticker}: {response.status_code}")
-    conn.close()
 
-def sync_metrics(tickers, suffix):
-    conn = duckdb.connect(DB_PATH)
+def sync_metrics(conn, tickers, suffix):
     conn.execute("DELETE FROM financial_metrics")
     
     for ticker in tickers:
@@ -103,10 +143,8 @@ def sync_metrics(tickers, suffix):
                 )
         else:
             print(f"Failed to fetch metrics for {ticker}: {response.status_code}")
-    conn.close()
 
-def sync_news(tickers, suffix):
-    conn = duckdb.connect(DB_PATH)
+def sync_news(conn, tickers, suffix):
     conn.execute("DELETE FROM news")
     
     for ticker in tickers:
@@ -124,12 +162,363 @@ def sync_news(tickers, suffix):
                 )
         else:
             print(f"Failed to fetch news for {ticker}: {response.status_code}")
+
+def sync_intraday(conn, sources):
+    """Bulk-load minute bars from CSV or Parquet files (globs allowed).
+
+    Files need the columns ticker, ts, open, high, low, close and volume.
+    """
+    conn.execute("DELETE FROM intraday_bars_1m")
+    for source in sources:
+        print(f"Loading intraday bars from {source}...")
+        reader = "read_parquet" if source.endswith(".parquet") else "read_csv"
+        escaped = source.replace("'", "''")
+        conn.execute(f"""
+        INSERT INTO intraday_bars_1m
+        SELECT upper(ticker), ts::TIMESTAMP, open, high, low, close, volume::BIGINT
+        FROM {reader}('{escaped}')
+        """)
+
+INTRADAY_ROLLUP_SQL = """
+CREATE OR REPLACE {kind} intraday_bars_{bar} AS
+SELECT ticker, {bucket} AS ts,
+       arg_min(open, ts) AS open, max(high) AS high, min(low) AS low,
+       arg_max(close, ts) AS close, sum(volume) AS volume
+FROM intraday_bars_{source}
+GROUP BY ALL
+ORDER BY ticker, ts
+"""
+
+def build_intraday_bars(conn, temp=False):
+    """Sort the minute bars by (ticker, ts) and build the coarser rollups from them.
+
+    Sorted storage keeps each ticker's bars in a few row groups, so ticker and
+    time filters skip the rest through min/max statistics, and compresses
+    well (run-length tickers, near-constant timestamp deltas). Charts over
+    long ranges read the rollups instead of raw minutes.
+    """
+    print("Building intraday bar rollups...")
+    kind = "TEMP TABLE" if temp else "TABLE"
+    conn.execute(f"CREATE OR REPLACE {kind} intraday_bars_1m AS SELECT * FROM intraday_bars_1m ORDER BY ticker, ts")
+    for bar, source, bucket in INTRADAY_ROLLUPS:
+        conn.execute(INTRADAY_ROLLUP_SQL.format(kind=kind, bar=bar, source=source, bucket=bucket))
+
+def load_fts(conn):
+    """Load DuckDB's full-text search extension, installing it on first use."""
+    try:
+        conn.execute("LOAD fts")
+    except duckdb.Error:
+        try:
+            conn.execute("INSTALL fts")
+            conn.execute("LOAD fts")
+        except duckdb.Error as exc:
+            print(f"Full-text search extension unavailable: {exc}")
+            return False
+    return True
+
+def build_news_search(conn):
+    """Materialize news with a stable id and a BM25 index over title and source."""
+    print("Building news search index...")
+    conn.execute("""
+    CREATE OR REPLACE TABLE news_search AS
+    SELECT row_number() OVER (ORDER BY ticker, date, url) AS news_id,
+           ticker, date, title, source, url, sentiment
+    FROM news
+    ORDER BY ticker, date
+    """)
+    if not load_fts(conn):
+        print("Skipping BM25 index; search_news will fall back to substring matching")
+        return
+    conn.execute(
+        "PRAGMA create_fts_index('news_search', 'news_id', 'title', 'source', "
+        "stemmer = 'porter', stopwords = 'english', overwrite = 1)"
+    )
+
+EVENT_IMPACTS_SQL = """
+CREATE OR REPLACE TABLE event_impacts AS
+WITH bars AS (
+    SELECT ticker, date, close,
+           lead(close, 1) OVER w / close - 1 AS ret_1d,
+           lead(close, 5) OVER w / close - 1 AS ret_5d
+    FROM stock_prices
+    WINDOW w AS (PARTITION BY ticker ORDER BY date)
+),
+market AS (
+    -- Per-date sums so each ticker can be compared with the mean of the others
+    SELECT date, sum(ret_1d) AS sum_1d, count(ret_1d) AS n_1d,
+           sum(ret_5d) AS sum_5d, count(ret_5d) AS n_5d
+    FROM bars GROUP BY date
+),
+pending AS (
+    SELECT news_id, ticker, date, url FROM news_search n
+    {pending_filter}
+)
+SELECT p.news_id, p.ticker, p.date, p.url,
+       b.date AS base_date,
+       b.close AS base_close,
+       100 * b.ret_1d AS return_1d_pct,
+       100 * b.ret_5d AS return_5d_pct,
+       100 * (b.ret_1d - (m.sum_1d - b.ret_1d) / nullif(m.n_1d - 1, 0)) AS abnormal_1d_pct,
+       100 * (b.ret_5d - (m.sum_5d - b.ret_5d) / nullif(m.n_5d - 1, 0)) AS abnormal_5d_pct
+FROM pending p
+-- Daily bars are stamped at midnight, so the base is the last bar strictly
+-- before the article's day; the day-of reaction is then part of ret_1d
+ASOF LEFT JOIN bars b ON p.ticker = b.ticker AND date_trunc('day', p.date) > b.date
+LEFT JOIN market m ON m.date = b.date
+"""
+
+# Rows whose 5-day window had already closed in the previous snapshot cannot change
+FINALIZED_FILTER = """
+    WHERE NOT EXISTS (
+        SELECT 1 FROM prev.event_impacts x
+        WHERE x.ticker = n.ticker AND x.date = n.date AND x.url = n.url
+          AND x.return_5d_pct IS NOT NULL
+    )
+"""
+
+# news_id is not stable across snapshots, so previous rows are matched on the
+# article's natural key; duplicate articles must not multiply the copied rows
+REUSE_FINALIZED_SQL = """
+INSERT INTO event_impacts
+SELECT n.news_id, n.ticker, n.date, n.url, x.base_date, x.base_close,
+       x.return_1d_pct, x.return_5d_pct, x.abnormal_1d_pct, x.abnormal_5d_pct
+FROM news_search n
+JOIN (
+    SELECT * FROM prev.event_impacts
+    WHERE return_5d_pct IS NOT NULL
+    QUALIFY row_number() OVER (PARTITION BY ticker, date, url) = 1
+) x ON x.ticker = n.ticker AND x.date = n.date AND x.url = n.url
+"""
+
+def previous_derived_path(snapshot_dir):
+    """Path of the DuckDB file holding the published snapshot's derived tables, if any."""
+    pointer = os.path.join(snapshot_dir, POINTER_FILE)
+    if not os.path.exists(pointer):
+        return None
+    path = os.path.join(snapshot_dir, open(pointer).read().strip())
+    if os.path.isdir(path):
+        path = os.path.join(path, DERIVED_DB)
+    return path if os.path.exists(path) else None
+
+def can_reuse_impacts(conn):
+    """Finalized rows stay valid only if the previous snapshot priced the same tickers."""
+    has_tables = conn.execute("""
+        SELECT count(*) FROM duckdb_tables()
+        WHERE database_name = 'prev' AND table_name IN ('event_impacts', 'event_impacts_universe')
+    """).fetchone()[0]
+    if has_tables < 2:
+        return False
+    diff = conn.execute("""
+        SELECT count(*) FROM (
+            (SELECT DISTINCT ticker FROM stock_prices EXCEPT SELECT ticker FROM prev.event_impacts_universe)
+            UNION ALL
+            (SELECT ticker FROM prev.event_impacts_universe EXCEPT SELECT DISTINCT ticker FROM stock_prices)
+        )
+    """).fetchone()[0]
+    return diff == 0
+
+def build_event_impacts(conn, previous=None):
+    """Join each article to the surrounding price bars in one vectorized pass.
+
+    Returns are measured from the close of the last bar before the article's day
+    (ASOF join) to the close 1 and 5 trading bars later; abnormal returns subtract
+    the mean return of the other tickers over the same bars. There is one row per
+    ``news_search.news_id``. Rows whose window had already closed in ``previous``
+    are copied instead of recomputed.
+    """
+    print("Building event price impacts...")
+    reuse = False
+    if previous:
+        escaped = previous.replace("'", "''")
+        conn.execute(f"ATTACH '{escaped}' AS prev (READ_ONLY)")
+        reuse = can_reuse_impacts(conn)
+    try:
+        conn.execute(EVENT_IMPACTS_SQL.format(pending_filter=FINALIZED_FILTER if reuse else ""))
+        if reuse:
+            conn.execute(REUSE_FINALIZED_SQL)
+        conn.execute(
+            "CREATE OR REPLACE TABLE event_impacts_universe AS SELECT DISTINCT ticker FROM stock_prices"
+        )
+    finally:
+        if previous:
+            conn.execute("DETACH prev")
+    computed = conn.execute("SELECT count(*) FROM event_impacts").fetchone()[0]
+    print(f"Event impacts ready for {computed} articles (reused finalized rows: {reuse})")
+
+# Lookback in trading bars for each KPI period; ytd is resolved per ticker
+KPI_PERIOD_BARS = {"1w": 5, "1m": 21, "3m": 63, "6m": 126, "1y": 252}
+
+TICKER_KPIS_SQL = """
+CREATE OR REPLACE TABLE ticker_kpis AS
+WITH bars AS (
+    SELECT ticker, date, close, volume,
+           row_number() OVER (PARTITION BY ticker ORDER BY date DESC) - 1 AS bars_back
+    FROM stock_prices
+),
+latest AS (
+    SELECT ticker, date AS as_of, close AS latest_close, volume AS latest_volume
+    FROM bars WHERE bars_back = 0
+),
+year_range AS (
+    SELECT b.ticker, max(b.close) AS high_52w, min(b.close) AS low_52w
+    FROM bars b JOIN latest l USING (ticker)
+    WHERE b.date > l.as_of - INTERVAL 52 WEEK
+    GROUP BY b.ticker
+),
+periods AS (
+    SELECT l.ticker, p.period, p.bars
+    FROM latest l, (VALUES {period_values}) p(period, bars)
+    UNION ALL
+    -- Year to date starts from the last bar of the previous year
+    SELECT l.ticker, 'ytd', count(*) FILTER (WHERE year(b.date) = year(l.as_of))
+    FROM latest l JOIN bars b USING (ticker)
+    GROUP BY l.ticker
+),
+period_stats AS (
+    SELECT p.ticker, p.period,
+           arg_max(b.close, b.bars_back) AS start_close,
+           avg(b.volume) AS avg_volume
+    FROM periods p JOIN bars b ON b.ticker = p.ticker AND b.bars_back <= p.bars
+    GROUP BY p.ticker, p.period
+),
+metrics AS (
+    SELECT ticker, report_period, pe_ratio, market_cap,
+           lag(pe_ratio) OVER w AS prev_pe_ratio,
+           lag(market_cap) OVER w AS prev_market_cap
+    FROM financial_metrics
+    WINDOW w AS (PARTITION BY ticker ORDER BY report_period)
+    QUALIFY row_number() OVER (PARTITION BY ticker ORDER BY report_period DESC) = 1
+)
+SELECT s.ticker, s.period, l.as_of,
+       l.latest_close, s.start_close,
+       100 * (l.latest_close / nullif(s.start_close, 0) - 1) AS change_pct,
+       y.high_52w, y.low_52w,
+       l.latest_volume, s.avg_volume,
+       m.report_period, m.pe_ratio, m.prev_pe_ratio, m.market_cap, m.prev_market_cap
+FROM period_stats s
+JOIN latest l USING (ticker)
+JOIN year_range y USING (ticker)
+LEFT JOIN metrics m USING (ticker)
+ORDER BY s.ticker, s.period
+"""
+
+def build_ticker_kpis(conn):
+    """Precompute one row of kpi-card inputs per ticker and period.
+
+    Holds the latest close, the change over the period, the 52-week range,
+    the latest volume against the period average and the latest P/E and
+    market cap (with the prior report for comparison). The ``get_kpis`` tool
+    reads it through the (ticker, period) index.
+    """
+    print("Building KPI snapshot...")
+    period_values = ", ".join(f"('{period}', {bars})" for period, bars in KPI_PERIOD_BARS.items())
+    conn.execute(TICKER_KPIS_SQL.format(period_values=period_values))
+    conn.execute("CREATE UNIQUE INDEX ticker_kpis_key ON ticker_kpis (ticker, period)")
+
+def publish_snapshot(snapshot_dir, name):
+    """Atomically point CURRENT at ``name``; running servers pick it up on their next poll."""
+    tmp_path = os.path.join(snapshot_dir, POINTER_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(name + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, os.path.join(snapshot_dir, POINTER_FILE))
+
+def prune_snapshots(snapshot_dir, keep):
+    """Delete all but the newest ``keep`` snapshots (never the published one)."""
+    pointer = os.path.join(snapshot_dir, POINTER_FILE)
+    current = open(pointer).read().strip() if os.path.exists(pointer) else None
+    snapshots = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if name.startswith("finance-") and not name.endswith(".building")
+    )
+    for name in snapshots[:-keep] if keep > 0 else []:
+        if name == current:
+            continue
+        try:
+            remove_path(os.path.join(snapshot_dir, name))
+            print(f"Pruned old snapshot {name}")
+        except OSError as exc:
+            # Still open by a reader on platforms that lock open files
+            print(f"Could not prune {name}: {exc}")
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def export_parquet(conn, target_dir):
+    """Write each table as Parquet partitioned by year, sorted by ticker and date."""
+    for table, date_col in PARQUET_PARTITIONS.items():
+        print(f"Writing Parquet partitions for {table}...")
+        if conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] == 0:
+            # PARTITION_BY writes no files for an empty table; keep a schema-only
+            # file so the server still exposes a (typed, empty) view
+            empty_dir = os.path.join(target_dir, table, "year=0")
+            os.makedirs(empty_dir)
+            conn.execute(
+                f"COPY (SELECT *, 0 AS year FROM {table}) "
+                f"TO '{os.path.join(empty_dir, 'empty.parquet')}' (FORMAT parquet)"
+            )
+            continue
+        conn.execute(f"""
+        COPY (
+            SELECT *, year({date_col}) AS year FROM {table} ORDER BY ticker, {date_col}
+        ) TO '{os.path.join(target_dir, table)}'
+        (FORMAT parquet, PARTITION_BY (year), COMPRESSION zstd,
+         ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE})
+        """)
+
+def build_snapshot(tickers, suffix, snapshot_dir, fmt="duckdb", intraday=()):
+    """Build a complete new snapshot and return its name (not yet published).
+
+    ``duckdb`` snapshots are a single ``finance-<version>.db`` file; ``parquet``
+    snapshots are a ``finance-<version>/`` directory of partitioned Parquet files
+    plus a ``derived.db`` holding search indexes and other derived tables.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"finance-{version}.db" if fmt == "duckdb" else f"finance-{version}"
+    final_path = os.path.join(snapshot_dir, name)
+    building_path = final_path + ".building"
+    previous = previous_derived_path(snapshot_dir)
+
+    if fmt == "parquet":
+        os.makedirs(building_path)
+        conn = duckdb.connect(os.path.join(building_path, DERIVED_DB))
+    else:
+        conn = duckdb.connect(building_path)
+    try:
+        setup_db(conn, temp=fmt == "parquet")
+        sync_prices(conn, tickers, suffix)
+        sync_metrics(conn, tickers, suffix)
+        sync_news(conn, tickers, suffix)
+        sync_intraday(conn, intraday)
+        build_intraday_bars(conn, temp=fmt == "parquet")
+        build_news_search(conn)
+        build_event_impacts(conn, previous)
+        build_ticker_kpis(conn)
+        if fmt == "parquet":
+            export_parquet(conn, building_path)
+        conn.execute("CHECKPOINT")
+    except BaseException:
+        conn.close()
+        remove_path(building_path)
+        raise
     conn.close()
 
+    os.replace(building_path, final_path)
+    return name
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Synchronize real financial data from ai-hedge-fund fixtures.")
     parser.add_argument("--tickers", nargs="+", default=DEFAULT_TICKERS, help="List of tickers to sync (e.g. AAPL MSFT TSLA)")
     parser.add_argument("--suffix", default=DEFAULT_DATE_SUFFIX, help="Date suffix for the fixture files (e.g. _2024-03-01_2024-03-08)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="Directory holding versioned snapshots and the CURRENT pointer")
+    parser.add_argument("--format", choices=["duckdb", "parquet"], default="duckdb", help="Snapshot storage: one DuckDB file or ticker/year-partitioned Parquet")
+    parser.add_argument("--keep", type=int, default=3, help="Number of snapshots to keep after publishing")
+    parser.add_argument("--intraday", nargs="*", default=[], help="CSV or Parquet files (or globs) of minute bars: ticker, ts, open, high, low, close, volume")
     
     args = parser.parse_args()
     
@@ -137,15 +526,13 @@ if __name__ == "__main__":
     if len(args.tickers) == 1 and " " in args.tickers[0]:
         args.tickers = args.tickers[0].split()
     
-    print(f"Using database at: {DB_PATH}")
-    print("Setting up DuckDB schema...")
-    setup_db()
-    
+    print(f"Using snapshot directory: {args.snapshot_dir}")
     print(f"\nSynchronizing for tickers: {', '.join(args.tickers)}")
     print(f"Using date range suffix: {args.suffix}")
     
-    sync_prices(args.tickers, args.suffix)
-    sync_metrics(args.tickers, args.suffix)
-    sync_news(args.tickers, args.suffix)
+    name = build_snapshot(args.tickers, args.suffix, args.snapshot_dir, args.format, args.intraday)
+    publish_snapshot(args.snapshot_dir, name)
+    print(f"\nPublished snapshot {name}")
+    prune_snapshots(args.snapshot_dir, args.keep)
     
     print("\nSync completed successfully!")
@@ -0,0 +1,37 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SYNC_SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "sync_data.py"
+
+
+@pytest.fixture
+def sync_script():
+    """The sync job module (scripts/ is not a package)."""
+    spec = importlib.util.spec_from_file_location("sync_data", SYNC_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def trace_store(tmp_path, monkeypatch):
+    """An empty trace memory per test, so one test's runs are not replayed in another."""
+    from app.services import agent as agent_module
+    from app.services.traces import TraceStore
+
+    store = TraceStore(str(tmp_path / "traces.sqlite"))
+    monkeypatch.setattr(agent_module, "trace_store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def slow_query_log(tmp_path, monkeypatch):
+    """A slow-query log per test, so tests do not write next to the warehouse."""
+    from app.services import db as db_module
+    from app.services.slow_log import SlowQueryLog
+
+    log = SlowQueryLog(str(tmp_path / "slow_queries.jsonl"))
+    monkeypatch.setattr(db_module, "slow_query_log", log)
+    return log
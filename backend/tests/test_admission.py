@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.admission import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionPool,
+    Overloaded,
+    TokenBucket,
+)
+
+
+def test_interactive_requests_jump_ahead_of_batch():
+    async def scenario():
+        pool = AdmissionPool("test", limit=1, max_queue=4, max_wait_s=5)
+        order = []
+        held = await pool.acquire()
+
+        async def run(name, priority):
+            async with pool.slot(priority):
+                order.append(name)
+
+        batch = asyncio.create_task(run("batch", PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(run("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        assert pool.snapshot()["queued"] == 2
+        held.release()
+        await asyncio.gather(batch, interactive)
+        return order, pool.snapshot()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive", "batch"]
+    assert stats["active"] == 0 and stats["admitted"] == 3
+
+
+def test_overload_sheds_when_queue_is_full_or_wait_expires():
+    async def scenario():
+        pool = AdmissionPool("test", limit=1, max_queue=1, max_wait_s=0.05)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as full:
+            await pool.acquire()
+        with pytest.raises(Overloaded) as expired:
+            await waiter
+        return full.value, expired.value, pool.snapshot()
+
+    full, expired, stats = asyncio.run(scenario())
+    assert full.reason == "queue full" and full.retry_after_s >= 1
+    assert expired.reason == "queue wait exceeded"
+    assert stats["rejected"] == 1 and stats["timedOut"] == 1 and stats["queued"] == 0
+
+
+def test_token_bucket_paces_beyond_burst():
+    bucket = TokenBucket(rate_per_s=20, burst=2)
+    start = time.monotonic()
+    for _ in range(3):
+        assert bucket.acquire()
+    assert time.monotonic() - start >= 0.04
+    assert not bucket.acquire(blocking=False)
+    assert bucket.snapshot()["delayed"] == 1
+
+
+def test_query_endpoint_answers_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr("app.api.routes.query_pool", AdmissionPool("query", 0, 0, 0.01))
+    client = TestClient(app)
+    response = client.post("/api/query", json={"message": "hi"})
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+    stats = client.get("/api/admission").json()
+    assert {"query", "stream", "voice"} <= set(stats["pools"])
+    assert "ratePerS" in stats["llm"]
+
+
+def test_stream_slot_is_released_when_the_stream_ends(monkeypatch):
+    from app.services import agent as agent_module
+
+    async def fake_stream(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
+        yield {"event": "step", "data": {"stage": "planning"}}
+
+    pool = AdmissionPool("stream", 1, 0, 0.01)
+    monkeypatch.setattr("app.api.routes.stream_pool", pool)
+    monkeypatch.setattr(agent_module.agent_service, "process_query_stream", fake_stream)
+    client = TestClient(app)
+    for _ in range(2):
+        assert client.post("/api/query/stream", json={"message": "hi"}).status_code == 200
+    assert pool.snapshot()["active"] == 0
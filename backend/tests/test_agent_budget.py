@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage
+
+from app.services import agent as agent_module
+
+ROWS = [{"ticker": "AAPL", "date": "2024-01-02", "close": 185.6}]
+
+
+class WanderingGraph:
+    """Fetches one result, then keeps 'thinking' far past any budget."""
+
+    async def astream_events(self, inputs, version):
+        yield {"event": "on_tool_start", "name": "run_query", "run_id": "t1", "data": {"input": "SELECT"}}
+        yield {"event": "on_tool_end", "name": "run_query", "run_id": "t1", "data": {"output": json.dumps(ROWS)}}
+        yield {"event": "on_chat_model_start", "run_id": "m1", "data": {}}
+        await asyncio.sleep(30)
+
+
+class FakeLLM:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=json.dumps({
+            "intent": "price_history",
+            "assistantMessage": "Based on partial data.",
+            "dashboardSpec": {"blocks": [{"type": "line-chart", "props": {"data": "QUERY_RESULT_0"}}]},
+        }))
+
+
+def _collect(budget_s):
+    async def run():
+        return [e async for e in agent_module.agent_service.process_query_stream("AAPL", None, budget_s)]
+
+    return asyncio.run(run())
+
+
+def test_budget_forces_final_answer_from_gathered_results(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(agent_module, "_get_graph", WanderingGraph)
+    monkeypatch.setattr(agent_module, "_get_llm", lambda: llm)
+
+    start = time.monotonic()
+    events = _collect(budget_s=0.4)
+    assert time.monotonic() - start < 2
+
+    assert [e["data"]["type"] for e in events if e["event"] == "step"][-1] == "budget_exhausted"
+    result = events[-1]["data"]
+    assert events[-1]["event"] == "result"
+    assert result["partial"] is True
+    assert result["intent"] == "price_history"
+    assert result["toolResults"] == [ROWS]
+    assert result["budget"]["budgetMs"] == 400 and result["budget"]["steps"] == 1
+    assert "QUERY_RESULT_0: 1 rows" in llm.prompts[0]
+
+
+def test_budget_falls_back_to_raw_results_when_finalizing_is_too_slow(monkeypatch):
+    monkeypatch.setattr(agent_module, "_get_graph", WanderingGraph)
+    monkeypatch.setattr(agent_module, "_get_llm", lambda: FakeLLM(delay=30))
+
+    result = asyncio.run(agent_module.agent_service.process_query("AAPL", None, budget_s=0.4))
+
+    assert result["partial"] is True
+    blocks = result["dashboardSpec"]["blocks"]
+    assert [b["type"] for b in blocks] == ["executive-summary", "line-chart"]
+    assert blocks[1]["props"]["data"] == "QUERY_RESULT_0"
+    assert result["toolResults"] == [ROWS]
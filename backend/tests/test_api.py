@@ -6,7 +6,7 @@ from app.services import db as db_module
 
 
 def test_query_endpoint_hydrates_results_and_carries_chaos(monkeypatch):
-    async def fake_process_query(message, current_chaos=None):
+    async def fake_process_query(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
         return {
             "intent": "performance",
             "assistantMessage": "ok",
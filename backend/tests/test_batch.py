@@ -0,0 +1,86 @@
+import asyncio
+import dataclasses
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api import routes as routes_module
+from app.main import app
+from app.services import agent as agent_module
+from app.services.admission import AdmissionPool
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def _fake_agent(monkeypatch):
+    calls = []
+    running = {"now": 0, "max": 0}
+
+    async def fake_process_query(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
+        calls.append(message)
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.02)
+        running["now"] -= 1
+        if "FAIL" in message:
+            raise RuntimeError("agent exploded")
+        return {
+            "intent": "report",
+            "assistantMessage": message,
+            "dashboardSpec": {"blocks": [{"type": "kpi-card", "props": {"data": "QUERY_RESULT_0"}}]},
+            "toolResults": [[{"close": 1}]],
+        }
+
+    monkeypatch.setattr(agent_module.agent_service, "process_query", fake_process_query)
+    monkeypatch.setattr(routes_module, "query_pool", AdmissionPool("query", 8, 8, 1))
+    return calls, running
+
+
+def test_batch_expands_template_and_streams_ndjson(monkeypatch):
+    calls, running = _fake_agent(monkeypatch)
+    response = TestClient(app).post(
+        "/api/query/batch",
+        json={
+            "tickers": ["aapl", "MSFT", "FAIL", "AAPL", "TSLA"],
+            "template": "Morning report for {ticker}",
+            "concurrency": 2,
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *items, summary = _lines(response)
+    assert summary["done"] is True
+    assert (summary["items"], summary["succeeded"], summary["failed"]) == (5, 4, 1)
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3, 4]
+
+    by_index = {item["index"]: item for item in items}
+    assert by_index[0]["result"]["assistantMessage"] == "Morning report for AAPL"
+    assert by_index[0]["result"]["dashboardSpec"]["blocks"][0]["props"]["data"] == [{"close": 1}]
+    assert by_index[2] == {
+        "index": 2, "message": "Morning report for FAIL", "status": "error", "detail": "agent exploded"
+    }
+    # The repeated AAPL item is answered from the same run
+    assert by_index[3]["result"] == by_index[0]["result"]
+    assert sorted(calls) == sorted(set(calls)) and len(calls) == 4
+    assert running["max"] == 2
+
+
+def test_batch_rejects_bad_or_oversized_requests(monkeypatch):
+    _fake_agent(monkeypatch)
+    client = TestClient(app)
+    assert client.post("/api/query/batch", json={"tickers": ["AAPL"]}).status_code == 422
+    assert client.post(
+        "/api/query/batch", json={"tickers": ["AAPL"], "template": "no placeholder"}
+    ).status_code == 422
+    assert client.post(
+        "/api/query/batch", json={"messages": ["a"], "tickers": ["AAPL"], "template": "{ticker}"}
+    ).status_code == 422
+
+    monkeypatch.setattr(
+        routes_module, "settings", dataclasses.replace(routes_module.settings, batch_max_items=2)
+    )
+    response = client.post("/api/query/batch", json={"messages": ["a", "b", "c"]})
+    assert response.status_code == 413
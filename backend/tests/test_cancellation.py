@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import duckdb
+import pytest
+
+from app.services import agent as agent_module
+from app.services.cancellation import RunCancelled, RunScope, cancellation_stats, scoped_context
+from app.services.db import DuckDBService
+
+SLOW_SQL = "SELECT count(*) AS n FROM range(100000000000)"
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = DuckDBService(db_path=str(tmp_path / "finance.db"), snapshot_dir=str(tmp_path / "none"))
+    yield service
+    service.close()
+
+
+def test_cancelling_a_scope_interrupts_its_running_query(service):
+    scope = RunScope()
+    outcome = {}
+
+    def run():
+        try:
+            service.query(SLOW_SQL)
+        except Exception as exc:
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=scoped_context(scope).run, args=(run,))
+    thread.start()
+    time.sleep(0.3)
+    assert scope.cancel("client disconnected") == 1
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], duckdb.InterruptException)
+    # Later queries from the same run do not start; other runs are unaffected
+    with pytest.raises(RunCancelled):
+        scoped_context(scope).run(service.query, "SELECT 1 AS x")
+    assert service.query("SELECT 1 AS x") == [{"x": 1}]
+
+
+class QueryingGraph:
+    """Runs a tool that never finishes on its own, like an agent-written cross join."""
+
+    def __init__(self, service):
+        self.service = service
+        self.closed = False
+
+    async def astream_events(self, inputs, version):
+        try:
+            yield {"event": "on_tool_start", "name": "run_query", "run_id": "t1", "data": {"input": {"sql": SLOW_SQL}}}
+            yield {"event": "on_chat_model_start", "run_id": "m1", "data": {}}
+            await asyncio.to_thread(self.service.query, SLOW_SQL)
+        finally:
+            self.closed = True
+
+
+def test_disconnect_cancels_the_graph_and_its_queries(service, monkeypatch):
+    graph = QueryingGraph(service)
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: graph)
+    before = cancellation_stats.snapshot()
+    gone_at = time.monotonic() + 0.3
+
+    async def is_disconnected():
+        return time.monotonic() > gone_at
+
+    async def run():
+        with pytest.raises(RunCancelled):
+            await agent_module.agent_service.process_query("count", None, 30, is_disconnected=is_disconnected)
+
+    start = time.monotonic()
+    asyncio.run(run())
+
+    assert time.monotonic() - start < 3
+    assert graph.closed
+    after = cancellation_stats.snapshot()
+    assert after["runs"] == before["runs"] + 1
+    assert after["queriesInterrupted"] == before["queriesInterrupted"] + 1
+    assert after["toolCalls"] == before["toolCalls"] + 1
+    assert after["llmCalls"] == before["llmCalls"] + 1
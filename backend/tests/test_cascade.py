@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage
+
+from app.services import agent as agent_module
+from app.services.cascade import apply_chaos, classify
+
+FINAL = {"intent": "prices", "assistantMessage": "ok", "dashboardSpec": {"blocks": []}}
+
+
+class CountingGraph:
+    def __init__(self):
+        self.runs = 0
+
+    async def astream_events(self, inputs, version):
+        self.runs += 1
+        yield {"event": "on_chat_model_end", "run_id": "m", "data": {"output": AIMessage(content=json.dumps(FINAL))}}
+
+
+class FastModel:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def ainvoke(self, messages):
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return AIMessage(content=self.reply)
+
+
+def _run(monkeypatch, message, fast_model=None, chaos=None):
+    graph = CountingGraph()
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: graph)
+    monkeypatch.setattr(agent_module, "_get_router_llm", lambda: fast_model)
+    result = asyncio.run(agent_module.agent_service.process_query(message, chaos))
+    return result, graph.runs
+
+
+def test_rules_answer_chaos_and_small_talk_without_the_agent(monkeypatch):
+    result, runs = _run(monkeypatch, "Matrix mode please!", chaos={"rotation": 180})
+    assert runs == 0
+    assert result["intent"] == "chaos"
+    assert result["dashboardSpec"]["chaos"] == {"rotation": 180, "fontFamily": "Inter", "animation": None, "theme": "matrix"}
+    assert result["routing"]["route"] == "chaos" and result["routing"]["tier"] == "fast"
+    assert result["routing"]["agentMs"] is None
+
+    result, runs = _run(monkeypatch, "thanks a lot")
+    assert runs == 0 and result["intent"] == "conversation" and result["dashboardSpec"]["blocks"] == []
+
+
+def test_data_questions_and_mixed_commands_escalate(monkeypatch):
+    assert classify("Compare AAPL and MSFT") == "data"
+    assert classify("how has apple done lately") == "data"
+    assert apply_chaos("flip the AAPL chart", None) is None
+    assert apply_chaos("professional mode", {"theme": "matrix"})[0]["theme"] == "professional"
+
+    result, runs = _run(monkeypatch, "flip and show me AAPL prices")
+    assert runs == 1
+    assert result["routing"]["route"] == "data" and result["routing"]["tier"] == "full"
+    assert result["routing"]["method"] == "rules" and result["routing"]["agentMs"] >= 0
+
+
+def test_fast_model_decides_what_the_rules_cannot(monkeypatch):
+    reply = json.dumps({"route": "conversation", "assistantMessage": "I'm doing great!"})
+    result, runs = _run(monkeypatch, "tell me something nice", FastModel(reply))
+    assert runs == 0
+    assert result["assistantMessage"] == "I'm doing great!"
+    assert result["routing"]["method"] == "model"
+
+    result, runs = _run(monkeypatch, "what about the other one", FastModel('{"route": "data"}'))
+    assert runs == 1 and result["routing"]["method"] == "model"
+
+    result, runs = _run(monkeypatch, "what about the other one", FastModel(TimeoutError()))
+    assert runs == 1 and result["routing"]["route"] == "data"
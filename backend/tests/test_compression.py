@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+STEP = 'event: step\ndata: {{"stage": {}}}\n\n'
+
+
+def _app(minimum_size=500, max_delay_s=0.05):
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return JSONResponse({"data": [{"close": 1.5, "ticker": "AAPL"}] * 200})
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"ok": True})
+
+    @app.get("/tiny-stream")
+    def tiny_stream():
+        async def events():
+            for i in range(3):
+                yield STEP.format(i).encode()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stream")
+    def stream():
+        async def events():
+            yield STEP.format(0).encode()
+            await asyncio.sleep(0.2)
+            yield STEP.format(1).encode()
+            yield b"event: result\ndata: " + b"x" * 1000 + b"\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return CompressionMiddleware(
+        app, minimum_size=minimum_size, encodings=["gzip"], max_delay_s=max_delay_s
+    )
+
+
+def _collect(app, path, accept="gzip"):
+    messages = []
+
+    async def receive():
+        # Never reports a disconnect; spec 2.4 servers raise on send instead
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"accept-encoding", accept.encode())],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    headers = dict(messages[0]["headers"])
+    return headers, [m.get("body", b"") for m in messages[1:]]
+
+
+def test_negotiation_respects_q_values_and_server_preference():
+    preference = ["zstd", "br", "gzip"]
+    assert negotiate_encoding("gzip, br", preference) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", preference) == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity", preference) is None
+    assert negotiate_encoding("*", preference) == "zstd"
+
+
+def test_buffered_response_above_threshold_is_compressed():
+    headers, bodies = _collect(_app(), "/big")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert int(headers[b"content-length"]) == len(bodies[0])
+    assert b"accept-encoding" in headers[b"vary"].lower()
+    assert gzip.decompress(bodies[0]).startswith(b'{"data":')
+
+
+def test_small_response_is_left_alone():
+    headers, bodies = _collect(_app(), "/small")
+    assert b"content-encoding" not in headers
+    assert bodies == [b'{"ok":true}']
+
+
+def test_tiny_stream_below_threshold_is_not_compressed():
+    headers, bodies = _collect(_app(), "/tiny-stream")
+    assert b"content-encoding" not in headers
+    assert b"".join(bodies) == "".join(STEP.format(i) for i in range(3)).encode()
+
+
+def test_stream_starts_compressing_after_delay_and_flushes_per_event():
+    headers, bodies = _collect(_app(), "/stream")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decoder = zlib.decompressobj(31)
+    chunks = [decoder.decompress(body) for body in bodies]
+    # The first event is released by the delay timer, before the next one exists
+    assert chunks[0] == STEP.format(0).encode()
+    assert chunks[1] == STEP.format(1).encode()
+    assert chunks[2].startswith(b"event: result")
+    assert decoder.eof
+
+
+def test_zstd_round_trip_through_client():
+    zstandard = pytest.importorskip("zstandard")
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return JSONResponse({"data": list(range(2000))})
+
+    app.add_middleware(CompressionMiddleware, minimum_size=100, encodings=["zstd", "gzip"])
+    response = TestClient(app).get("/big", headers={"Accept-Encoding": "zstd"})
+    assert response.headers["content-encoding"] == "zstd"
+    body = zstandard.ZstdDecompressor().decompressobj().decompress(response.content)
+    assert body == b'{"data":[' + ",".join(map(str, range(2000))).encode() + b"]}"
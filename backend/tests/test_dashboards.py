@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from app.api import routes as routes_module
+from app.main import app
+from app.services import agent as agent_module
+from app.services import tools as tools_module
+from app.services.dashboards import DashboardStore
+from app.services.db import DuckDBService
+
+SQL = "SELECT ticker, close FROM stock_prices ORDER BY close"
+SPEC = {
+    "blocks": [
+        {"type": "line-chart", "props": {"title": "Closes", "data": "QUERY_RESULT_0", "xKey": "ticker", "yKeys": ["close"]}}
+    ]
+}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE stock_prices (ticker VARCHAR, close DOUBLE)")
+    conn.execute("INSERT INTO stock_prices VALUES ('AAPL', 1.0), ('MSFT', 2.0)")
+    conn.close()
+    service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+    monkeypatch.setattr(tools_module, "db_service", service)
+    monkeypatch.setattr(routes_module, "db_service", service)
+    monkeypatch.setattr(routes_module, "dashboard_store", DashboardStore(str(tmp_path / "dash.sqlite")))
+
+    async def fake_process_query(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
+        return {
+            "intent": "prices",
+            "assistantMessage": "ok",
+            "dashboardSpec": SPEC,
+            "toolResults": [[{"ticker": "AAPL", "close": 1.0}]],
+            "toolSources": [{"tool": "run_query", "args": {"sql": SQL}}],
+        }
+
+    monkeypatch.setattr(agent_module.agent_service, "process_query", fake_process_query)
+    return service
+
+
+def test_saved_dashboard_refreshes_without_agent_and_honours_etag(env, monkeypatch):
+    client = TestClient(app)
+    template = client.post("/api/query", json={"message": "closes"}).json()["dashboardTemplate"]
+    assert template["spec"]["blocks"][0]["props"]["data"] == "QUERY_RESULT_0"
+
+    saved = client.post("/api/dashboards", json={"name": "Closes", "template": template})
+    assert saved.status_code == 201
+    dashboard_id = saved.json()["id"]
+    assert [d["id"] for d in client.get("/api/dashboards").json()] == [dashboard_id]
+
+    refreshed = client.get(f"/api/dashboards/{dashboard_id}/refresh")
+    assert refreshed.status_code == 200
+    assert refreshed.json()["dashboardSpec"]["blocks"][0]["props"]["data"] == [
+        {"ticker": "AAPL", "close": 1.0},
+        {"ticker": "MSFT", "close": 2.0},
+    ]
+    etag = refreshed.headers["etag"]
+
+    # Unchanged snapshot: answered before any query runs
+    monkeypatch.setattr(routes_module, "run_sources", None)
+    not_modified = client.get(f"/api/dashboards/{dashboard_id}/refresh", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    assert client.delete(f"/api/dashboards/{dashboard_id}").status_code == 204
+    assert client.get(f"/api/dashboards/{dashboard_id}/refresh").status_code == 404
+
+
+def test_save_rejects_non_data_tool_sources(env):
+    client = TestClient(app)
+    response = client.post(
+        "/api/dashboards",
+        json={"name": "x", "template": {"spec": SPEC, "sources": [{"tool": "get_schema", "args": {}}]}},
+    )
+    assert response.status_code == 422
+
+
+def test_refresh_applies_sql_guard(env):
+    client = TestClient(app)
+    template = {"spec": SPEC, "sources": [{"tool": "run_query", "args": {"sql": "DELETE FROM stock_prices"}}]}
+    dashboard_id = client.post("/api/dashboards", json={"name": "bad", "template": template}).json()["id"]
+    assert client.get(f"/api/dashboards/{dashboard_id}/refresh").status_code == 502
+
+
+class OneQueryGraph:
+    async def astream_events(self, inputs, version):
+        yield {"event": "on_tool_start", "name": "run_query", "run_id": "t1", "data": {"input": {"sql": SQL}}}
+        yield {"event": "on_tool_start", "name": "get_schema", "run_id": "t2", "data": {"input": {}}}
+        yield {"event": "on_tool_end", "name": "get_schema", "run_id": "t2", "data": {"output": "stock_prices: ..."}}
+        yield {"event": "on_tool_end", "name": "run_query", "run_id": "t1", "data": {"output": json.dumps([{"close": 1.0}])}}
+        yield {
+            "event": "on_chat_model_end",
+            "run_id": "m1",
+            "data": {"output": AIMessage(content=json.dumps({"intent": "prices", "dashboardSpec": SPEC}))},
+        }
+
+
+def test_agent_records_the_tool_call_behind_each_result(monkeypatch):
+    monkeypatch.setattr(agent_module, "_get_graph", OneQueryGraph)
+    result = asyncio.run(agent_module.agent_service.process_query("closes"))
+    assert result["toolResults"] == [[{"close": 1.0}]]
+    assert result["toolSources"] == [{"tool": "run_query", "args": {"sql": SQL}}]
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import agent as agent_module
+from app.schemas.api import DashboardSpec, validate_dashboard_structure
+from app.utils.encoding import _stdlib_dumps, dumps, sse_event
+
+
+SPEC = {
+    "blocks": [
+        {"type": "executive-summary", "props": {"content": "hi"}},
+        {
+            "type": "line-chart",
+            "props": {"title": "t", "data": [{"date": "2024-01-01", "close": 1.5}], "xKey": "date"},
+        },
+    ],
+    "chaos": {"rotation": 180, "theme": "matrix"},
+}
+
+
+def test_structural_validation_matches_pydantic_dump():
+    assert validate_dashboard_structure(SPEC) == DashboardSpec.model_validate(SPEC).model_dump()
+    no_chaos = {"blocks": []}
+    assert validate_dashboard_structure(no_chaos) == DashboardSpec.model_validate(no_chaos).model_dump()
+
+
+def test_structural_validation_passes_data_through_without_copying():
+    checked = validate_dashboard_structure(SPEC)
+    assert checked["blocks"][1]["props"] is SPEC["blocks"][1]["props"]
+
+
+def test_structural_validation_rejects_bad_shapes():
+    with pytest.raises(ValueError):
+        validate_dashboard_structure({"blocks": [{"type": "kpi-card", "props": []}]})
+    with pytest.raises(ValueError):
+        validate_dashboard_structure({"blocks": [{"props": {}}]})
+
+
+def test_dumps_matches_stdlib_encoding():
+    payload = {"a": [1, 2.5, None, "é"], "b": {"nested": True}, "big": 2**70}
+    assert json.loads(dumps(payload)) == json.loads(_stdlib_dumps(payload))
+
+
+def test_sse_event_framing():
+    frame = sse_event("content", {"delta": "hi"})
+    assert frame.startswith(b"event: content\ndata: ")
+    assert frame.endswith(b"\n\n")
+    assert json.loads(frame.split(b"data: ", 1)[1]) == {"delta": "hi"}
+
+
+def test_stream_endpoint_emits_encoded_events(monkeypatch):
+    async def fake_stream(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
+        yield {"event": "step", "data": {"stage": "planning"}}
+        yield {
+            "event": "result",
+            "data": {"intent": "test", "assistantMessage": "done", "dashboardSpec": {"blocks": []}},
+        }
+
+    monkeypatch.setattr(agent_module.agent_service, "process_query_stream", fake_stream)
+    client = TestClient(app)
+    response = client.post("/api/query/stream", json={"message": "hi"})
+
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    events = [frame.split("\n")[0].removeprefix("event: ") for frame in frames]
+    assert events == ["step", "content", "result", "done"]
+    result = json.loads(frames[2].split("data: ", 1)[1])
+    assert result["dashboardSpec"] == {"blocks": [], "chaos": None}
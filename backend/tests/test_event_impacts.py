@@ -0,0 +1,96 @@
+import duckdb
+import pytest
+
+CLOSES = {
+    # 7 trading days; AAPL jumps 10% on the day of its news
+    "AAPL": [100, 110, 110, 110, 110, 121, 121],
+    "MSFT": [100, 101, 102, 103, 104, 105, 106],
+    "TSLA": [100, 99, 98, 97, 96, 95, 94],
+}
+DATES = [f"2024-05-0{d}" for d in range(1, 8)]
+
+
+def _build(sync_script, path, closes=CLOSES, previous=None, duplicate=False):
+    conn = duckdb.connect(path)
+    sync_script.setup_db(conn)
+    for ticker, series in closes.items():
+        for date, close in zip(DATES, series):
+            conn.execute(
+                "INSERT INTO stock_prices VALUES (?, ?, 0, 0, 0, ?, 0)", (ticker, date, close)
+            )
+    conn.execute(
+        "INSERT INTO news VALUES ('AAPL', '2024-05-02 14:30', 'Apple launches', 'a', 'Reuters', 'u1', 0.5)"
+    )
+    if duplicate:
+        conn.execute("INSERT INTO news SELECT * FROM news WHERE url = 'u1'")
+    conn.execute(
+        "INSERT INTO news VALUES ('TSLA', '2024-05-06', 'Late news', 'a', 'Reuters', 'u2', 0.1)"
+    )
+    sync_script.build_news_search(conn)
+    sync_script.build_event_impacts(conn, previous)
+    return conn
+
+
+def _impacts(conn):
+    return {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT url, return_1d_pct, return_5d_pct, abnormal_1d_pct, base_date "
+            "FROM event_impacts"
+        ).fetchall()
+    }
+
+
+def test_event_impacts_use_asof_bar_and_cross_ticker_abnormal_return(sync_script, tmp_path):
+    conn = _build(sync_script, str(tmp_path / "finance.db"))
+    ret_1d, ret_5d, abnormal_1d, base_date = _impacts(conn)["u1"]
+
+    # Intraday article: based on the previous day's close, so the day-of move counts
+    assert str(base_date) == "2024-05-01 00:00:00"
+    assert ret_1d == pytest.approx(10.0)
+    assert ret_5d == pytest.approx(21.0)
+    # Others: MSFT +1%, TSLA -1% -> mean 0%
+    assert abnormal_1d == pytest.approx(10.0)
+
+    # Based on 2024-05-05: 1-day return known, 5-day window still open
+    late = _impacts(conn)["u2"]
+    assert late[0] is not None and late[1] is None
+
+
+def test_event_impacts_reuse_finalized_rows_from_previous_snapshot(sync_script, tmp_path):
+    previous = str(tmp_path / "prev.db")
+    conn = _build(sync_script, previous)
+    conn.execute("UPDATE event_impacts SET return_1d_pct = -999 WHERE url = 'u1'")
+    conn.close()
+
+    conn = _build(sync_script, str(tmp_path / "next.db"), previous=previous)
+    impacts = _impacts(conn)
+    assert impacts["u1"][0] == -999  # finalized: copied, not recomputed
+    assert impacts["u2"][0] == pytest.approx(-1 / 96 * 100)  # open window: recomputed
+
+
+def test_event_impacts_recompute_when_ticker_universe_changes(sync_script, tmp_path):
+    previous = str(tmp_path / "prev.db")
+    conn = _build(sync_script, previous)
+    conn.execute("UPDATE event_impacts SET return_1d_pct = -999")
+    conn.close()
+
+    closes = {k: v for k, v in CLOSES.items() if k != "MSFT"}
+    conn = _build(sync_script, str(tmp_path / "next.db"), closes=closes, previous=previous)
+    assert _impacts(conn)["u1"][0] == pytest.approx(10.0)
+
+
+def test_duplicate_articles_do_not_multiply_impacts(sync_script, tmp_path):
+    previous = str(tmp_path / "prev.db")
+    conn = _build(sync_script, previous, duplicate=True)
+    assert conn.execute("SELECT count(*) FROM event_impacts WHERE url = 'u1'").fetchone()[0] == 2
+    conn.close()
+
+    for name in ("next.db", "after.db"):
+        conn = _build(sync_script, str(tmp_path / name), previous=previous, duplicate=True)
+        counts = conn.execute(
+            "SELECT count(*), count(DISTINCT news_id) FROM event_impacts WHERE url = 'u1'"
+        ).fetchone()
+        assert counts == (2, 2)
+        conn.close()
+        previous = str(tmp_path / name)
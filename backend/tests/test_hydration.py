@@ -0,0 +1,75 @@
+import duckdb
+import pytest
+
+from app.api import routes as routes_module
+from app.api.routes import FALLBACK_SERIES_SQL, _hydrate_missing_time_series
+from app.services import mentions as mentions_module
+from app.services.db import DuckDBService
+
+
+@pytest.fixture
+def prices(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute(
+        "CREATE TABLE stock_prices (ticker VARCHAR, date TIMESTAMP, open DOUBLE, high DOUBLE,"
+        " low DOUBLE, close DOUBLE, volume BIGINT)"
+    )
+    conn.execute(
+        "INSERT INTO stock_prices SELECT t, TIMESTAMP '2024-01-01' + INTERVAL (i) DAY, i, i, i, i, 0"
+        " FROM (VALUES ('AAPL'), ('MSFT'), ('TSLA')) v(t), range(60) r(i)"
+    )
+    conn.close()
+    service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+    queries = []
+    query = service.query
+
+    def counting_query(sql, params=None):
+        queries.append((sql, params))
+        return query(sql, params)
+
+    monkeypatch.setattr(service, "query", counting_query)
+    monkeypatch.setattr(routes_module, "db_service", service)
+    monkeypatch.setattr(mentions_module, "db_service", service)
+    return queries
+
+
+def _series_queries(queries):
+    return [(sql, params) for sql, params in queries if sql == FALLBACK_SERIES_SQL.format(placeholders="?, ?, ?")]
+
+
+def test_twenty_empty_charts_are_hydrated_with_one_query(prices):
+    tickers = ["AAPL", "MSFT", "TSLA"]
+    blocks = []
+    for i in range(20):
+        ticker = tickers[i % 3]
+        if i % 2:
+            blocks.append({"type": "candlestick-chart", "props": {"ticker": ticker.lower(), "data": []}})
+        else:
+            blocks.append({"type": "line-chart", "props": {"title": f"{ticker} last {i + 1} days", "data": "QUERY_RESULT_9"}})
+    blocks.append({"type": "line-chart", "props": {"title": "No ticker here"}})
+    blocks.append({"type": "line-chart", "props": {"title": "Microsoft over the last 2 weeks"}})
+    blocks.append({"type": "line-chart", "props": {"title": "AAPL", "data": [{"close": 1}]}})
+
+    spec = _hydrate_missing_time_series({"blocks": blocks})
+
+    series = _series_queries(prices)
+    assert len(series) == 1
+    sql, params = series[0]
+    assert "AAPL" not in sql and params == ["AAPL", "MSFT", "TSLA", 30]
+    for i, block in enumerate(spec["blocks"][:20]):
+        data = block["props"]["data"]
+        days = 30 if i % 2 else i + 1
+        assert len(data) == days
+        assert data[-1]["close"] == 59 and data[0]["close"] == 60 - days
+        assert set(data[0]) == {"date", "open", "high", "low", "close"}
+    assert spec["blocks"][0]["props"]["xKey"] == "date"
+    assert "data" not in spec["blocks"][20]["props"]
+    assert len(spec["blocks"][21]["props"]["data"]) == 14
+    assert spec["blocks"][22]["props"]["data"] == [{"close": 1}]
+
+
+def test_no_query_when_every_chart_has_data(prices):
+    spec = {"blocks": [{"type": "line-chart", "props": {"title": "AAPL", "data": [{"close": 1}]}}]}
+    assert _hydrate_missing_time_series(spec) == spec
+    assert prices == []
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import duckdb
+import pytest
+
+from app.services import statements as statements_module
+from app.services import tools as tools_module
+from app.services.db import POINTER_FILE, DuckDBService
+from app.services.statements import choose_bar, stored_bar
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, sync_script):
+    conn = duckdb.connect(str(tmp_path / "finance-v1.db"))
+    sync_script.setup_db(conn)
+    # One week (Mon 2024-01-08 to Fri) of regular-session minutes, loaded out of order
+    conn.execute("""
+        INSERT INTO intraday_bars_1m
+        SELECT t, TIMESTAMP '2024-01-08 09:30' + to_days(d) + to_minutes(m),
+               d * 1000 + m, d * 1000 + m + 1, d * 1000 + m - 1, d * 1000 + m + 0.5, 1
+        FROM (VALUES ('MSFT'), ('AAPL')) v(t), range(5) a(d), range(390) b(m)
+        ORDER BY random()
+    """)
+    sync_script.build_intraday_bars(conn)
+    conn.close()
+    (tmp_path / POINTER_FILE).write_text("finance-v1.db")
+    service = DuckDBService(db_path="unused.db", snapshot_dir=str(tmp_path), poll_interval_s=60)
+    monkeypatch.setattr(statements_module, "db_service", service)
+    monkeypatch.setattr(tools_module, "db_service", service)
+    yield service
+    service.close()
+
+
+def _bars(**kwargs):
+    return json.loads(tools_module.get_intraday_bars.invoke(kwargs))
+
+
+def test_sync_stores_sorted_minutes_and_rollups(service):
+    with service.connection() as (_, conn):
+        keys = conn.execute("SELECT ticker, ts FROM intraday_bars_1m").fetchall()
+        first = conn.execute("SELECT * FROM intraday_bars_5m ORDER BY ticker, ts LIMIT 1").fetchone()
+        daily = conn.execute("SELECT count(*), sum(volume) FROM intraday_bars_1d").fetchone()
+    assert keys == sorted(keys)
+    assert first == ("AAPL", datetime(2024, 1, 8, 9, 30), 0.0, 5.0, -1.0, 4.5, 5)
+    assert daily == (10, 3900)
+
+
+def test_bar_size_follows_the_requested_range(service):
+    # No range: the latest session, 390 minutes as 78 five-minute bars
+    session = _bars(tickers=["AAPL"])
+    assert len(session) == 78
+    assert session[0]["date"].startswith("2024-01-12T09:30") and session[1]["date"].startswith("2024-01-12T09:35")
+
+    # Three days: 15-minute bars resampled from the 5m rollup, aligned to the open
+    days = _bars(tickers="AAPL", start="2024-01-08", end="2024-01-10")
+    assert len(days) == 3 * 26
+    assert [r["date"][11:16] for r in days[:2]] == ["09:30", "09:45"]
+    assert (days[0]["open"], days[0]["close"], days[0]["volume"]) == (0.0, 14.5, 15)
+
+    # A week for two tickers fits only as 30-minute bars
+    week = _bars(tickers="AAPL,MSFT", start="2024-01-08", end="2024-01-12")
+    assert len(week) == 2 * 5 * 13 and week[-1]["ticker"] == "MSFT"
+
+    # Hourly bars start at the session open, not on the clock hour
+    hourly = _bars(tickers=["MSFT"], start="2024-01-10T09:30", end="2024-01-10T16:00", bar="1h")
+    assert [r["date"][11:16] for r in hourly] == ["09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30"]
+
+    assert "error" in _bars(tickers=["NVDA"])
+    assert "error" in _bars(tickers=["AAPL"], start="2024-01-10", end="2024-01-09")
+
+
+def test_long_ranges_never_read_raw_minutes():
+    start, end = datetime(2024, 1, 1), datetime(2024, 4, 1)
+    assert choose_bar(start, end, 1, 200) == "1d"
+    assert choose_bar(start, end, 1, 200, requested="1m") == "1d"
+    assert choose_bar(datetime(2022, 1, 1), end, 1, 200) == "1w"
+    assert choose_bar(datetime(2024, 1, 8, 9, 30), datetime(2024, 1, 8, 11), 1, 200) == "1m"
+    assert choose_bar(datetime(2024, 1, 8, 9, 30), datetime(2024, 1, 8, 11), 1, 200, requested="30m") == "30m"
+    assert [stored_bar(bar) for bar in ("1m", "15m", "1h", "1d", "1w")] == ["1m", "5m", "30m", "1d", "1d"]
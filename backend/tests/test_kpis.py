@@ -0,0 +1,114 @@
+import json
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes as routes_module
+from app.main import app
+from app.services import tools as tools_module
+from app.services.dashboards import DashboardStore
+from app.services.db import DuckDBService
+
+
+@pytest.fixture
+def kpi_db(tmp_path, monkeypatch, sync_script):
+    def build(with_kpis=True):
+        path = str(tmp_path / ("finance.db" if with_kpis else "no-kpis.db"))
+        conn = duckdb.connect(path)
+        sync_script.setup_db(conn)
+        # 32 weekdays from 2023-12-22 to 2024-02-05; AAPL closes 100, 101, ... 131
+        conn.execute("""
+            INSERT INTO stock_prices
+            SELECT 'AAPL', d, 0, 0, 0, 100 + row_number() OVER (ORDER BY d) - 1,
+                   CASE WHEN d = TIMESTAMP '2024-02-05' THEN 3000 ELSE 1000 END
+            FROM range(TIMESTAMP '2023-12-22', TIMESTAMP '2024-02-06', INTERVAL 1 DAY) t(d)
+            WHERE dayofweek(d) BETWEEN 1 AND 5
+        """)
+        conn.execute(
+            "INSERT INTO financial_metrics (ticker, report_period, market_cap, pe_ratio) VALUES "
+            "('AAPL', '2023-09-30', 2.5e12, 25.0), ('AAPL', '2023-12-31', 3.0e12, 30.0)"
+        )
+        if with_kpis:
+            sync_script.build_ticker_kpis(conn)
+        conn.close()
+        service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+        monkeypatch.setattr(tools_module, "db_service", service)
+        monkeypatch.setattr(routes_module, "db_service", service)
+        return conn
+
+    return build
+
+
+def _kpis(**kwargs):
+    return json.loads(tools_module.get_kpis.invoke(kwargs))
+
+
+def test_ticker_kpis_snapshot_per_period(kpi_db, sync_script, tmp_path):
+    kpi_db()
+    conn = duckdb.connect(str(tmp_path / "finance.db"), read_only=True)
+    rows = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT period, latest_close, start_close, high_52w, low_52w, avg_volume, prev_pe_ratio "
+            "FROM ticker_kpis WHERE ticker = 'AAPL'"
+        ).fetchall()
+    }
+    conn.close()
+    assert set(rows) == set(sync_script.KPI_PERIOD_BARS) | {"ytd"}
+    latest, start, high, low, avg_volume, prev_pe = rows["1w"]
+    assert latest == 131 and start == 126
+    assert (high, low) == (131, 100)
+    assert avg_volume == pytest.approx(4000 / 3)  # 1 of 6 bars at 3000
+    assert prev_pe == 25.0
+    # Year to date starts from the last 2023 close
+    assert rows["ytd"][1] == 105
+    # Short history: the window starts at the first bar
+    assert rows["1y"][1] == 100
+
+
+def test_get_kpis_returns_kpi_card_props(kpi_db):
+    kpi_db()
+    cards = _kpis(tickers="aapl", metrics=["price", "volume", "pe_ratio", "market_cap"], period="1w")
+
+    assert cards == [
+        {"ticker": "AAPL", "metric": "Price", "value": "$131.00", "change": "+4.0%",
+         "changeDirection": "up", "comparisonBenchmark": "1w change"},
+        {"ticker": "AAPL", "metric": "Volume", "value": "3.00K", "change": "+125.0%",
+         "changeDirection": "up", "comparisonBenchmark": "vs 1w average"},
+        {"ticker": "AAPL", "metric": "P/E Ratio", "value": "30.0x", "change": "+20.0%",
+         "changeDirection": "up", "comparisonBenchmark": "vs prior report"},
+        {"ticker": "AAPL", "metric": "Market Cap", "value": "$3.00T", "change": "+20.0%",
+         "changeDirection": "up", "comparisonBenchmark": "vs prior report"},
+    ]
+    low, = _kpis(tickers=["AAPL"], metrics=["52w_low"])
+    assert low["value"] == "$100.00" and low["change"] == "+31.0%"
+
+
+def test_get_kpis_reports_bad_input_and_missing_snapshot(kpi_db):
+    kpi_db()
+    assert "Unknown period" in _kpis(tickers=["AAPL"], period="5y")["error"]
+    assert "Unknown metrics" in _kpis(tickers=["AAPL"], metrics=["beta"])["error"]
+    assert "No price data" in _kpis(tickers=["NVDA"])["error"]
+
+    kpi_db(with_kpis=False)
+    assert "not available" in _kpis(tickers=["AAPL"])["error"]
+
+
+def test_saved_kpi_cards_are_refreshed_from_get_kpis(kpi_db, tmp_path, monkeypatch):
+    kpi_db()
+    monkeypatch.setattr(routes_module, "dashboard_store", DashboardStore(str(tmp_path / "dash.sqlite")))
+    client = TestClient(app)
+    spec = {"blocks": [
+        {"type": "kpi-card", "props": "QUERY_RESULT_0[1]"},
+        {"type": "kpi-card", "props": "QUERY_RESULT_0[5]"},
+    ]}
+    sources = [{"tool": "get_kpis", "args": {"tickers": ["AAPL"], "metrics": ["price", "pe_ratio"]}}]
+    saved = client.post("/api/dashboards", json={"name": "KPIs", "template": {"spec": spec, "sources": sources}})
+    assert saved.status_code == 201
+
+    refreshed = client.get(f"/api/dashboards/{saved.json()['id']}/refresh")
+    assert refreshed.status_code == 200
+    pe, missing = [block["props"] for block in refreshed.json()["dashboardSpec"]["blocks"]]
+    assert pe["metric"] == "P/E Ratio" and pe["value"] == "30.0x"
+    assert missing == {}
@@ -13,3 +13,11 @@ def test_nan_handling():
         assert results[0]["val"] is None
     finally:
         db_service.execute("DROP TABLE test_nan")
+
+
+def test_timestamptz_columns_are_serialized_as_utc():
+    results = db_service.query(
+        "SELECT TIMESTAMPTZ '2024-01-02 03:04:05+00' AS ts, 1.5 AS v, NULL::TIMESTAMPTZ AS missing"
+    )
+    assert results == [{"ts": "2024-01-02T03:04:05.000Z", "v": 1.5, "missing": None}]
+    assert len(db_service.query("SELECT now() AS ts")) == 1
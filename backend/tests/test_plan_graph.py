@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import duckdb
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.prebuilt import create_react_agent
+
+from app.services import agent as agent_module
+from app.services import tools as tools_module
+from app.services.db import DuckDBService
+from app.services.planner import PlanError, build_plan_graph, validate_plan
+
+SPEC = {"blocks": [{"type": "line-chart", "props": {"data": "QUERY_RESULT_0"}}, {"type": "line-chart", "props": {"data": "QUERY_RESULT_1"}}]}
+FINAL = json.dumps({"intent": "prices", "assistantMessage": "Done.", "dashboardSpec": SPEC})
+
+
+class ScriptedModel(BaseChatModel):
+    """Replies with the scripted messages in order."""
+
+    replies: list
+    prompts: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE stock_prices (ticker VARCHAR, close DOUBLE)")
+    conn.execute("INSERT INTO stock_prices VALUES ('AAPL', 1.0), ('MSFT', 2.0)")
+    conn.close()
+    monkeypatch.setattr(tools_module, "db_service", DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none")))
+    return tools_module.get_all_tools()
+
+
+def _plan(*tickers):
+    calls = [{"tool": "run_query", "args": {"sql": f"SELECT * FROM stock_prices WHERE ticker = '{t}'"}} for t in tickers]
+    return AIMessage(content=json.dumps({"calls": calls}))
+
+
+def _run(monkeypatch, llm, tools):
+    graph = build_plan_graph(llm, tools, create_react_agent(llm, tools))
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: graph)
+    return asyncio.run(agent_module.agent_service.process_query("AAPL and MSFT"))
+
+
+def test_plan_runs_every_call_then_synthesizes_once(monkeypatch, tools):
+    llm = ScriptedModel(replies=[_plan("MSFT", "AAPL"), AIMessage(content=FINAL)], prompts=[])
+    result = _run(monkeypatch, llm, tools)
+
+    assert len(llm.prompts) == 2 and llm.prompts[0].startswith("PLANNING STEP")
+    synthesis = llm.prompts[1]
+    assert synthesis.index("QUERY_RESULT_0 = run_query") < synthesis.index("'MSFT'") < synthesis.index("QUERY_RESULT_1")
+    # Results are numbered in plan order, not completion order
+    assert result["toolResults"] == [[{"ticker": "MSFT", "close": 2.0}], [{"ticker": "AAPL", "close": 1.0}]]
+    assert result["budget"]["steps"] == 2
+
+
+def test_invalid_plan_falls_back_to_react(monkeypatch, tools):
+    tool_call = {"name": "run_query", "args": {"sql": "SELECT * FROM stock_prices WHERE ticker = 'AAPL'"}, "id": "c1"}
+    llm = ScriptedModel(
+        replies=[
+            AIMessage(content='{"calls": [{"tool": "run_query", "args": {"sql": "DROP TABLE stock_prices"}}]}'),
+            AIMessage(content="", tool_calls=[tool_call]),
+            AIMessage(content=FINAL.replace(', {"type": "line-chart", "props": {"data": "QUERY_RESULT_1"}}', "")),
+        ],
+        prompts=[],
+    )
+    result = _run(monkeypatch, llm, tools)
+
+    assert len(llm.prompts) == 3
+    assert result["toolResults"] == [[{"ticker": "AAPL", "close": 1.0}]]
+    assert result["assistantMessage"] == "Done."
+
+
+def test_validate_plan_rejects_what_cannot_run(tools):
+    by_name = {t.name: t for t in tools}
+    with pytest.raises(PlanError, match="unknown tool"):
+        validate_plan('{"calls": [{"tool": "shell", "args": {}}]}', by_name, 5)
+    with pytest.raises(PlanError, match="at most 1"):
+        validate_plan(_plan("AAPL", "MSFT").content, by_name, 1)
+    with pytest.raises(PlanError, match="not JSON"):
+        validate_plan("I will fetch prices first.", by_name, 5)
+    assert validate_plan('{"calls": []}', by_name, 5) == []
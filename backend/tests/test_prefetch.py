@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import mentions as mentions_module
+from app.services import prefetch as prefetch_module
+from app.services import statements as statements_module
+from app.services import tools as tools_module
+from app.services.db import DuckDBService
+from app.services.mentions import infer_days, infer_tickers
+from app.services.prefetch import Prefetch
+from app.services.statements import PRICE_WINDOW
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    service = DuckDBService(
+        db_path=str(tmp_path / "finance.db"), snapshot_dir=str(tmp_path / "snapshots"), poll_interval_s=0
+    )
+    service.execute(
+        "CREATE TABLE stock_prices (ticker VARCHAR, date TIMESTAMP, open DOUBLE, high DOUBLE,"
+        " low DOUBLE, close DOUBLE, volume BIGINT)"
+    )
+    service.execute(
+        "INSERT INTO stock_prices SELECT t, TIMESTAMP '2024-01-01' + INTERVAL (i) DAY, 1, 1, 1, i, 100"
+        " FROM (VALUES ('AAPL'), ('MSFT'), ('ON')) v(t), range(120) r(i)"
+    )
+    service.execute("CREATE TABLE financial_metrics (ticker VARCHAR, report_period DATE, pe_ratio DOUBLE)")
+    service.execute("CREATE TABLE news (ticker VARCHAR, date TIMESTAMP, title VARCHAR, source VARCHAR,"
+                    " url VARCHAR, sentiment DOUBLE)")
+    for module in (mentions_module, prefetch_module, statements_module, tools_module):
+        monkeypatch.setattr(module, "db_service", service)
+    yield service
+    service.close()
+
+
+def test_infers_tickers_and_windows():
+    universe = ["AAPL", "MSFT", "ON", "TSLA"]
+    assert infer_tickers("Compare Microsoft with $AAPL", universe) == ["MSFT", "AAPL"]
+    assert infer_tickers("what happened on friday to tesla", universe) == ["TSLA"]
+    assert infer_days("AAPL over the last 3 weeks") == 21
+    assert infer_days("past 10 days") == 10
+    assert infer_days("Last  12 Days of TSLA") == 12
+    assert infer_days("MSFT YTD") == 365
+    assert infer_days("this quarter") == 90
+    assert infer_days("AAPL price") is None
+
+
+def test_prefetch_serves_agent_query_and_counts_waste(service):
+    async def run():
+        prefetch = await Prefetch("How did Apple trade over the past 2 weeks?").start()
+        assert [call.tool for call in prefetch.queries] == ["get_prices", "get_metrics", "get_news"]
+        assert 'get_prices({"tickers": ["AAPL"], "start": "2024-04-15"})' in prefetch.hint()
+        # Meanwhile the model plans, then makes the price call as listed
+        await asyncio.gather(*prefetch._tasks)
+        rows = await asyncio.to_thread(
+            tools_module.get_prices.invoke, {"tickers": ["AAPL"], "start": "2024-04-15"}
+        )
+        assert len(json.loads(rows)) == 15
+        return await prefetch.finish()
+
+    stats = asyncio.run(run())
+    assert stats["issued"] == 3
+    assert stats["hits"] == 1
+    assert stats["wasted"] == 2
+    assert stats["failed"] == 0
+
+
+def test_prefetch_skips_cached_queries_and_unknown_tickers(service):
+    rows = PRICE_WINDOW.run(tickers=["MSFT"], start="2024-03-30")
+    assert len(rows) == 31
+
+    async def run(message):
+        prefetch = await Prefetch(message).start()
+        return prefetch, await prefetch.finish()
+
+    prefetch, stats = asyncio.run(run("MSFT news"))
+    assert stats["alreadyCached"] == 1 and stats["issued"] == 2
+
+    prefetch, stats = asyncio.run(run("What about NVDA?"))
+    assert prefetch.queries == [] and prefetch.hint() == ""
+    assert stats["issued"] == 0
+
+
+def test_identical_query_waits_for_running_prefetch(service, monkeypatch):
+    sql = "SELECT * FROM stock_prices WHERE ticker = 'AAPL'"
+    executed = []
+    started, release = threading.Event(), threading.Event()
+    execute = service._execute_query
+
+    def slow_execute(conn, query, params, prepared=None):
+        executed.append(query)
+        started.set()
+        release.wait(5)
+        return execute(conn, query, params, prepared)
+
+    monkeypatch.setattr(service, "_execute_query", slow_execute)
+    with ThreadPoolExecutor(2) as pool:
+        key = pool.submit(service.prefetch, sql)
+        assert started.wait(5)
+        rows = pool.submit(service.query, sql)
+        release.set()
+        assert len(rows.result()) == 120
+        key = key.result()
+
+    assert executed == [sql]
+    assert service.cache.collect_speculative(key) is True
@@ -0,0 +1,57 @@
+import json
+from dataclasses import replace
+
+import duckdb
+import pytest
+
+from app.services import db as db_module
+from app.services import tools as tools_module
+from app.services.db import DuckDBService, QueryTimeout
+from app.services.tools import QueryTooExpensive, govern_sql
+
+CROSS_JOIN = "SELECT a.ticker, b.ticker AS other FROM stock_prices a, stock_prices b"
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE stock_prices AS SELECT 'T' || (range % 50) AS ticker, range::DOUBLE AS close FROM range(20000)")
+    conn.close()
+    monkeypatch.setattr(
+        db_module, "settings",
+        replace(db_module.settings, duckdb_threads=2, duckdb_memory_limit="512MB", duckdb_query_timeout_s=0.3),
+    )
+    service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+    monkeypatch.setattr(tools_module, "db_service", service)
+    monkeypatch.setattr(tools_module, "settings", replace(tools_module.settings, query_max_estimated_rows=1_000_000))
+    return service
+
+
+def test_connections_use_the_engine_limits(service):
+    row = service.query("SELECT current_setting('threads') AS threads, current_setting('memory_limit') AS memory")[0]
+    assert row["threads"] == 2 and row["memory"].startswith("488")
+
+
+def test_cost_precheck_rejects_blowups_and_bounds_large_outputs(service):
+    output_rows, peak_rows = service.estimate_rows(CROSS_JOIN)
+    assert peak_rows >= 20000 * 20000
+    with pytest.raises(QueryTooExpensive, match="intermediate rows"):
+        govern_sql(CROSS_JOIN)
+    assert "error" in json.loads(tools_module.run_query.invoke({"sql": CROSS_JOIN}))
+
+    assert govern_sql("SELECT * FROM stock_prices") == "SELECT * FROM (SELECT * FROM stock_prices) AS bounded LIMIT 200"
+    ordered = "SELECT * FROM stock_prices ORDER BY close"
+    assert service.estimate_rows(ordered)[0] == 20000
+    assert govern_sql(ordered) == f"SELECT * FROM ({ordered}) AS bounded LIMIT 200"
+    closes = [row["close"] for row in json.loads(tools_module.run_query.invoke({"sql": ordered}))]
+    assert closes == [float(c) for c in range(200)]
+    assert govern_sql("SELECT * FROM stock_prices LIMIT 5") == "SELECT * FROM stock_prices LIMIT 5"
+    assert govern_sql("SELECT ticker, avg(close) FROM stock_prices GROUP BY ticker").startswith("SELECT ticker")
+    assert len(json.loads(tools_module.run_query.invoke({"sql": "SELECT * FROM stock_prices"}))) == 200
+
+
+def test_long_statements_are_interrupted_and_the_cursor_reused(service):
+    with pytest.raises(QueryTimeout, match="0.3 s"):
+        service.query("SELECT sum(a.range * b.range) AS s FROM range(200000) a, range(200000) b")
+    assert service.query("SELECT 42 AS answer") == [{"answer": 42}]
@@ -0,0 +1,103 @@
+import json
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes as routes_module
+from app.main import app
+from app.services import results as results_module
+from app.services import tools as tools_module
+from app.services.db import DuckDBService
+from app.services.results import ResultStore
+
+# Every (ticker, close) row appears about six times, and some closes are NULL
+SQL = (
+    "SELECT ticker, close, TIMESTAMP '2024-01-02 09:30:00.123456' + to_seconds(close::BIGINT) AS ts "
+    "FROM stock_prices"
+)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute(
+        "CREATE TABLE stock_prices AS SELECT 'T' || (range % 2) AS ticker, "
+        "CASE WHEN range % 50 = 0 THEN NULL ELSE (range % 40)::DOUBLE END AS close FROM range(500)"
+    )
+    conn.close()
+    service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    monkeypatch.setattr(tools_module, "db_service", service)
+    monkeypatch.setattr(results_module, "db_service", service)
+    monkeypatch.setattr(tools_module, "result_store", store)
+    monkeypatch.setattr(routes_module, "result_store", store)
+    client = TestClient(app)
+    client.service = service
+    return client
+
+
+def _open(sql):
+    return json.loads(tools_module.open_table.invoke({"sql": sql}))
+
+
+def _all_pages(client, handle, limit=13, **params):
+    rows, cursor, pages = [], None, 0
+    while pages < 100:
+        query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+        response = client.get(f"/api/results/{handle}", params=query)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["rows"]) <= limit
+        rows.extend(page["rows"])
+        pages += 1
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+    return rows, pages
+
+
+def _key(row):
+    return (row["ticker"], row["close"], row["ts"])
+
+
+def test_open_table_registers_a_handle_without_loading_rows(client):
+    opened = _open(SQL)
+    assert opened["columns"] == ["ticker", "close", "ts"]
+    assert opened["rowCount"] == 500 and len(opened["preview"]) == 5
+    assert _open(SQL + ";")["handle"] == opened["handle"]
+    assert "error" in _open("DELETE FROM stock_prices")
+
+    first = client.get(f"/api/results/{opened['handle']}").json()
+    assert first["rowCount"] == 500
+    assert [c["name"] for c in first["columns"]] == ["ticker", "close", "ts"]
+    assert first["columns"][2]["type"] == "TIMESTAMP"
+
+
+@pytest.mark.parametrize("params", [{}, {"sort": "close"}, {"sort": "close", "dir": "desc"}, {"sort": "ts"}])
+def test_keyset_pages_cover_every_row_once_across_duplicates_and_nulls(client, params):
+    handle = _open(SQL)["handle"]
+    rows, pages = _all_pages(client, handle, **params)
+    assert pages == 39
+
+    assert sorted(map(_key, rows), key=repr) == sorted(map(_key, client.service.query(SQL)), key=repr)
+
+    sort = params.get("sort")
+    if sort:
+        values = [row[sort] for row in rows]
+        present = [v for v in values if v is not None]
+        assert present == sorted(present, reverse=params.get("dir") == "desc")
+        assert values[len(present):] == [None] * (len(values) - len(present))
+
+
+def test_bad_requests_are_rejected(client):
+    handle = _open(SQL)["handle"]
+    assert client.get("/api/results/nope").status_code == 404
+    assert client.get(f"/api/results/{handle}", params={"sort": "volume"}).status_code == 400
+    assert client.get(f"/api/results/{handle}", params={"dir": "sideways"}).status_code == 422
+    assert client.get(f"/api/results/{handle}", params={"cursor": "%%%"}).status_code == 400
+
+    cursor = client.get(f"/api/results/{handle}", params={"sort": "close", "limit": 5}).json()["nextCursor"]
+    response = client.get(f"/api/results/{handle}", params={"sort": "ts", "cursor": cursor})
+    assert response.status_code == 400 and "sort order" in response.json()["detail"]
@@ -0,0 +1,93 @@
+import json
+
+import duckdb
+import pytest
+
+from app.services import tools as tools_module
+from app.services.db import DuckDBService
+
+NEWS = [
+    ("TSLA", "2024-05-01", "Tesla recalls Cybertruck over pedal issue", "Reuters", -0.6),
+    ("TSLA", "2024-05-03", "Tesla deliveries beat estimates", "Bloomberg", 0.5),
+    ("TSLA", "2024-06-10", "Recall expanded: Tesla recalls more Cybertruck units", "Reuters", -0.4),
+    ("AAPL", "2024-05-02", "Apple recall of chargers in Europe", "Reuters", -0.1),
+    ("AAPL", "2024-05-04", "Apple earnings beat", "CNBC", 0.7),
+]
+
+
+@pytest.fixture
+def news_db(tmp_path, monkeypatch, sync_script):
+    def build(with_index, with_impacts=False, extra_news=()):
+        path = str(tmp_path / "finance.db")
+        conn = duckdb.connect(path)
+        sync_script.setup_db(conn)
+        for ticker, date, title, source, sentiment in [*NEWS, *extra_news]:
+            conn.execute(
+                "INSERT INTO news VALUES (?, ?, ?, 'a', ?, 'http://x', ?)",
+                (ticker, date, title, source, sentiment),
+            )
+        if with_index or with_impacts:
+            sync_script.build_news_search(conn)
+        if with_impacts:
+            sync_script.build_event_impacts(conn)
+        conn.close()
+        service = DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none"))
+        monkeypatch.setattr(tools_module, "db_service", service)
+        return service
+
+    return build
+
+
+def _search(**kwargs):
+    return json.loads(tools_module.search_news.invoke(kwargs))
+
+
+def test_search_news_returns_ranked_timeline_events(news_db):
+    news_db(with_index=True)
+    if not tools_module._has_news_index():
+        pytest.skip("DuckDB fts extension not available")
+
+    events = _search(query="cybertruck recall", ticker="tsla", k=5)
+
+    assert [e["date"] for e in events] == ["2024-06-10", "2024-05-01"]
+    assert set(events[0]) == {
+        "date", "ticker", "entry_type", "title", "summary",
+        "sentiment_score", "price_impact_pct",
+    }
+    assert events[0]["entry_type"] == "news"
+    assert all(e["ticker"] == "TSLA" for e in events)
+
+
+def test_search_news_respects_date_range_and_k(news_db):
+    news_db(with_index=True)
+    events = _search(query="recall", date_range=["2024-05-02", "2024-06-01"], k=1)
+    assert len(events) == 1
+    assert events[0]["date"] == "2024-05-02"
+
+
+@pytest.mark.parametrize(
+    "date_range", ["2024-05-02..2024-06-01", "2024-05-02,2024-06-01", ["2024-05-02", "2024-06-01"]]
+)
+def test_search_news_accepts_date_range_strings(news_db, date_range):
+    news_db(with_index=False)
+    events = _search(query="recall", date_range=date_range)
+    assert [e["date"] for e in events] == ["2024-05-02"]
+
+
+def test_search_news_reports_malformed_date_range(news_db):
+    news_db(with_index=False)
+    assert "error" in _search(query="recall", date_range="2024-05-01,2024-05-02,2024-05-03")
+
+
+def test_search_news_falls_back_without_index(news_db):
+    news_db(with_index=False)
+    assert not tools_module._has_news_index()
+    events = _search(query="earnings", ticker="AAPL")
+    assert [e["title"] for e in events] == ["Apple earnings beat"]
+
+
+def test_search_news_joins_impacts_without_fan_out(news_db):
+    # The same article ingested twice stays two events, not four
+    news_db(with_index=True, with_impacts=True, extra_news=[NEWS[-1]])
+    events = _search(query="earnings", ticker="AAPL")
+    assert [e["title"] for e in events] == ["Apple earnings beat"] * 2
@@ -0,0 +1,105 @@
+import asyncio
+import json
+from dataclasses import replace
+
+from langchain_core.messages import AIMessage
+
+from app.services import agent as agent_module
+from app.services import dashboards as dashboards_module
+from app.services import sessions as sessions_module
+from app.services.sessions import SessionStore
+
+AAPL = [{"ticker": "AAPL", "date": "2024-01-02", "close": 185.6}]
+MSFT = [{"ticker": "MSFT", "date": "2024-01-02", "close": 370.9}]
+
+
+class TurnGraph:
+    """One tool call and a final spec, recording the messages it was started with."""
+
+    def __init__(self, tool_args, rows, spec):
+        self.tool_args = tool_args
+        self.rows = rows
+        self.spec = spec
+        self.inputs = None
+
+    async def astream_events(self, inputs, version):
+        self.inputs = inputs
+        yield {"event": "on_tool_start", "name": "get_prices", "run_id": "t", "data": {"input": self.tool_args}}
+        yield {"event": "on_tool_end", "name": "get_prices", "run_id": "t", "data": {"output": json.dumps(self.rows)}}
+        reply = {"intent": "prices", "assistantMessage": "Here you go.", "dashboardSpec": self.spec}
+        yield {"event": "on_chat_model_end", "run_id": "m", "data": {"output": AIMessage(content=json.dumps(reply))}}
+
+
+def _chart(*placeholders):
+    return {"blocks": [{"type": "line-chart", "props": {"data": p}} for p in placeholders]}
+
+
+def _turn(monkeypatch, session, graph, message):
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: graph)
+    return asyncio.run(agent_module.agent_service.process_query(message, session=session))
+
+
+def test_follow_up_reuses_earlier_results_and_extends_the_spec(monkeypatch):
+    session = SessionStore().open("conversation-1")
+    first = _turn(monkeypatch, session, TurnGraph({"tickers": ["AAPL"]}, AAPL, _chart("QUERY_RESULT_0")), "AAPL chart")
+    assert first["sessionId"] == session.id
+
+    graph = TurnGraph({"tickers": ["MSFT"]}, MSFT, _chart("QUERY_RESULT_0", "QUERY_RESULT_1"))
+    second = _turn(monkeypatch, session, graph, "now add MSFT to that chart")
+
+    messages = graph.inputs["messages"]
+    assert [m.type for m in messages] == ["system", "human", "ai", "human"]
+    assert [m.content for m in messages[1:]] == ["AAPL chart", "Here you go.", "now add MSFT to that chart"]
+    assert 'QUERY_RESULT_0: get_prices {"tickers": ["AAPL"]} (1 rows' in messages[0].content
+    assert '"data": "QUERY_RESULT_0"' in messages[0].content
+    assert "numbered from QUERY_RESULT_1" in messages[0].content
+
+    assert second["toolResults"] == [AAPL, MSFT]
+    assert [s["args"] for s in second["toolSources"]] == [{"tickers": ["AAPL"]}, {"tickers": ["MSFT"]}]
+    assert session.spec == _chart("QUERY_RESULT_0", "QUERY_RESULT_1")
+
+
+def test_rows_over_the_cap_are_dropped_and_reloaded_from_their_source(monkeypatch):
+    monkeypatch.setattr(sessions_module, "settings", replace(sessions_module.settings, session_max_bytes=80))
+    session = SessionStore().open()
+    sources = [{"tool": "get_prices", "args": {"tickers": [t]}} for t in ("AAPL", "MSFT")]
+    session.record("AAPL", {"assistantMessage": "ok"}, [AAPL, MSFT], sources, "v1")
+    assert [r.rows for r in session.results] == [None, MSFT]
+
+    reloaded = []
+
+    def fake_run_source(source):
+        reloaded.append(source["args"])
+        return AAPL
+
+    monkeypatch.setattr(dashboards_module, "_run_source", fake_run_source)
+    rows, _ = asyncio.run(session.load_results("v1"))
+    assert rows == [AAPL, MSFT] and reloaded == [{"tickers": ["AAPL"]}]
+
+
+def test_store_evicts_least_recently_used_and_idle_sessions(monkeypatch):
+    store = SessionStore(max_sessions=2, ttl_s=60)
+    a = store.open("session-a")
+    b = store.open("client-chosen-id")
+    assert b.id == "client-chosen-id"
+    assert store.open(a.id) is a
+    store.open("session-c")
+    assert store.open("client-chosen-id") is not b
+
+    idle = SessionStore(max_sessions=10, ttl_s=0)
+    session = idle.open("session-idle")
+    session.updated_at -= 1
+    assert idle.open(session.id) is not session
+
+
+def test_requests_without_a_session_id_are_not_stored(monkeypatch):
+    store = SessionStore(max_sessions=2, ttl_s=60)
+    kept = store.open("conversation-1")
+    for session_id in (None, None, None, "bad id!"):
+        session = store.open(session_id)
+        assert not session.stored and session.id != session_id
+    assert len(store) == 1 and store.open("conversation-1") is kept
+
+    graph = TurnGraph({"tickers": ["AAPL"]}, AAPL, _chart("QUERY_RESULT_0"))
+    result = _turn(monkeypatch, store.open(), graph, "AAPL chart")
+    assert "sessionId" not in result and len(store) == 1
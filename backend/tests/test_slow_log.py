@@ -0,0 +1,82 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from app.services import db as db_module
+from app.services.db import DuckDBService
+from app.services.slow_log import SlowQueryLog, query_shape
+
+REPORT_SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "slow_query_report.py"
+
+
+@pytest.fixture
+def report_script():
+    spec = importlib.util.spec_from_file_location("slow_query_report", REPORT_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    # Tickers and dates interleaved, so no filter can skip row groups
+    conn.execute(
+        "CREATE TABLE stock_prices AS SELECT 'T' || (range % 100) AS ticker, "
+        "(DATE '2020-01-01' + ((range * 7919) % 2000)::INTEGER)::TIMESTAMP AS date, "
+        "range::DOUBLE AS close FROM range(200000)"
+    )
+    conn.close()
+    log = SlowQueryLog(str(tmp_path / "slow.jsonl"), threshold_ms=0.001, summary_s=3600)
+    monkeypatch.setattr(db_module, "slow_query_log", log)
+    return DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none")), log
+
+
+def test_query_shape_drops_literals():
+    sql = "SELECT t1.close FROM stock_prices t1\n WHERE ticker IN ('AAPL', 'O''NEIL') AND close > 10.5 LIMIT 5;"
+    assert query_shape(sql) == "SELECT t1.close FROM stock_prices t1 WHERE ticker IN (?, ...) AND close > ? LIMIT ?"
+    assert query_shape("EXECUTE get_prices(['AAPL'], 3)") == "EXECUTE get_prices([?], ?)"
+    assert query_shape("WHERE list_contains($1::VARCHAR[], ticker)") == "WHERE list_contains($1::VARCHAR[], ticker)"
+
+
+def test_slow_queries_are_logged_with_profiles_and_counted_per_shape(service):
+    db, log = service
+    db.query("SELECT close FROM stock_prices WHERE ticker = 'T1' AND date = '2021-01-01'")
+    db.query("SELECT close FROM stock_prices WHERE ticker = 'T2' AND date = '2021-02-01'")
+    log.close()
+
+    entries = [json.loads(line) for line in Path(log.path).read_text().splitlines()]
+    slow = [e for e in entries if e["kind"] == "slow"]
+    assert [e["calls"] for e in slow] == [1, 2]
+    assert slow[0]["shape"] == slow[1]["shape"] == "SELECT close FROM stock_prices WHERE ticker = ? AND date = ?"
+    scan = next(op for op in slow[0]["profile"]["operators"] if "SCAN" in op["name"])
+    assert scan["rowsScanned"] == 200000 and "ticker" in scan["filters"]
+    assert entries[-1]["kind"] == "shapes" and entries[-1]["shapes"][0]["calls"] == 2
+
+
+def test_report_ranks_shapes_and_suggests_precomputation(service, report_script):
+    db, log = service
+    for ticker in ("T1", "T2", "T3"):
+        db.query(f"SELECT date, close FROM stock_prices WHERE ticker = '{ticker}' AND date = '2021-01-01'")
+    db.query(
+        "SELECT ticker, date_trunc('month', date) AS month, avg(close) AS close "
+        "FROM stock_prices GROUP BY ALL"
+    )
+    db.query("SELECT date, close / lag(close) OVER (ORDER BY date) - 1 AS r FROM stock_prices WHERE ticker = 'T4'")
+    log.close()
+
+    reports = report_script.aggregate(report_script.read_entries(report_script.log_files(log.path)))
+    by_shape = {r["shape"]: r for r in reports}
+    lookup = by_shape["SELECT date, close FROM stock_prices WHERE ticker = ? AND date = ?"]
+    assert lookup["calls"] == 3 and lookup["slow"] == 3
+    assert any(s.startswith("index:") and "(ticker, date)" in s for s in lookup["suggestions"])
+    monthly = next(r for shape, r in by_shape.items() if "date_trunc" in shape)
+    assert any("stock_prices_month" in s for s in monthly["suggestions"])
+    returns = next(r for shape, r in by_shape.items() if "lag(" in shape)
+    assert any(s.startswith("sort order:") for s in returns["suggestions"])
+    assert any(s.startswith("returns:") for s in returns["suggestions"])
+    assert reports == sorted(reports, key=lambda r: r["totalMs"], reverse=True)
@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+
+import duckdb
+
+from app.services.db import DuckDBService, POINTER_FILE
+
+
+def _build(snapshot_dir, name, close):
+    conn = duckdb.connect(os.path.join(snapshot_dir, name))
+    conn.execute("CREATE TABLE stock_prices (ticker VARCHAR, close DOUBLE)")
+    conn.execute("INSERT INTO stock_prices VALUES ('AAPL', ?)", [close])
+    conn.close()
+
+
+def _publish(snapshot_dir, name):
+    tmp = os.path.join(snapshot_dir, POINTER_FILE + ".tmp")
+    with open(tmp, "w") as fh:
+        fh.write(name)
+    os.replace(tmp, os.path.join(snapshot_dir, POINTER_FILE))
+
+
+def test_serves_legacy_file_without_pointer(tmp_path):
+    service = DuckDBService(
+        db_path=str(tmp_path / "finance.db"),
+        snapshot_dir=str(tmp_path / "snapshots"),
+        poll_interval_s=0,
+    )
+    service.execute("CREATE TABLE t (v INTEGER)")
+    service.execute("INSERT INTO t VALUES (1)")
+    assert service.version.startswith("legacy-")
+    assert service.query("SELECT v FROM t") == [{"v": 1}]
+    service.close()
+
+
+def test_legacy_version_follows_rewrites_by_other_processes(tmp_path):
+    db_path = str(tmp_path / "finance.db")
+    service = DuckDBService(db_path=db_path, snapshot_dir=str(tmp_path / "snapshots"), poll_interval_s=0)
+    service.execute("CREATE TABLE t (v INTEGER)")
+    service.execute("INSERT INTO t VALUES (1)")
+    sql = "SELECT sum(v) AS total FROM t"
+    assert service.query(sql) == [{"total": 1}]
+    before = service.version
+    assert service.version == before
+
+    # e.g. the sync job writing the file in place
+    conn = duckdb.connect(db_path)
+    conn.execute("INSERT INTO t SELECT range FROM range(2, 1000)")
+    conn.close()
+
+    assert service.version != before
+    assert service.query(sql) == [{"total": sum(range(1, 1000))}]
+    service.close()
+
+
+def test_legacy_file_is_not_locked_between_queries(tmp_path):
+    db_path = str(tmp_path / "finance.db")
+    service = DuckDBService(db_path=db_path, snapshot_dir=str(tmp_path / "snapshots"), poll_interval_s=0)
+    service.execute("CREATE TABLE t (v INTEGER)")
+    assert service.query("SELECT count(*) AS n FROM t") == [{"n": 0}]
+
+    # Another worker process can open the same file while this service is idle
+    other = subprocess.run(
+        [sys.executable, "-c", f"import duckdb; duckdb.connect({db_path!r}).execute('SELECT * FROM t')"],
+        capture_output=True,
+        text=True,
+    )
+    assert other.returncode == 0, other.stderr
+    service.close()
+
+
+def test_hot_swap_keeps_in_flight_queries_on_old_snapshot(tmp_path):
+    snapshot_dir = str(tmp_path)
+    _build(snapshot_dir, "finance-v1.db", 100.0)
+    _publish(snapshot_dir, "finance-v1.db")
+    service = DuckDBService(db_path="unused.db", snapshot_dir=snapshot_dir, poll_interval_s=0)
+
+    sql = "SELECT close FROM stock_prices"
+    assert service.query(sql) == [{"close": 100.0}]
+    assert service.version == "v1"
+
+    with service.connection() as (version, conn):
+        _build(snapshot_dir, "finance-v2.db", 200.0)
+        _publish(snapshot_dir, "finance-v2.db")
+
+        # New queries switch immediately and do not see the v1 cache entry
+        assert service.query(sql) == [{"close": 200.0}]
+        assert service.version == "v2"
+        # The borrowed cursor still reads the snapshot it was pinned to
+        assert version == "v1"
+        assert conn.execute(sql).fetchall() == [(100.0,)]
+
+    assert all(key[0] == "v2" for key in service.cache._entries)
+    service.close()
+
+
+def test_query_results_are_cached_per_version(tmp_path):
+    snapshot_dir = str(tmp_path)
+    _build(snapshot_dir, "finance-v1.db", 1.0)
+    _publish(snapshot_dir, "finance-v1.db")
+    service = DuckDBService(db_path="unused.db", snapshot_dir=snapshot_dir, poll_interval_s=60)
+
+    first = service.query("SELECT close FROM stock_prices")
+    first.append({"close": -1})
+    assert service.query("SELECT close FROM stock_prices") == [{"close": 1.0}]
+    assert len(service.cache) == 1
+    service.close()
+
+
+def test_parquet_snapshot_exposes_partitioned_views(tmp_path):
+    snapshot_dir = str(tmp_path)
+    root = tmp_path / "finance-p1"
+    root.mkdir()
+    conn = duckdb.connect()
+    conn.execute(
+        "CREATE TABLE stock_prices AS SELECT t.ticker, "
+        "(DATE '2023-12-30' + INTERVAL (i) DAY)::TIMESTAMP AS date, "
+        "1.0 AS open, 2.0 AS high, 0.5 AS low, i::DOUBLE AS close, 10::BIGINT AS volume "
+        "FROM range(4) r(i), (VALUES ('AAPL'), ('MSFT')) t(ticker)"
+    )
+    conn.execute(
+        f"COPY (SELECT *, year(date) AS year FROM stock_prices ORDER BY ticker, date) "
+        f"TO '{root / 'stock_prices'}' (FORMAT parquet, PARTITION_BY (year))"
+    )
+    conn.close()
+    _publish(snapshot_dir, "finance-p1")
+
+    service = DuckDBService(db_path="unused.db", snapshot_dir=snapshot_dir, poll_interval_s=0)
+    rows = service.query(
+        "SELECT * FROM stock_prices WHERE ticker = 'MSFT' AND date >= '2024-01-01' ORDER BY date"
+    )
+    assert service.version == "p1"
+    assert [row["close"] for row in rows] == [2.0, 3.0]
+    assert list(rows[0]) == ["ticker", "date", "open", "high", "low", "close", "volume"]
+    service.close()
+
+
+def test_parquet_export_keeps_empty_tables_queryable(sync_script, tmp_path):
+    root = tmp_path / "finance-p2"
+    root.mkdir()
+    conn = duckdb.connect()
+    sync_script.setup_db(conn)
+    conn.execute("INSERT INTO stock_prices VALUES ('AAPL', '2024-01-02', 1, 1, 1, 1, 1)")
+    sync_script.export_parquet(conn, str(root))
+    conn.close()
+    _publish(str(tmp_path), "finance-p2")
+
+    service = DuckDBService(db_path="unused.db", snapshot_dir=str(tmp_path), poll_interval_s=0)
+    assert service.query("SELECT count(*) AS n FROM financial_metrics") == [{"n": 0}]
+    with service.connection() as (_, cursor):
+        described = cursor.execute("DESCRIBE financial_metrics").fetchall()
+    assert [row[:2] for row in described[:2]] == [("ticker", "VARCHAR"), ("report_period", "DATE")]
+    assert len(service.query("SELECT * FROM stock_prices")) == 1
+    service.close()
@@ -0,0 +1,79 @@
+import json
+
+import duckdb
+import pytest
+
+from app.services import statements as statements_module
+from app.services import tools as tools_module
+from app.services.db import POINTER_FILE, DuckDBService
+from app.services.statements import PRICE_WINDOW, tickers_literal
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, sync_script):
+    # A published (read-only, pooled) snapshot, as in production
+    conn = duckdb.connect(str(tmp_path / "finance-v1.db"))
+    sync_script.setup_db(conn)
+    conn.execute(
+        "INSERT INTO stock_prices SELECT t, TIMESTAMP '2024-01-01' + INTERVAL (i) DAY, i, i + 1, i - 1, i, 10"
+        " FROM (VALUES ('AAPL'), ('MSFT')) v(t), range(14) r(i)"
+    )
+    conn.execute(
+        "INSERT INTO financial_metrics (ticker, report_period, pe_ratio) VALUES "
+        "('AAPL', '2023-09-30', 25), ('AAPL', '2023-12-31', 30), ('MSFT', '2023-12-31', 35)"
+    )
+    conn.execute(
+        "INSERT INTO news VALUES ('AAPL', '2024-01-03', 'Apple up', 'a', 'Reuters', 'u1', 0.5),"
+        " ('AAPL', '2024-01-09', 'Apple down', 'a', 'CNBC', 'u2', -0.5)"
+    )
+    conn.close()
+    (tmp_path / POINTER_FILE).write_text("finance-v1.db")
+    service = DuckDBService(db_path="unused.db", snapshot_dir=str(tmp_path), poll_interval_s=60)
+    monkeypatch.setattr(statements_module, "db_service", service)
+    yield service
+    service.close()
+
+
+def _invoke(tool, **kwargs):
+    return json.loads(tool.invoke(kwargs))
+
+
+def test_get_prices_aggregates_bars_per_interval(service):
+    daily = _invoke(tools_module.get_prices, tickers=["aapl"], start="2024-01-02", end="2024-01-03")
+    assert [(r["ticker"], r["close"]) for r in daily] == [("AAPL", 1.0), ("AAPL", 2.0)]
+
+    # 2024-01-01 is a Monday: two full weeks per ticker
+    weekly = _invoke(tools_module.get_prices, tickers="AAPL,MSFT", interval="1w")
+    assert [(r["ticker"], r["open"], r["high"], r["low"], r["close"], r["volume"]) for r in weekly] == [
+        ("AAPL", 0.0, 7.0, -1.0, 6.0, 70),
+        ("AAPL", 7.0, 14.0, 6.0, 13.0, 70),
+        ("MSFT", 0.0, 7.0, -1.0, 6.0, 70),
+        ("MSFT", 7.0, 14.0, 6.0, 13.0, 70),
+    ]
+
+
+def test_metrics_and_news_tools(service):
+    metrics = _invoke(tools_module.get_metrics, tickers=["AAPL", "MSFT"])
+    assert [(r["ticker"], r["pe_ratio"]) for r in metrics] == [("AAPL", 30.0), ("MSFT", 35.0)]
+    assert len(_invoke(tools_module.get_metrics, tickers=["AAPL"], periods=5)) == 2
+
+    news = _invoke(tools_module.get_news, tickers=["AAPL"], start="2024-01-05")
+    assert [r["title"] for r in news] == ["Apple down"]
+
+
+def test_statement_is_prepared_once_per_cursor(service):
+    for end in ("2024-01-05", "2024-01-06", "2024-01-07"):
+        PRICE_WINDOW.run(tickers=["AAPL"], end=end, interval="1d")
+    with service.connection() as (_, cursor):
+        prepared = cursor.execute("SELECT name FROM duckdb_prepared_statements()").fetchall()
+    assert prepared == [("ff_price_window",)]
+    assert len(service.cache) == 3
+
+
+def test_arguments_are_validated_before_reaching_sql(service):
+    assert tickers_literal("aapl, msft") == "['AAPL', 'MSFT']"
+    for bad in ("AAPL'; DROP TABLE x; --", "", "a b"):
+        with pytest.raises(ValueError):
+            tickers_literal([bad])
+    assert "Invalid date" in _invoke(tools_module.get_prices, tickers=["AAPL"], start="01/02/2024")["error"]
+    assert "Invalid interval" in _invoke(tools_module.get_prices, tickers=["AAPL"], interval="5m")["error"]
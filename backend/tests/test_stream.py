@@ -33,6 +33,8 @@ def test_placeholder_regex():
     from app.utils.json_tools import PLACEHOLDER_RE
     assert PLACEHOLDER_RE.match("QUERY_RESULT_0")
     assert PLACEHOLDER_RE.match("QUERY_RESULT_10")
+    assert PLACEHOLDER_RE.match("QUERY_RESULT_2[3]").groups() == ("2", "3")
+    assert not PLACEHOLDER_RE.match("QUERY_RESULT_2[]")
     assert not PLACEHOLDER_RE.match("QUERY_RESULT")
     assert not PLACEHOLDER_RE.match("RESULT_0")
 
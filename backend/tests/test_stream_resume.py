@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes as routes_module
+from app.main import app
+from app.services import agent as agent_module
+from app.services.stream_buffer import (
+    MemoryStreamStore,
+    SqliteStreamStore,
+    StreamHub,
+    parse_event_id,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteStreamStore(str(tmp_path / "streams.sqlite"), ttl_s=60, max_run_bytes=100, max_runs=2)
+    return MemoryStreamStore(ttl_s=60, max_run_bytes=100, max_runs=2)
+
+
+def test_store_replays_after_an_id_within_its_bounds(store):
+    store.open("r1")
+    for seq in range(1, 6):
+        store.append("r1", seq, b"x" * 30)
+    store.finish("r1")
+    # Only the newest frames that fit in 100 bytes are kept
+    assert store.read("r1", 0) == ([(3, b"x" * 30), (4, b"x" * 30), (5, b"x" * 30)], True)
+    assert store.read("r1", 4) == ([(5, b"x" * 30)], True)
+
+    store.open("r2")
+    store.open("r3")
+    assert store.read("r1", 0) is None
+    assert store.read("r3", 0) == ([], False)
+    assert store.read("missing", 0) is None
+
+
+def test_follower_attaches_to_a_running_run(store):
+    store.max_run_bytes = 1 << 20
+    hub = StreamHub(store, poll_s=0.05)
+
+    async def run():
+        await hub.open("r")
+        await hub.publish("r", 1, b"a")
+        await hub.publish("r", 2, b"b")
+        follower = asyncio.ensure_future(_collect(hub.follow("r", after=1)))
+        await asyncio.sleep(0.1)
+        await hub.publish("r", 3, b"c")
+        await hub.close("r")
+        return await follower
+
+    assert asyncio.run(run()) == [b"b", b"c"]
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def _frames(text):
+    return [dict(line.split(": ", 1) for line in frame.split("\n")) for frame in text.split("\n\n") if frame]
+
+
+def test_reconnect_with_last_event_id_replays_without_rerunning(monkeypatch):
+    runs = []
+
+    async def fake_stream(message, current_chaos=None, budget_s=None, is_disconnected=None, session=None):
+        runs.append(message)
+        yield {"event": "step", "data": {"step": 1}}
+        yield {"event": "step", "data": {"step": 2}}
+        yield {"event": "result", "data": {"intent": "test", "assistantMessage": "", "dashboardSpec": {"blocks": []}}}
+
+    monkeypatch.setattr(agent_module.agent_service, "process_query_stream", fake_stream)
+    client = TestClient(app)
+    first = _frames(client.post("/api/query/stream", json={"message": "hi"}).text)
+    assert [f["event"] for f in first] == ["step", "step", "result", "done"]
+    run_id, seq = parse_event_id(first[0]["id"])
+    assert [parse_event_id(f["id"]) for f in first] == [(run_id, n) for n in range(1, 5)]
+
+    resumed = client.post("/api/query/stream", json={"message": "hi"}, headers={"Last-Event-ID": first[1]["id"]})
+    assert _frames(resumed.text) == first[2:]
+    assert runs == ["hi"]
+
+    # Unknown or expired runs start over
+    client.post("/api/query/stream", json={"message": "hi"}, headers={"Last-Event-ID": "gone:3"})
+    assert runs == ["hi", "hi"]
+    assert routes_module._stream_runs == set()
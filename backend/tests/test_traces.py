@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import duckdb
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from fastapi.testclient import TestClient
+from langgraph.prebuilt import create_react_agent
+
+from app.main import app
+from app.services import agent as agent_module
+from app.services import tools as tools_module
+from app.services.db import DuckDBService
+from app.services.planner import build_plan_graph
+from app.services.traces import Slots, TraceStats, similarity
+
+UNIVERSE = ["AAPL", "MSFT", "NVDA", "TSLA"]
+SQL = "SELECT ticker, close FROM stock_prices WHERE ticker = '{}' LIMIT 30"
+SPEC = {"blocks": [{"type": "line-chart", "props": {"title": "AAPL last 30", "data": "QUERY_RESULT_0"}}]}
+
+
+class ScriptedModel(BaseChatModel):
+    replies: list
+    prompts: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append([m.content for m in messages])
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    path = str(tmp_path / "finance.db")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE stock_prices (ticker VARCHAR, close DOUBLE)")
+    conn.execute("INSERT INTO stock_prices VALUES ('AAPL', 1.0), ('NVDA', 3.0)")
+    conn.close()
+    monkeypatch.setattr(tools_module, "db_service", DuckDBService(db_path=path, snapshot_dir=str(tmp_path / "none")))
+    monkeypatch.setattr(agent_module, "known_tickers", lambda: UNIVERSE)
+    return tools_module.get_all_tools()
+
+
+def test_slots_abstract_and_fill_questions_and_calls():
+    slots = Slots.of("Show Apple closes for the last 30 days", UNIVERSE)
+    assert slots.template("Show Apple closes for the last 30 days") == "show {T0} closes for the last {N0} days"
+    calls = slots.parametrize([{"tool": "get_prices", "args": {"tickers": ["AAPL"], "limit": 30, "sql": SQL.format("AAPL")}}])
+    assert calls[0]["args"] == {"tickers": ["{T0}"], "limit": "{N0}", "sql": SQL.format("{T0}").replace("30", "{N0}")}
+
+    other = Slots.of("Show NVDA closes for the last 90 days", UNIVERSE)
+    assert other.fill(calls)[0]["args"] == {"tickers": ["NVDA"], "limit": 90, "sql": SQL.format("NVDA").replace("30", "90")}
+    assert similarity(slots.template("Show Apple closes for the last 30 days"), other.template("Show NVDA closes for the last 90 days")) == 1.0
+
+
+def test_second_similar_question_is_replayed_with_one_model_call(monkeypatch, tools, trace_store):
+    tool_call = {"name": "run_query", "args": {"sql": SQL.format("AAPL")}, "id": "c1"}
+    final = json.dumps({"intent": "prices", "assistantMessage": "Here.", "dashboardSpec": SPEC})
+    llm = ScriptedModel(
+        replies=[
+            AIMessage(content="", tool_calls=[{"name": "run_query", "args": {"sql": "SELECT nope"}, "id": "c0"}]),
+            AIMessage(content="", tool_calls=[tool_call]),
+            AIMessage(content=final),
+            AIMessage(content=final.replace("AAPL", "NVDA")),
+        ],
+        prompts=[],
+    )
+    react = create_react_agent(llm, tools)
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: react)
+    monkeypatch.setattr(agent_module, "_get_replay_graph", lambda: build_plan_graph(llm, tools, react))
+
+    first = asyncio.run(agent_module.agent_service.process_query("AAPL closing prices"))
+    assert first["memory"] == {"examples": 0, "topScore": None, "replayed": False}
+    assert first["budget"]["steps"] == 3
+
+    stats = TraceStats()
+    monkeypatch.setattr(agent_module, "trace_stats", stats)
+    second = asyncio.run(agent_module.agent_service.process_query("NVDA closing prices"))
+    assert second["memory"] == {"examples": 1, "topScore": 1.0, "replayed": True}
+    assert second["toolResults"] == [[{"ticker": "NVDA", "close": 3.0}]]
+    assert second["budget"]["steps"] == 1
+    system_prompt = llm.prompts[-1][0]
+    assert "SIMILAR QUESTIONS ANSWERED BEFORE" in system_prompt and SQL.format("NVDA") in system_prompt
+    assert '"title": "NVDA last 30"' in system_prompt
+    assert stats.snapshot()["replays"] == 1 and stats.snapshot()["turnsSaved"] == 2
+
+
+def test_replay_happens_through_the_query_route(monkeypatch, tools, trace_store):
+    tool_call = {"name": "run_query", "args": {"sql": SQL.format("AAPL")}, "id": "c1"}
+    final = json.dumps({"intent": "prices", "assistantMessage": "Here.", "dashboardSpec": SPEC})
+    llm = ScriptedModel(
+        replies=[
+            AIMessage(content="", tool_calls=[tool_call]),
+            AIMessage(content=final),
+            AIMessage(content=final.replace("AAPL", "NVDA")),
+        ],
+        prompts=[],
+    )
+    react = create_react_agent(llm, tools)
+    monkeypatch.setattr(agent_module, "_get_graph", lambda: react)
+    monkeypatch.setattr(agent_module, "_get_replay_graph", lambda: build_plan_graph(llm, tools, react))
+    monkeypatch.setattr(agent_module, "_get_router_llm", lambda: None)
+    client = TestClient(app)
+
+    first = client.post("/api/query", json={"message": "AAPL closing prices", "sessionId": "conversation-1"})
+    assert first.status_code == 200 and first.json()["sessionId"] == "conversation-1"
+    # A stateless request, and the first turn of a session, may both replay
+    second = client.post("/api/query", json={"message": "NVDA closing prices"}).json()
+    assert second["queryMetadata"]["memory"]["replayed"] is True
+    assert second["sessionId"] is None
+    assert second["dashboardSpec"]["blocks"][0]["props"]["data"] == [{"ticker": "NVDA", "close": 3.0}]
+
+
+def test_loosely_similar_questions_only_get_examples(monkeypatch, tools, trace_store):
+    slots = Slots.of("AAPL closing prices", UNIVERSE)
+    trace_store.record("AAPL closing prices", slots, [{"tool": "run_query", "args": {"sql": SQL.format("AAPL")}}], SPEC, 3)
+    other = Slots.of("AAPL and MSFT closing prices", UNIVERSE)
+    matches = trace_store.nearest("AAPL and MSFT closing prices", other, 3)
+    assert len(matches) == 1 and not matches[0].replayable(other)
+    assert matches[0].example(other)["calls"] == [{"tool": "run_query", "args": {"sql": SQL.format("{T0}")}}]
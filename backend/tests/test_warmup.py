@@ -0,0 +1,83 @@
+import dataclasses
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main as main_module
+from app.main import app
+from app.services import agent as agent_module
+from app.services import warmup as warmup_module
+from app.services.db import DuckDBService
+
+
+def test_ready_is_503_until_warmup_finishes(monkeypatch):
+    monkeypatch.setattr(warmup_module, "warmup_state", warmup_module.WarmupState())
+    monkeypatch.setattr("app.api.routes.warmup_state", warmup_module.warmup_state)
+
+    client = TestClient(app)
+    assert client.get("/health").status_code == 200
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "pending"
+
+
+def _prewarm_enabled(monkeypatch):
+    monkeypatch.setattr(
+        main_module, "settings", dataclasses.replace(main_module.settings, prewarm_on_startup=True)
+    )
+
+
+def test_lifespan_prewarms_graph_and_db(monkeypatch, tmp_path):
+    _prewarm_enabled(monkeypatch)
+    state = warmup_module.WarmupState()
+    service = DuckDBService(db_path=str(tmp_path / "finance.db"), snapshot_dir=str(tmp_path / "s"))
+    service.execute("CREATE TABLE stock_prices (ticker VARCHAR, date TIMESTAMP)")
+    built = []
+    monkeypatch.setattr(warmup_module, "warmup_state", state)
+    monkeypatch.setattr("app.api.routes.warmup_state", state)
+    monkeypatch.setattr(warmup_module, "db_service", service)
+    monkeypatch.setattr("app.services.tools.db_service", service)
+    monkeypatch.setattr(agent_module, "_graph", None)
+    monkeypatch.setattr(agent_module, "_build_graph", lambda: built.append(1) or object())
+
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        body = client.get("/ready").json()
+
+    assert body["status"] == "ready"
+    assert body["dataVersion"].startswith("legacy")
+    assert {"db_open", "query_stock_prices", "agent_graph"} <= set(body["stepsMs"])
+    assert built == [1]
+
+
+def test_failed_warmup_is_retried_until_ready(monkeypatch, tmp_path):
+    _prewarm_enabled(monkeypatch)
+    state = warmup_module.WarmupState()
+    service = DuckDBService(db_path=str(tmp_path / "finance.db"), snapshot_dir=str(tmp_path / "s"))
+    attempts = []
+
+    def flaky_build():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("GEMINI_API_KEY not set")
+        return object()
+
+    monkeypatch.setattr(warmup_module, "warmup_state", state)
+    monkeypatch.setattr("app.api.routes.warmup_state", state)
+    monkeypatch.setattr(warmup_module, "db_service", service)
+    monkeypatch.setattr("app.services.tools.db_service", service)
+    monkeypatch.setattr(warmup_module, "WARMUP_RETRY_BASE_S", 0.01)
+    monkeypatch.setattr(agent_module, "_graph", None)
+    monkeypatch.setattr(agent_module, "_build_graph", flaky_build)
+
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        body = client.get("/ready").json()
+
+    assert body["status"] == "ready"
+    assert body["attempts"] == 3
+    assert body["error"] is None
@@ -8,6 +8,7 @@ import { LineChart } from './line-chart';
 import { CandlestickChart } from './candlestick-chart';
 import { EventTimeline } from './event-timeline';
 import { CorrelationMatrix } from './correlation-matrix';
+import { DataTable } from './data-table';
 
 const FULL_WIDTH_TYPES = new Set([
 	'executive-summary',
@@ -15,6 +16,7 @@ const FULL_WIDTH_TYPES = new Set([
 	'event-timeline',
 	'candlestick-chart',
 	'correlation-matrix',
+	'data-table',
 ]);
 
 interface DashboardRendererProps {
@@ -46,6 +48,8 @@ const renderBlock = (block: Block) => {
 			return <EventTimeline {...(block.props as React.ComponentProps<typeof EventTimeline>)} />;
 		case 'correlation-matrix':
 			return <CorrelationMatrix {...(block.props as React.ComponentProps<typeof CorrelationMatrix>)} />;
+		case 'data-table':
+			return <DataTable {...(block.props as React.ComponentProps<typeof DataTable>)} />;
 		default:
 			return null;
 	}
@@ -0,0 +1,215 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+import { ArrowDownIcon, ArrowUpDownIcon, ArrowUpIcon } from 'lucide-react';
+import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
+import { API_URL } from '@/lib/api';
+import { cn } from '@/lib/utils';
+
+// Rows are fixed-height so the scroll position maps straight to a row index
+const ROW_HEIGHT = 32;
+const VIEWPORT_HEIGHT = 480;
+const PAGE_ROWS = 200;
+const OVERSCAN_ROWS = 20;
+// Pages kept in memory; the farthest from the viewport are dropped and refetched by cursor
+const MAX_CACHED_PAGES = 12;
+const MIN_COLUMN_WIDTH = 140;
+
+type Row = Record<string, unknown>;
+
+interface Column {
+	name: string;
+	type: string;
+}
+
+interface ResultPage {
+	columns: Column[];
+	rows: Row[];
+	nextCursor: string | null;
+	rowCount: number | null;
+}
+
+// Keyset pages can only be reached from the previous page's cursor
+interface PageSlot {
+	cursor: string | null;
+	rows?: Row[];
+	loading?: boolean;
+}
+
+interface Sort {
+	column: string;
+	dir: 'asc' | 'desc';
+}
+
+interface DataTableProps {
+	handle: string;
+	title?: string;
+	columns?: string[];
+}
+
+const formatCell = (value: unknown): string => {
+	if (value === null || value === undefined) return '—';
+	if (typeof value === 'number') return value.toLocaleString(undefined, { maximumFractionDigits: 4 });
+	if (typeof value === 'object') return JSON.stringify(value);
+	return String(value);
+};
+
+const nextSort = (sort: Sort | null, column: string): Sort | null => {
+	if (sort?.column !== column) return { column, dir: 'asc' };
+	return sort.dir === 'asc' ? { column, dir: 'desc' } : null;
+};
+
+export function DataTable({ handle, title, columns }: DataTableProps) {
+	const [sort, setSort] = useState<Sort | null>(null);
+	const [meta, setMeta] = useState<{ columns: Column[]; rowCount: number } | null>(null);
+	const [error, setError] = useState<string | null>(null);
+	const [scrollTop, setScrollTop] = useState(0);
+	const [, setLoaded] = useState(0);
+	const pages = useRef<PageSlot[]>([{ cursor: null }]);
+	const generation = useRef(0);
+	const scroller = useRef<HTMLDivElement>(null);
+
+	const firstRow = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS);
+	const lastRow = Math.floor((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN_ROWS;
+	const firstPage = Math.floor(firstRow / PAGE_ROWS);
+	const lastPage = Math.floor(lastRow / PAGE_ROWS);
+
+	const loadPage = useCallback(
+		async (index: number) => {
+			const slot = pages.current[index];
+			const started = generation.current;
+			slot.loading = true;
+			const params = new URLSearchParams({ limit: String(PAGE_ROWS) });
+			if (sort) {
+				params.set('sort', sort.column);
+				params.set('dir', sort.dir);
+			}
+			if (slot.cursor) params.set('cursor', slot.cursor);
+			try {
+				const response = await fetch(`${API_URL}/api/results/${encodeURIComponent(handle)}?${params}`);
+				if (!response.ok) {
+					const body = await response.json().catch(() => null);
+					throw new Error(body?.detail ?? `Failed to load rows: ${response.status}`);
+				}
+				const page: ResultPage = await response.json();
+				if (started !== generation.current) return;
+				slot.rows = page.rows;
+				if (page.rowCount !== null) setMeta({ columns: page.columns, rowCount: page.rowCount });
+				if (page.nextCursor && !pages.current[index + 1]) {
+					pages.current[index + 1] = { cursor: page.nextCursor };
+				}
+			} catch (err) {
+				if (started === generation.current) setError(err instanceof Error ? err.message : String(err));
+			} finally {
+				slot.loading = false;
+				if (started === generation.current) setLoaded((n) => n + 1);
+			}
+		},
+		[handle, sort],
+	);
+
+	// A new handle or sort order starts again from the first page
+	useEffect(() => {
+		generation.current += 1;
+		pages.current = [{ cursor: null }];
+		setMeta(null);
+		setError(null);
+		setScrollTop(0);
+		if (scroller.current) scroller.current.scrollTop = 0;
+	}, [handle, sort]);
+
+	useEffect(() => {
+		if (error) return;
+		const slots = pages.current;
+		if (slots.some((slot) => slot.loading)) return;
+		// Walk forward to the first page in view that has no rows yet
+		for (let index = 0; index <= lastPage && index < slots.length; index++) {
+			if (!slots[index].rows && (index >= firstPage || index === slots.length - 1)) {
+				void loadPage(index);
+				return;
+			}
+		}
+		const cached = slots.map((slot, index) => (slot.rows ? index : -1)).filter((index) => index >= 0);
+		if (cached.length > MAX_CACHED_PAGES) {
+			const distance = (index: number) => (index < firstPage ? firstPage - index : index - lastPage);
+			cached
+				.sort((a, b) => distance(b) - distance(a))
+				.slice(0, cached.length - MAX_CACHED_PAGES)
+				.forEach((index) => delete slots[index].rows);
+		}
+	});
+
+	const shown = meta ? (columns?.length ? meta.columns.filter((c) => columns.includes(c.name)) : meta.columns) : [];
+	const rowCount = meta?.rowCount ?? 0;
+	const gridTemplateColumns = `repeat(${Math.max(shown.length, 1)}, minmax(${MIN_COLUMN_WIDTH}px, 1fr))`;
+	const minWidth = shown.length * MIN_COLUMN_WIDTH;
+
+	const visible: { index: number; row?: Row }[] = [];
+	for (let index = firstRow; index <= Math.min(lastRow, rowCount - 1); index++) {
+		visible.push({ index, row: pages.current[Math.floor(index / PAGE_ROWS)]?.rows?.[index % PAGE_ROWS] });
+	}
+
+	return (
+		<Card className='col-span-full'>
+			<CardHeader className='flex flex-row items-center justify-between'>
+				<CardTitle className='text-lg font-medium'>{title ?? 'Results'}</CardTitle>
+				{meta && <span className='text-xs text-muted-foreground'>{rowCount.toLocaleString()} rows</span>}
+			</CardHeader>
+			<CardContent>
+				{error ? (
+					<p className='text-center text-sm text-red-600 py-8'>{error}</p>
+				) : (
+					<div className='overflow-x-auto rounded-md border'>
+						<div style={{ minWidth }}>
+							<div className='grid border-b bg-muted/50 text-xs font-medium' style={{ gridTemplateColumns }}>
+								{shown.map((column) => (
+									<button
+										key={column.name}
+										type='button'
+										className='flex items-center gap-1 px-3 py-2 text-left hover:text-foreground text-muted-foreground'
+										onClick={() => setSort((current) => nextSort(current, column.name))}
+									>
+										<span className='truncate'>{column.name}</span>
+										{sort?.column === column.name ? (
+											sort.dir === 'asc' ? (
+												<ArrowUpIcon className='size-3 shrink-0' />
+											) : (
+												<ArrowDownIcon className='size-3 shrink-0' />
+											)
+										) : (
+											<ArrowUpDownIcon className='size-3 shrink-0 opacity-40' />
+										)}
+									</button>
+								))}
+							</div>
+							<div
+								ref={scroller}
+								className='relative overflow-y-auto'
+								style={{ height: meta ? Math.min(VIEWPORT_HEIGHT, rowCount * ROW_HEIGHT) || undefined : VIEWPORT_HEIGHT }}
+								onScroll={(event) => setScrollTop(event.currentTarget.scrollTop)}
+							>
+								<div style={{ height: rowCount * ROW_HEIGHT }}>
+									{visible.map(({ index, row }) => (
+										<div
+											key={index}
+											className={cn('absolute inset-x-0 grid border-b text-sm', index % 2 ? 'bg-muted/20' : '')}
+											style={{ top: index * ROW_HEIGHT, height: ROW_HEIGHT, gridTemplateColumns }}
+										>
+											{shown.map((column) => (
+												<div key={column.name} className='truncate px-3 leading-8 tabular-nums'>
+													{row ? formatCell(row[column.name]) : ''}
+												</div>
+											))}
+										</div>
+									))}
+								</div>
+								{meta && rowCount === 0 && (
+									<p className='text-center text-muted-foreground py-8 italic'>No rows.</p>
+								)}
+								{!meta && <p className='text-center text-muted-foreground py-8'>Loading rows…</p>}
+							</div>
+						</div>
+					</div>
+				)}
+			</CardContent>
+		</Card>
+	);
+}
@@ -7,6 +7,7 @@ const KNOWN_BLOCK_TYPES = new Set([
 	'candlestick-chart',
 	'event-timeline',
 	'correlation-matrix',
+	'data-table',
 ]);
 
 export interface ValidationResult {